@@ -1,11 +1,112 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+
+_IMPORT_STARTED = time.perf_counter()  # worker startup = imports + eager load + warm-up
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from pydantic import BaseModel, ConfigDict
 import predict
+import model_registry
 from config_loader import config
+from inference_pool import InferencePool, PoolSaturatedError
+from batching import MicroBatcher
+from cache import TTLCache
+from telemetry import HTTP_REQUESTS, HTTP_SECONDS, PREDICTIONS, REGISTRY, STAGE_SECONDS, process_memory
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-app = FastAPI(title="Prognosis Care Backend")
+# Bounded worker pool for blocking sklearn + SHAP inference (see config "serving")
+serving_cfg = config.get("serving", {})
+inference_pool = InferencePool.from_config(
+    serving_cfg,
+    initializer=predict._init_worker if serving_cfg.get("executor") == "process" else None,
+)
+
+# Optional micro-batching of concurrent single-patient /predict calls
+batching_cfg = serving_cfg.get("batching", {})
+batcher = (
+    MicroBatcher.from_config(batching_cfg, inference_pool, predict.predict_batch)
+    if batching_cfg.get("enabled", False)
+    else None
+)
+
+# Deferred explanations: /predict answers with the forest output and a
+# prediction_id; SHAP runs on its own pool and lands in a bounded TTL store.
+explanations_cfg = serving_cfg.get("explanations", {})
+DEFAULT_EXPLAIN = explanations_cfg.get("default_mode", "shap")
+explanation_pool = InferencePool.from_config(
+    explanations_cfg,
+    initializer=predict._init_worker if explanations_cfg.get("executor") == "process" else None,
+)
+explanation_store = TTLCache(
+    max_entries=explanations_cfg.get("store_max_entries", 10000),
+    ttl_s=explanations_cfg.get("store_ttl_s", 600),
+)
+_background_tasks = set()
+
+inference_cfg = config.get("inference", {})
+
+# Optional shared secret for /admin endpoints (X-Admin-Token header)
+ADMIN_TOKEN = serving_cfg.get("admin_token")
+
+# This server process, one of serving.server_workers (see predict.shared_model)
+worker_info = {
+    "pid": os.getpid(),
+    "server_workers": predict.SERVER_WORKERS,
+    "shared_model": predict.shared_model(),
+    "startup_s": None,
+}
+
+def _worker_stats() -> dict:
+    return {**worker_info, "memory_mb": process_memory()}
+
+async def _load_model_eagerly():
+    """Load (and optionally warm up) the model before the first request arrives."""
+    for pool in (inference_pool, explanation_pool):
+        if pool.kind == "process":
+            # Spawn every worker now; each loads and warms up its own copy in
+            # predict._init_worker (which reports its timings) before running
+            # any job, whichever worker these no-op jobs land on
+            await asyncio.gather(*(pool.run(os.getpid) for _ in range(pool.max_workers)))
+    if inference_pool.kind == "process" and explanation_pool.kind == "process":
+        # Nothing scores in this process; it would hold a copy no request uses
+        # (responses are rendered from response_index.for_version instead)
+        print("[INFO] Model loaded in the worker processes only")
+        return
+
+    timings = await asyncio.to_thread(
+        predict.load_artifacts,
+        **predict.default_load_options(),
+        warmup=inference_cfg.get("warmup", False),
+    )
+    print(
+        f"[INFO] Model version {timings['model_version']} loaded in {timings['total']:.2f}s"
+        + (f" (warm-up {timings['warmup']:.2f}s)" if "warmup" in timings else "")
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if inference_cfg.get("eager_load", False):
+        await _load_model_eagerly()
+    worker_info["startup_s"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    memory = process_memory()
+    print(
+        f"[INFO] Worker {worker_info['pid']} ready in {worker_info['startup_s']:.2f}s: "
+        f"RSS {memory.get('rss', memory['peak']):.0f} MiB"
+        + (f" (shared {memory['shared']:.0f}, private {memory['private']:.0f}), PSS {memory['pss']:.0f} MiB"
+           if "pss" in memory else "")
+    )
+    yield
+    inference_pool.shutdown()
+    explanation_pool.shutdown()
+
+app = FastAPI(title="Prognosis Care Backend", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -16,7 +117,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class PatientSymptomRequest(BaseModel):
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # Route templates (not raw URLs) keep label cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    HTTP_SECONDS.observe(time.perf_counter() - t0, method=request.method, path=path)
+    HTTP_REQUESTS.inc(method=request.method, path=path, status=response.status_code)
+    return response
+
+# "deferred" = score now with explain="none", compute SHAP in the background
+ExplainMode = Literal["none", "fast", "shap", "deferred"]
+
+class PatientRecord(BaseModel):
+    # Batch records carry patient fields only; output options are batch-level
+    model_config = ConfigDict(extra="forbid")
+
     symptoms: str
     age: int = 35
     gender: str = "Male"
@@ -24,39 +142,343 @@ class PatientSymptomRequest(BaseModel):
     hr: int = 72
     temp: float = 98.6
 
+    def to_record(self) -> dict:
+        """Map request fields onto the keyword arguments of ``predict.predict``."""
+        return {
+            "age": self.age,
+            "gender": self.gender,
+            "symptoms": self.symptoms,
+            "blood_pressure": self.bp,
+            "heart_rate": self.hr,
+            "temperature": self.temp,
+        }
+
+class PatientSymptomRequest(PatientRecord):
+    model_config = ConfigDict(extra="ignore")
+
+    top_k: int = 0
+    include_proba: bool = False
+    explain: ExplainMode = DEFAULT_EXPLAIN
+
+class PatientBatchRequest(BaseModel):
+    records: List[PatientRecord]
+    top_k: int = 0
+    include_proba: bool = False
+    explain: ExplainMode = DEFAULT_EXPLAIN
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None  # default: the version named in model/CURRENT
+    # False: load and warm the version as a check only; what is served and
+    # model/CURRENT stay unchanged (the same with thread and process workers)
+    activate: bool = True
+
+
+def _augment_result(result: dict) -> str:
+    """
+    Render a prediction as JSON with its test recommendations, total test
+    cost and summary, taken pre-serialized from the serving bundle's
+    response index.
+    """
+    with STAGE_SECONDS.time(stage="augment"):
+        index = predict.response_index_for(result["model_version"])
+        PREDICTIONS.inc(
+            specialty=index.entry(result["disease"]).specialty,
+            risk_level=result["risk_level"],
+        )
+        return index.render(result)
+
+
+async def _await_inference(awaitable):
+    """Await pool-backed inference, mapping pool errors to HTTP status codes."""
+    try:
+        return await awaitable
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Inference timed out after {inference_pool.request_timeout_s}s",
+        )
+
+
+async def _predict_one(record: dict, **options) -> dict:
+    """Score one record, through the micro-batcher when it is enabled."""
+    if batcher is None:
+        with STAGE_SECONDS.time(stage="inference"):
+            return await _await_inference(
+                inference_pool.run(predict.predict, **record, **options)
+            )
+
+    with STAGE_SECONDS.time(stage="inference"):
+        result = await _await_inference(batcher.submit(record, **options))
+    if "error" in result:
+        raise predict.InvalidRecordError(result["error"])
+    return result
+
+
+async def _compute_explanations(prediction_ids: list, records: list):
+    """Background job: SHAP for ``records``, stored under ``prediction_ids``."""
+    try:
+        explanations = await explanation_pool.run(
+            predict.explain_records, records, mode="shap"
+        )
+    except Exception as e:
+        for prediction_id in prediction_ids:
+            explanation_store.update(
+                prediction_id,
+                {"status": "error", "detail": str(e) or type(e).__name__},
+            )
+        return
+
+    for prediction_id, explanation in zip(prediction_ids, explanations):
+        if explanation is not None and "error" in explanation:
+            entry = {"status": "error", "detail": explanation["error"]}
+        else:
+            entry = {"status": "ready", "explanation": explanation}
+        explanation_store.update(prediction_id, entry)
+
+
+def _defer_explanations(records: list) -> list:
+    """Register pending explanations for ``records``; returns their prediction ids."""
+    prediction_ids = [uuid.uuid4().hex for _ in records]
+    for prediction_id in prediction_ids:
+        explanation_store.set(prediction_id, {"status": "pending"})
+
+    task = asyncio.create_task(_compute_explanations(prediction_ids, records))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return prediction_ids
+
+
+def _collect_serving_metrics() -> list:
+    """Scrape-time gauges/counters from the pools, caches and artifact loader."""
+    pools = [("inference", inference_pool), ("explanation", explanation_pool)]
+    pool_stats = [(name, pool.stats()) for name, pool in pools]
+    families = [
+        ("triage_pool_outstanding_jobs", "gauge", "Jobs running or queued on a worker pool",
+         [({"pool": name}, stats["outstanding"]) for name, stats in pool_stats]),
+        ("triage_pool_jobs_total", "counter", "Worker pool jobs by outcome",
+         [({"pool": name, "outcome": outcome}, stats[outcome])
+          for name, stats in pool_stats for outcome in ("completed", "rejected", "timed_out")]),
+        ("triage_explanation_store_entries", "gauge", "Deferred explanations held",
+         [({}, len(explanation_store))]),
+    ]
+
+    cache = predict.cache_stats()
+    if cache is not None:
+        families += [
+            ("triage_result_cache_entries", "gauge", "Entries in the prediction result cache",
+             [({}, cache["entries"])]),
+            ("triage_result_cache_lookups_total", "counter", "Result cache lookups by outcome",
+             [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+            ("triage_result_cache_evictions_total", "counter", "Result cache LRU evictions",
+             [({}, cache["evictions"])]),
+        ]
+
+    symptom = predict.symptom_cache_stats()
+    if symptom is not None:
+        families += [
+            ("triage_symptom_cache_entries", "gauge", "Entries in the symptom caches",
+             [({"cache": name}, stats["entries"]) for name, stats in symptom.items()]),
+            ("triage_symptom_cache_lookups_total", "counter", "Symptom cache lookups by outcome",
+             [({"cache": name, "result": result}, stats[key])
+              for name, stats in symptom.items()
+              for result, key in (("hit", "hits"), ("miss", "misses"))]),
+        ]
+
+    load = predict.load_stats()
+    if load:
+        families += [
+            ("triage_artifact_load_seconds", "gauge", "Duration of the last artifact load, by stage",
+             [({"stage": k}, v) for k, v in load.items() if isinstance(v, (int, float))]),
+            ("triage_model_info", "gauge", "Model version currently serving",
+             [({"version": load.get("model_version"), "engine": load.get("engine"),
+                "preprocessing": load.get("preprocessing")}, 1)]),
+        ]
+
+    worker = _worker_stats()
+    families.append(
+        ("triage_process_memory_bytes", "gauge", "Memory of this server worker by kind",
+         [({"pid": worker["pid"], "kind": kind}, round(value * 1024 * 1024))
+          for kind, value in worker["memory_mb"].items()])
+    )
+    if worker["startup_s"] is not None:
+        families.append(
+            ("triage_worker_startup_seconds", "gauge", "Imports, model load and warm-up of this server worker",
+             [({"pid": worker["pid"]}, worker["startup_s"])])
+        )
+
+    if batcher is not None:
+        stats = batcher.stats()
+        families.append(
+            ("triage_batcher_requests_total", "counter", "Requests coalesced by the micro-batcher",
+             [({}, stats["requests"])])
+        )
+        families.append(
+            ("triage_batcher_batches_total", "counter", "Batches flushed by the micro-batcher",
+             [({}, stats["batches"])])
+        )
+    return families
+
+REGISTRY.register_collector(_collect_serving_metrics)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, stage and serving metrics."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/healthz")
+async def healthz():
+    # Served on the event loop, never behind the inference pool
+    health = {
+        "status": "ok",
+        "inference_pool": inference_pool.stats(),
+        "explanation_pool": explanation_pool.stats(),
+        "explanation_store": explanation_store.stats(),
+        "result_cache": predict.cache_stats(),
+        "symptom_cache": predict.symptom_cache_stats(),
+        "model_version": predict.model_version(),
+        "artifacts": predict.load_stats(),
+        "worker": _worker_stats(),
+    }
+    if batcher is not None:
+        health["batching"] = batcher.stats()
+    return health
+
+@app.post("/admin/reload")
+async def reload_model(data: Optional[ReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load a model version in the background and swap it in; requests already
+    running finish on the previous version.  With process workers the
+    version is made CURRENT and workers switch on their next poll
+    ("activating").  ``activate: false`` only loads and warms the version as a
+    check ("loaded") and leaves serving and CURRENT untouched, whatever the
+    executor.
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    data = data or ReloadRequest()
+
+    try:
+        if not data.activate:
+            version, _ = model_registry.resolve(data.version)
+            if inference_pool.kind == "process":
+                stats = await inference_pool.run(predict.preload_version, version)
+                serving = model_registry.current_version() or model_registry.UNVERSIONED
+            else:
+                stats = await asyncio.to_thread(predict.preload_version, version)
+                serving = predict.model_version()
+            return {"status": "loaded", "model_version": version,
+                    "serving_version": serving, "artifacts": stats}
+
+        if inference_pool.kind == "process":
+            # Worker processes follow model/CURRENT on their own (predict._init_worker),
+            # so serving a version means pointing CURRENT at it
+            version, _ = model_registry.resolve(data.version)
+            model_registry.activate(version)
+            return {
+                "status": "activating",
+                "model_version": version,
+                "detail": "workers switch within inference.reload.poll_interval_s "
+                          f"({predict._reload_cfg.get('poll_interval_s', 5.0)}s)",
+            }
+
+        stats = await asyncio.to_thread(predict.reload_artifacts, data.version)
+        if data.version is not None:
+            model_registry.activate(stats["model_version"])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "reloaded", **stats}
+
+@app.get("/explanations/{prediction_id}")
+async def get_explanation(prediction_id: str):
+    entry = explanation_store.get(prediction_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired prediction_id")
+    return {"prediction_id": prediction_id, **entry}
+
 @app.post("/predict")
-def get_prediction(data: PatientSymptomRequest):
+async def get_prediction(data: PatientSymptomRequest):
     try:
         # 1. Get prediction from existing model (predict.py)
-        result = predict.predict(
-            age=data.age,
-            gender=data.gender,
-            symptoms=data.symptoms,
-            blood_pressure=data.bp,
-            heart_rate=data.hr,
-            temperature=data.temp
+        record = data.to_record()
+        deferred = data.explain == "deferred"
+        result = await _predict_one(
+            record,
+            top_k=data.top_k,
+            include_proba=data.include_proba,
+            explain="none" if deferred else data.explain,
         )
+        if deferred:
+            result["prediction_id"] = _defer_explanations([record])[0]
 
         # 2. Augment with Test Recommendations from config
-        # Result has 'specialty' or 'disease'; we use specialty for broad test groups
-        specialty = result.get("specialty", "General Medicine")
-        if specialty not in config["test_recommendations"]:
-             specialty = "General Medicine"
-
-        recommended_tests = config["test_recommendations"].get(specialty, [])
-        
-        # Add tests to the result
-        result["recommended_tests"] = recommended_tests
-        
-        # Also construct a simple summary string for the frontend
-        disease = result.get("disease", "Unknown Condition")
-        risk = result.get("risk_level", "Unknown")
-        result["summary"] = f"Based on your symptoms, our AI analysis suggests possible {disease} ({risk} Risk). We recommend consulting a {specialty} specialist. Suggested diagnostic tests are listed below."
-
-        return result
+        return Response(_augment_result(result), media_type="application/json")
 
+    except HTTPException:
+        raise
+    except predict.InvalidRecordError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/batch")
+async def get_batch_prediction(data: PatientBatchRequest):
+    try:
+        # One vectorized pass over every record; malformed records come back
+        # as {"error": ...} in their slot instead of failing the whole batch.
+        records = [r.to_record() for r in data.records]
+        deferred = data.explain == "deferred"
+        with STAGE_SECONDS.time(stage="inference_batch"):
+            results = await _await_inference(
+                inference_pool.run(
+                    predict.predict_batch,
+                    records,
+                    top_k=data.top_k,
+                    include_proba=data.include_proba,
+                    explain="none" if deferred else data.explain,
+                )
+            )
+        if deferred:
+            valid = [i for i, result in enumerate(results) if "error" not in result]
+            prediction_ids = _defer_explanations([records[i] for i in valid])
+            for i, prediction_id in zip(valid, prediction_ids):
+                results[i]["prediction_id"] = prediction_id
+
+        body = ",".join(
+            json.dumps(result) if "error" in result else _augment_result(result)
+            for result in results
+        )
+        return Response(f'{{"results":[{body}]}}', media_type="application/json")
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prognosis Care Backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=predict.SERVER_WORKERS,
+        help="Server processes (default: WEB_CONCURRENCY or serving.server_workers)",
+    )
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.workers == 1:
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        # Hand over to the uvicorn CLI so the supervisor does not keep this
+        # process's imports; WEB_CONCURRENCY tells every worker it shares the model.
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "backend:app",
+            "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+            "--host", args.host, "--port", str(args.port), "--workers", str(args.workers),
+        ])
@@ -0,0 +1,128 @@
+"""
+AI Healthcare Triage Engine — Micro-batching Request Coalescer
+================================================================
+Gathers concurrent single-patient ``/predict`` calls for up to ``window_ms``
+(or until ``max_batch_size`` records are waiting), scores them with one
+``predict.predict_batch`` call on the inference pool, and resolves each
+caller's future with its own result.
+
+Batch-size and queue-wait statistics are kept so the window can be tuned
+against tail latency.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Parameters
+    ----------
+    pool : InferencePool      — where each coalesced batch runs
+    batch_fn : callable       — ``batch_fn(records, **options) -> list``
+    window_ms : float         — how long the first request of a batch waits
+    max_batch_size : int      — flush immediately once this many are queued
+    stats_window : int        — number of recent samples kept for percentiles
+    """
+
+    def __init__(
+        self,
+        pool,
+        batch_fn,
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        stats_window: int = 1024,
+    ):
+        self.pool = pool
+        self.batch_fn = batch_fn
+        self.window_s = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        # Requests with different output options cannot share a batch call
+        self._pending = {}  # options key → list of (record, future, enqueued_at)
+        self._timers = {}   # options key → asyncio.TimerHandle
+        self._tasks = set()  # in-flight batches; the loop only holds weak references
+
+        self._batches = 0
+        self._requests = 0
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_waits_ms = deque(maxlen=stats_window)
+
+    @classmethod
+    def from_config(cls, batching_cfg: dict, pool, batch_fn) -> "MicroBatcher":
+        return cls(
+            pool,
+            batch_fn,
+            window_ms=batching_cfg.get("window_ms", 5.0),
+            max_batch_size=batching_cfg.get("max_batch_size", 32),
+        )
+
+    async def submit(self, record: dict, **options):
+        """Queue one record and wait for its result from a coalesced batch."""
+        loop = asyncio.get_running_loop()
+        key = tuple(sorted(options.items()))
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(key, [])
+        pending.append((record, future, time.perf_counter()))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window_s, self._flush, key)
+
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(key, [])
+        if items:
+            task = asyncio.get_running_loop().create_task(self._run(items, dict(key)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: list, options: dict):
+        now = time.perf_counter()
+        self._batches += 1
+        self._requests += len(items)
+        self._batch_sizes.append(len(items))
+        self._queue_waits_ms.extend((now - enqueued_at) * 1000.0 for _, _, enqueued_at in items)
+
+        try:
+            results = await self.pool.run(
+                self.batch_fn, [record for record, _, _ in items], **options
+            )
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        sizes = np.asarray(self._batch_sizes, dtype=float)
+        waits = np.asarray(self._queue_waits_ms, dtype=float)
+
+        def _pct(values, q):
+            return round(float(np.percentile(values, q)), 3) if values.size else None
+
+        return {
+            "window_ms": self.window_s * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self._batches,
+            "requests": self._requests,
+            "batch_size_mean": round(float(sizes.mean()), 3) if sizes.size else None,
+            "batch_size_p50": _pct(sizes, 50),
+            "batch_size_max": int(sizes.max()) if sizes.size else None,
+            "queue_wait_ms_p50": _pct(waits, 50),
+            "queue_wait_ms_p99": _pct(waits, 99),
+            "queue_wait_ms_max": round(float(waits.max()), 3) if waits.size else None,
+        }
@@ -0,0 +1,543 @@
+"""
+AI Healthcare Triage Engine — Latency Benchmark Suite
+=======================================================
+Measures the prediction and serving paths in-process, so numbers reflect
+inference rather than interpreter start-up and artifact loading:
+
+  stages      ``predict`` stage by stage — parse, preprocess, per-target
+              predict_proba, label decoding, explanations (fast / SHAP) and
+              the backend's test-recommendation lookup — at each batch size
+  symptoms    the TF-IDF text block via the analyzer vs. the symptom-set cache
+              and phrase table (cold and warm), with hit rates
+  cold_start  fresh interpreters: import, artifact load, first and second call
+  load_test   the FastAPI app driven through httpx's ASGI transport at each
+              concurrency level
+  layouts     CSR vs. dense feature matrices over the whole dataset (and
+              replicated multiples of it): matrix size, forest / compiled
+              forest / SHAP time and peak allocation
+  workers     several server-worker processes loaded side by side, with the
+              memory-mapped compiled forest shared vs. a model copy in each:
+              startup time and RSS / PSS / private memory per worker
+
+Every timing is summarised as p50 / p95 / p99 (ms) plus throughput, and RSS
+is sampled along the way. The JSON report can be compared against a
+baseline to catch regressions (exit status 1 when one is found).
+
+Usage:
+    python benchmark.py
+    python benchmark.py --skip-load-test --batch-sizes 1 64
+    python benchmark.py --compare benchmark_baseline.json
+    python benchmark.py --skip-load-test --skip-layouts --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import predict
+from config_loader import config
+from telemetry import process_memory
+
+warnings.filterwarnings("ignore")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, config["paths"]["data_dir"])
+REPORT_PATH = os.path.join(BASE_DIR, "benchmark_report.json")
+
+
+# ── helpers ───────────────────────────────────────────────────────────────────
+def _summary(samples_ms) -> dict:
+    samples = np.asarray(samples_ms, dtype=float)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p95": round(float(np.percentile(samples, 95)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "n": int(samples.size),
+    }
+
+
+def rss_mb() -> dict:
+    """Current and peak resident set size of this process, in MiB."""
+    memory = process_memory()
+    return {"current": memory.get("rss"), "peak": memory["peak"]}
+
+
+def sample_records(n: int, seed: int = 0) -> list:
+    """``n`` patient records (predict() keyword format) drawn from Data/."""
+    frames = [
+        pd.read_csv(os.path.join(DATA_DIR, f))
+        for f in sorted(os.listdir(DATA_DIR)) if f.endswith(".csv")
+    ]
+    sample = pd.concat(frames, ignore_index=True).sample(
+        n, replace=n > sum(len(f) for f in frames), random_state=seed
+    )
+    return [
+        {
+            "age": int(r["Age"]),
+            "gender": r["Gender"],
+            "symptoms": r["Detailed_Symptoms"],
+            "blood_pressure": r["Blood Pressure"],
+            "heart_rate": int(r["Heart Rate"]),
+            "temperature": float(r["Temperature"]),
+        }
+        for _, r in sample.iterrows()
+    ]
+
+
+# ── 1. Stage breakdown ────────────────────────────────────────────────────────
+def _time_stages(bundle, records: list, with_shap: bool, augment) -> dict:
+    """One pass through every stage; returns stage → ms."""
+    t = {}
+    t0 = time.perf_counter()
+    rows = [predict._record_to_row(r) for r in records]
+    t["parse"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    X = predict._transform_rows(bundle, rows)
+    t["preprocess"] = time.perf_counter() - t0
+
+    outputs = []
+    for target, estimator in zip(predict.TARGET_NAMES, bundle.model.estimators_):
+        t0 = time.perf_counter()
+        proba = estimator.predict_proba(X)
+        t[f"predict_proba_{target}"] = time.perf_counter() - t0
+        outputs.append((estimator, proba))
+    t["forest"] = sum(t[f"predict_proba_{target}"] for target in predict.TARGET_NAMES)
+
+    t0 = time.perf_counter()
+    for target, (estimator, proba) in zip(predict.TARGET_NAMES, outputs):
+        y_encoded = estimator.classes_.take(np.argmax(proba, axis=1), axis=0)
+        bundle.label_encoders[target].inverse_transform(y_encoded)
+    t["decode"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    predict._get_explanations(bundle, X, mode="fast")
+    t["explain_fast"] = time.perf_counter() - t0
+
+    if with_shap:
+        t0 = time.perf_counter()
+        predict._get_explanations(bundle, X, mode="shap")
+        t["explain_shap"] = time.perf_counter() - t0
+
+    # End to end as served, minus the result cache
+    t0 = time.perf_counter()
+    results = predict._score_rows(bundle, rows, explain="none")
+    t["score_rows_total"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for result in results:
+        augment(result)
+    t["recommendations"] = time.perf_counter() - t0
+
+    return {stage: seconds * 1000.0 for stage, seconds in t.items()}
+
+
+def bench_stages(batch_sizes: list, repeats: int, shap_max_batch: int) -> dict:
+    from backend import _augment_result
+
+    bundle = predict._load_artifacts()
+    pool = sample_records(max(batch_sizes) * 2, seed=1)
+    report = {}
+    for size in batch_sizes:
+        n_repeats = repeats if size <= 64 else max(3, repeats // 4)
+        with_shap = size <= shap_max_batch
+        samples = {}
+        # First pass is the warm-up for this size
+        for i in range(n_repeats + 1):
+            offset = (i * size) % (len(pool) - size + 1)
+            stages = _time_stages(bundle, pool[offset:offset + size], with_shap, _augment_result)
+            if i == 0:
+                continue
+            for stage, ms in stages.items():
+                samples.setdefault(stage, []).append(ms)
+
+        entry = {stage: _summary(values) for stage, values in samples.items()}
+        entry["rows_per_s"] = round(size / (entry["score_rows_total"]["p50"] / 1000.0), 1)
+        report[str(size)] = entry
+        print(f"[INFO] batch {size:>5}: score_rows p50 {entry['score_rows_total']['p50']:.2f} ms  "
+              f"({entry['rows_per_s']:,.0f} rows/s)"
+              + (f"  |  SHAP p50 {entry['explain_shap']['p50']:.1f} ms" if with_shap else ""))
+
+    # Result-cache hit for a single repeated record
+    record = pool[0]
+    predict.predict(**record, explain="none")
+    hits = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        predict.predict(**record, explain="none")
+        hits.append((time.perf_counter() - t0) * 1000.0)
+    report["cache_hit_single"] = _summary(hits)
+    return report
+
+
+def bench_symptom_cache(n_rows: int = 4096, repeats: int = 5) -> dict:
+    """
+    µs per row for the TF-IDF block of ``n_rows`` sampled records: analyzer
+    only, then an empty symptom cache (first pass) and a warm one.
+    """
+    from fast_preprocessor import FastPreprocessor
+
+    bundle = predict._load_artifacts()
+    texts = [predict._record_to_row(r)["Detailed_Symptoms"] for r in sample_records(n_rows, seed=4)]
+
+    def per_row_us(fast, passes):
+        samples = []
+        for _ in range(passes):
+            t0 = time.perf_counter()
+            fast._text_features(texts)
+            samples.append((time.perf_counter() - t0) * 1e6 / n_rows)
+        return round(float(np.median(samples)), 2)
+
+    uncached = FastPreprocessor.from_column_transformer(bundle.preprocessor)
+    cached = FastPreprocessor.from_column_transformer(bundle.preprocessor, text_cache_size=n_rows)
+    report = {
+        "rows": n_rows,
+        "distinct_symptom_sets": len({cached.symptom_key(t) for t in texts}),
+        "analyzer_us_per_row": per_row_us(uncached, repeats),
+        "cold_us_per_row": per_row_us(cached, 1),
+        "warm_us_per_row": per_row_us(cached, repeats),
+        "stats": cached.cache_stats(),
+    }
+    print(f"[INFO] symptom TF-IDF: analyzer {report['analyzer_us_per_row']:.1f} µs/row, "
+          f"cold cache {report['cold_us_per_row']:.1f}, warm {report['warm_us_per_row']:.1f} "
+          f"({report['distinct_symptom_sets']:,} distinct sets in {n_rows:,} rows)")
+    return report
+
+
+# ── 2. Cold vs. warm start ────────────────────────────────────────────────────
+_COLD_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import predict
+t_import = time.perf_counter() - t0
+from telemetry import peak_rss_mb
+stats = predict.load_artifacts()
+record = {record!r}
+t1 = time.perf_counter()
+predict.predict(**record)
+t_first = time.perf_counter() - t1
+t2 = time.perf_counter()
+predict.predict(**dict(record, age=record["age"] + 1))
+t_second = time.perf_counter() - t2
+print(json.dumps({{
+    "import_s": t_import,
+    "load_s": stats["total"],
+    "first_call_s": t_first,
+    "second_call_s": t_second,
+    "peak_rss_mb": peak_rss_mb(),
+}}))
+"""
+
+
+def bench_cold_start(runs: int) -> dict:
+    record = dict(predict.WARMUP_RECORD, age=52)
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", _COLD_SCRIPT.format(record=record)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        wall = time.perf_counter() - t0
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample["process_wall_s"] = wall
+        samples.append(sample)
+
+    report = {
+        key: {
+            "mean": round(float(np.mean([s[key] for s in samples])), 4),
+            "max": round(float(np.max([s[key] for s in samples])), 4),
+        }
+        for key in samples[0]
+    }
+    print(f"[INFO] cold start: import {report['import_s']['mean']:.2f}s, load {report['load_s']['mean']:.2f}s, "
+          f"first call {report['first_call_s']['mean'] * 1000:.0f} ms, "
+          f"second call {report['second_call_s']['mean'] * 1000:.0f} ms")
+    return report
+
+
+# ── 3. In-process HTTP load test ──────────────────────────────────────────────
+async def _load_level(client, bodies: list, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def worker():
+        while not queue.empty():
+            body = queue.get_nowait()
+            t0 = time.perf_counter()
+            response = await client.post("/predict", json=body)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {
+        "latency_ms": _summary(latencies),
+        "throughput_rps": round(len(bodies) / wall, 1),
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+        "rss_mb": rss_mb(),
+    }
+
+
+async def _run_load_test(levels: list, n_requests: int, explain: str) -> dict:
+    import httpx
+    import backend
+
+    records = sample_records(n_requests * len(levels), seed=2)
+    report = {}
+    async with backend.lifespan(backend.app):
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for level_idx, concurrency in enumerate(levels):
+                chunk = records[level_idx * n_requests:(level_idx + 1) * n_requests]
+                bodies = [
+                    {
+                        "symptoms": r["symptoms"], "age": r["age"], "gender": r["gender"],
+                        "bp": r["blood_pressure"], "hr": r["heart_rate"], "temp": r["temperature"],
+                        "explain": explain,
+                    }
+                    for r in chunk
+                ]
+                entry = await _load_level(client, bodies, concurrency)
+                report[str(concurrency)] = entry
+                print(f"[INFO] concurrency {concurrency:>3}: p50 {entry['latency_ms']['p50']:.1f} ms, "
+                      f"p99 {entry['latency_ms']['p99']:.1f} ms, {entry['throughput_rps']:.0f} req/s, "
+                      f"status {entry['status_codes']}")
+    return report
+
+
+def bench_load_test(levels: list, n_requests: int, explain: str = "none") -> dict:
+    return asyncio.run(_run_load_test(levels, n_requests, explain))
+
+
+# ── 4. Sparse vs. dense feature layouts ──────────────────────────────────────
+def _traced(fn):
+    """``(result, seconds, peak MiB allocated during the call)``."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+def _matrix_mb(X) -> float:
+    if hasattr(X, "indptr"):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / (1024 * 1024)
+    return X.nbytes / (1024 * 1024)
+
+
+def bench_feature_layouts(scales: list, shap_rows: int = 256) -> dict:
+    """
+    Score the engineered dataset (replicated ``scale`` times) from the CSR
+    matrix the preprocessor emits and from its dense copy, checking that
+    both give identical probabilities.
+    """
+    from train import load_engineered
+
+    bundle = predict._load_artifacts()
+    compiled_dir = os.path.join(bundle.path, "compiled_forest")
+    compiled = predict.CompiledForest(compiled_dir) if os.path.isdir(compiled_dir) else None
+    base = load_engineered()
+    report = {}
+    for scale in scales:
+        df = pd.concat([base] * scale, ignore_index=True) if scale > 1 else base
+        X_csr = bundle.preprocessor.transform(df)
+        layouts = {"csr": X_csr, "dense": X_csr.toarray()}
+        entry = {"rows": X_csr.shape[0], "density": round(X_csr.nnz / np.prod(X_csr.shape), 4)}
+        outputs = {}
+        for name, X in layouts.items():
+            result = {"matrix_mb": round(_matrix_mb(X), 1)}
+            paths = [("forest", bundle.model)] + ([("compiled", compiled)] if compiled else [])
+            for path, model in paths:
+                probas, seconds, peak = _traced(
+                    lambda: [est.predict_proba(X) for est in model.estimators_]
+                )
+                outputs[(name, path)] = probas
+                result[path] = {"s": round(seconds, 3), "rows_per_s": round(X.shape[0] / seconds),
+                                "peak_mb": round(peak, 1)}
+            _, seconds, peak = _traced(lambda: predict._shap_importances(bundle.explainer, X[:shap_rows]))
+            result["shap"] = {"rows": shap_rows, "s": round(seconds, 3), "peak_mb": round(peak, 1)}
+            entry[name] = result
+        entry["identical"] = all(
+            np.array_equal(a, b)
+            for path in ("forest", "compiled") if ("csr", path) in outputs
+            for a, b in zip(outputs[("csr", path)], outputs[("dense", path)])
+        )
+        report[str(scale)] = entry
+        print(f"[INFO] {entry['rows']:>9,} rows: matrix {entry['csr']['matrix_mb']:.0f} MiB CSR vs "
+              f"{entry['dense']['matrix_mb']:.0f} MiB dense  |  forest {entry['csr']['forest']['s']:.2f}s "
+              f"vs {entry['dense']['forest']['s']:.2f}s  |  identical: {entry['identical']}")
+        del layouts, outputs
+    return report
+
+
+# ── 5. Server worker memory ───────────────────────────────────────────────────
+_WORKER_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import predict
+from telemetry import process_memory
+predict._inference_cfg["shared_model"] = {shared!r}
+predict.load_artifacts(**predict.default_load_options(), warmup=True)
+predict.predict_batch({records!r}, explain="fast")
+print(json.dumps({{"startup_s": time.perf_counter() - t0, "engine": predict.load_stats()["engine"]}}), flush=True)
+sys.stdin.readline()  # hold until every worker has loaded, so PSS splits shared pages
+print(json.dumps(process_memory()), flush=True)
+"""
+
+
+def bench_server_workers(n_workers: int, n_records: int = 256) -> dict:
+    """
+    Start ``n_workers`` processes that load the model as server workers do
+    (``WEB_CONCURRENCY=n_workers``) and score ``n_records`` rows, once
+    sharing the memory-mapped compiled forest and once with a copy each.
+    """
+    records = sample_records(n_records, seed=5)
+    env = dict(os.environ, WEB_CONCURRENCY=str(n_workers))
+    report = {"workers": n_workers}
+    for mode, shared in (("shared", True), ("copies", False)):
+        script = _WORKER_SCRIPT.format(shared=shared, records=records)
+        procs = [
+            subprocess.Popen([sys.executable, "-c", script], cwd=BASE_DIR, env=env, text=True,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            for _ in range(n_workers)
+        ]
+        loaded = [json.loads(p.stdout.readline()) for p in procs]
+        for p in procs:
+            p.stdin.write("\n")
+            p.stdin.flush()
+        memory = [json.loads(p.stdout.readline()) for p in procs]
+        for p in procs:
+            p.wait()
+
+        entry = {
+            "engine": loaded[0]["engine"],
+            "startup_s": round(float(np.mean([w["startup_s"] for w in loaded])), 2),
+        }
+        for kind in ("rss", "pss", "shared", "private"):
+            if kind in memory[0]:
+                entry[f"{kind}_mb"] = round(float(np.mean([m[kind] for m in memory])), 1)
+        if "pss" in memory[0]:
+            entry["total_pss_mb"] = round(sum(m["pss"] for m in memory), 1)
+        report[mode] = entry
+        print(f"[INFO] {n_workers} workers, {mode} ({entry['engine']}): startup {entry['startup_s']:.2f}s, "
+              f"RSS {entry.get('rss_mb', 0):.0f} MiB, private {entry.get('private_mb', 0):.0f} MiB per worker, "
+              f"PSS total {entry.get('total_pss_mb', 0):.0f} MiB")
+    return report
+
+
+# ── 6. Regression check ───────────────────────────────────────────────────────
+def compare_reports(current: dict, baseline: dict, tolerance: float) -> list:
+    """p50 latencies that got slower than ``baseline`` by more than ``tolerance``."""
+    regressions = []
+
+    def check(name, new, old):
+        if old and new > old * (1.0 + tolerance):
+            regressions.append(f"{name}: {old:.3f} → {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+
+    for size, stages in current.get("stages", {}).items():
+        old_stages = baseline.get("stages", {}).get(size, {})
+        for stage, summary in stages.items():
+            if isinstance(summary, dict) and stage in old_stages:
+                check(f"stages[{size}].{stage}", summary["p50"], old_stages[stage]["p50"])
+    for level, entry in current.get("load_test", {}).items():
+        old = baseline.get("load_test", {}).get(level)
+        if old:
+            check(f"load_test[{level}]", entry["latency_ms"]["p50"], old["latency_ms"]["p50"])
+    return regressions
+
+
+# ── 7. Main ───────────────────────────────────────────────────────────────────
+def main(batch_sizes=None, skip_cold=False, skip_load_test=False, no_cache=False,
+         output=REPORT_PATH, compare=None, skip_layouts=False, workers=None) -> int:
+    bench_cfg = config.get("benchmark", {})
+    batch_sizes = batch_sizes or bench_cfg.get("batch_sizes", [1, 4, 16, 64, 256, 1024])
+    if no_cache:
+        predict._result_cache = None
+
+    load_stats = predict.load_artifacts(mmap_mode=config.get("inference", {}).get("mmap_mode"), warmup=True)
+    import sklearn
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "engine": load_stats.get("engine"),
+            "preprocessing": load_stats.get("preprocessing"),
+            "model_version": load_stats.get("model_version"),
+            "result_cache": predict._result_cache is not None,
+        },
+        "artifact_load": load_stats,
+        "stages": bench_stages(batch_sizes, bench_cfg.get("repeats", 20), bench_cfg.get("shap_max_batch", 64)),
+    }
+    report["symptoms"] = bench_symptom_cache()
+    report["rss_mb_after_stages"] = rss_mb()
+    if not skip_cold:
+        report["cold_start"] = bench_cold_start(bench_cfg.get("cold_runs", 3))
+    if not skip_load_test:
+        report["load_test"] = bench_load_test(
+            bench_cfg.get("concurrency", [1, 8, 32]), bench_cfg.get("requests_per_level", 200)
+        )
+    if not skip_layouts:
+        report["layouts"] = bench_feature_layouts(bench_cfg.get("layout_scales", [1, 4]))
+    workers = workers or bench_cfg.get("server_workers", 2)
+    if workers > 1:
+        report["workers"] = bench_server_workers(workers)
+    report["rss_mb"] = rss_mb()
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Report saved to {output}")
+
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, bench_cfg.get("regression_tolerance", 0.2))
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            return 1
+        print(f"[INFO] No regressions against {compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Latency benchmarks")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--skip-cold", action="store_true", help="Skip the cold-start subprocess runs")
+    parser.add_argument("--skip-load-test", action="store_true", help="Skip the in-process HTTP load test")
+    parser.add_argument("--skip-layouts", action="store_true", help="Skip the CSR vs. dense comparison")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Server workers for the memory comparison (1 skips it)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the result cache while benchmarking")
+    parser.add_argument("--output", default=REPORT_PATH)
+    parser.add_argument("--compare", default=None, help="Baseline report to check for regressions")
+    args = parser.parse_args()
+
+    sys.exit(main(
+        batch_sizes=args.batch_sizes,
+        skip_cold=args.skip_cold,
+        skip_load_test=args.skip_load_test,
+        no_cache=args.no_cache,
+        output=args.output,
+        compare=args.compare,
+        skip_layouts=args.skip_layouts,
+        workers=args.workers,
+    ))
@@ -0,0 +1,355 @@
+"""
+AI Healthcare Triage Engine — Bulk Scoring
+============================================
+Scores large CSV / JSONL files offline (re-triaging historical records,
+nightly audits) with bounded memory:
+
+  - the input is read in chunks and never held in full
+  - chunks are sharded across worker processes that each load the model
+    once (pinned to one version for the whole run)
+  - results are written in input order as each chunk completes, either to a
+    JSONL file or to a Parquet dataset directory (one part file per chunk)
+  - a checkpoint next to the output records progress after every chunk, so
+    an interrupted run resumes where it stopped instead of starting over
+
+Input rows use either the Data/ CSV schema (Age, Gender, Detailed_Symptoms,
+Blood Pressure, Heart Rate, Temperature) or ``predict()``'s keyword names.
+Malformed rows (missing / empty cells, non-finite vitals) are written with an
+``error`` field instead of failing the run.
+
+Usage:
+    python bulk_predict.py records.csv results.jsonl
+    python bulk_predict.py records.jsonl results_parquet --format parquet --workers 4
+    python bulk_predict.py records.csv results.jsonl --resume
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+import model_registry
+import predict
+from config_loader import config
+
+# Data/ CSV schema → predict() keyword arguments
+CSV_COLUMNS = {
+    "Age": "age",
+    "Gender": "gender",
+    "Detailed_Symptoms": "symptoms",
+    "Blood Pressure": "blood_pressure",
+    "Heart Rate": "heart_rate",
+    "Temperature": "temperature",
+}
+RECORD_FIELDS = tuple(CSV_COLUMNS.values())
+ID_COLUMNS = ("Patient_ID", "id")
+OUTPUT_FORMATS = ("jsonl", "parquet")
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+class BulkScoringError(RuntimeError):
+    """Scoring stopped part-way; the checkpoint allows ``--resume``."""
+
+
+# ── 1. Input ──────────────────────────────────────────────────────────────────
+def _input_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_chunks(path: str, chunksize: int, id_column: str = None):
+    """
+    Yield lists of ``(id, record)`` pairs, ``chunksize`` rows at a time, with
+    records in ``predict()``'s keyword format.
+    """
+    if _input_format(path) == "jsonl":
+        with open(path) as f:
+            lines = (line for line in f if line.strip())
+            while True:
+                block = list(islice(lines, chunksize))
+                if not block:
+                    return
+                yield [_to_pair(json.loads(line), id_column) for line in block]
+    else:
+        for frame in pd.read_csv(path, chunksize=chunksize):
+            yield [_to_pair(row, id_column) for row in frame.to_dict("records")]
+
+
+def _to_pair(row: dict, id_column: str = None) -> tuple:
+    columns = [id_column] if id_column else ID_COLUMNS
+    row_id = next((row[c] for c in columns if c in row), None)
+    if row_id is not None and not pd.isna(row_id):
+        row_id = str(row_id)
+    else:
+        row_id = None
+    # Empty CSV cells (NaN) count as missing, so the record fails validation
+    # on its own instead of being scored as the text "nan"
+    record = {
+        CSV_COLUMNS.get(k, k): v for k, v in row.items()
+        if not (pd.api.types.is_scalar(v) and pd.isna(v))
+    }
+    return row_id, {k: record[k] for k in RECORD_FIELDS if k in record}
+
+
+# ── 2. Workers ────────────────────────────────────────────────────────────────
+def _init_worker(version: str, mmap_mode: str = None):
+    """Load one pinned model version; the result cache only costs memory here."""
+    predict._result_cache = None
+    predict.load_artifacts(version=version, mmap_mode=mmap_mode)
+
+
+def _score_chunk(records: list, options: dict) -> list:
+    return predict.predict_batch(records, **options)
+
+
+# ── 3. Output ─────────────────────────────────────────────────────────────────
+def _rows_out(start: int, ids: list, results: list) -> list:
+    """Output rows: input position and id first, then the prediction."""
+    return [
+        {"row": start + i, "id": row_id, **result}
+        for i, (row_id, result) in enumerate(zip(ids, results))
+    ]
+
+
+def _parquet_frame(rows: list) -> pd.DataFrame:
+    """Flat columns with a fixed schema; nested outputs are stored as JSON text."""
+    flat = []
+    for row in rows:
+        confidence = row.get("confidence") or {}
+        flat.append(
+            {
+                "row": row["row"],
+                "id": row["id"],
+                "disease": row.get("disease"),
+                "normal_abnormal": row.get("normal_abnormal"),
+                "risk_level": row.get("risk_level"),
+                "specialty": row.get("specialty"),
+                "confidence_disease": confidence.get("disease"),
+                "confidence_normal_abnormal": confidence.get("normal_abnormal"),
+                "confidence_risk_level": confidence.get("risk_level"),
+                "model_version": row.get("model_version"),
+                "explanation": _json_or_none(row.get("explanation")),
+                "differential": _json_or_none(row.get("differential")),
+                "probabilities": _json_or_none(row.get("probabilities")),
+                "error": row.get("error"),
+            }
+        )
+    frame = pd.DataFrame(flat)
+    frame["row"] = frame["row"].astype("int64")
+    for column in frame.columns.drop("row"):
+        frame[column] = frame[column].astype("float64" if column.startswith("confidence_") else "string")
+    return frame
+
+
+def _json_or_none(value):
+    return None if value is None else json.dumps(value)
+
+
+class ResultWriter:
+    """
+    Appends scored chunks to ``path`` and reports the position to resume from.
+
+    jsonl   — one file; ``position`` is its size in bytes after the last chunk
+    parquet — a directory of ``part-NNNNNN.parquet`` files, one per chunk
+    """
+
+    def __init__(self, path: str, fmt: str, position: int = 0):
+        self.path = path
+        self.fmt = fmt
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401 — fail before any work is done
+
+            os.makedirs(path, exist_ok=True)
+            self._file = None
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "ab")
+            # Drop anything written after the last checkpoint
+            self._file.truncate(position)
+            self._file.seek(position)
+
+    def write(self, chunk_index: int, rows: list) -> int:
+        if self.fmt == "parquet":
+            part = os.path.join(self.path, f"part-{chunk_index:06d}.parquet")
+            _parquet_frame(rows).to_parquet(part + ".tmp", index=False)
+            os.replace(part + ".tmp", part)
+            return chunk_index + 1
+        self._file.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+# ── 4. Checkpoint ─────────────────────────────────────────────────────────────
+def _read_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path: str, state: dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# ── 5. Main routine ───────────────────────────────────────────────────────────
+def main(input_path: str, output_path: str, fmt: str = None, chunksize: int = None,
+         workers: int = None, explain: str = None, top_k: int = 0, include_proba: bool = False,
+         resume: bool = False, version: str = None, id_column: str = None) -> dict:
+    bulk_cfg = config.get("bulk", {})
+    fmt = fmt or ("parquet" if output_path.endswith((".parquet", os.sep)) else "jsonl")
+    chunksize = chunksize or bulk_cfg.get("chunksize", 5000)
+    workers = workers or bulk_cfg.get("workers") or os.cpu_count()
+    options = {
+        "explain": explain or bulk_cfg.get("explain", "none"),
+        "top_k": top_k,
+        "include_proba": include_proba,
+    }
+    predict._check_explain_mode(options["explain"])
+    version, _ = model_registry.resolve(version)
+
+    # The run's identity: resuming under different settings would mix outputs
+    run = {
+        "input": os.path.abspath(input_path),
+        "input_size": os.path.getsize(input_path),
+        "format": fmt,
+        "chunksize": chunksize,
+        "options": options,
+        "model_version": version,
+    }
+    checkpoint_path = output_path.rstrip(os.sep) + CHECKPOINT_SUFFIX
+    state = {**run, "chunks_done": 0, "rows_done": 0, "position": 0, "complete": False}
+    checkpoint = _read_checkpoint(checkpoint_path)
+    if checkpoint is not None:
+        if not resume:
+            raise ValueError(f"{checkpoint_path} exists; pass --resume to continue or remove it")
+        mismatched = [k for k in run if checkpoint.get(k) != run[k]]
+        if mismatched:
+            raise ValueError(f"Cannot resume: {', '.join(mismatched)} changed since the checkpoint")
+        if checkpoint.get("complete"):
+            print(f"[INFO] {output_path} is already complete ({checkpoint['rows_done']:,} rows)")
+            return checkpoint
+        state = checkpoint
+        print(f"[INFO] Resuming after chunk {state['chunks_done']} ({state['rows_done']:,} rows)")
+    elif os.path.exists(output_path):
+        raise ValueError(f"{output_path} exists without a checkpoint; refusing to overwrite it")
+
+    writer = ResultWriter(output_path, fmt, state["position"])
+    chunks = enumerate(iter_chunks(input_path, chunksize, id_column))
+    chunks = islice(chunks, state["chunks_done"], None)
+
+    print(f"[INFO] Scoring {input_path} with model version {version} on {workers} worker(s), "
+          f"{chunksize:,} rows per chunk → {output_path} ({fmt})")
+    t_start = time.perf_counter()
+    rows_this_run = 0
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(version, config.get("inference", {}).get("mmap_mode")),
+        )
+    else:
+        _init_worker(version, config.get("inference", {}).get("mmap_mode"))
+
+    try:
+        # At most 2 chunks per worker in flight: memory stays bounded and
+        # results are written (and checkpointed) strictly in input order
+        pending = deque()
+        max_pending = 2 * workers if pool is not None else 1
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                item = next(chunks, None)
+                if item is None:
+                    exhausted = True
+                    break
+                chunk_index, pairs = item
+                ids = [row_id for row_id, _ in pairs]
+                records = [record for _, record in pairs]
+                future = (
+                    pool.submit(_score_chunk, records, options)
+                    if pool is not None
+                    else _score_chunk(records, options)
+                )
+                pending.append((chunk_index, ids, future))
+            if not pending:
+                break
+
+            chunk_index, ids, future = pending.popleft()
+            results = future.result() if pool is not None else future
+            state["position"] = writer.write(chunk_index, _rows_out(state["rows_done"], ids, results))
+            state["chunks_done"] = chunk_index + 1
+            state["rows_done"] += len(results)
+            _write_checkpoint(checkpoint_path, state)
+
+            rows_this_run += len(results)
+            elapsed = time.perf_counter() - t_start
+            print(f"[INFO] chunk {chunk_index}: {state['rows_done']:,} rows written "
+                  f"({rows_this_run / elapsed:,.0f} rows/s)")
+    except Exception as e:
+        raise BulkScoringError(
+            f"scoring stopped after {state['chunks_done']} chunk(s) ({state['rows_done']:,} rows): {e!r}; "
+            "rerun with --resume to continue"
+        ) from e
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    state["complete"] = True
+    state["wall_s"] = round(time.perf_counter() - t_start, 3)
+    _write_checkpoint(checkpoint_path, state)
+    print(f"[INFO] Done: {state['rows_done']:,} rows in {state['wall_s']:.1f}s → {output_path}")
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Bulk scoring")
+    parser.add_argument("input", help="CSV (Data/ schema or predict() keywords) or JSONL records")
+    parser.add_argument("output", help="JSONL file, or Parquet dataset directory")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None,
+                        help="Output format (default: from the output path, else jsonl)")
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (1 = score in this process)")
+    parser.add_argument("--explain", choices=predict.EXPLAIN_MODES, default=None)
+    parser.add_argument("--top-k", type=int, default=0)
+    parser.add_argument("--include-proba", action="store_true")
+    parser.add_argument("--version", default=None, help="Model version (default: model/CURRENT)")
+    parser.add_argument("--id-column", default=None,
+                        help=f"Input column copied to the output id (default: first of {ID_COLUMNS})")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    args = parser.parse_args()
+
+    try:
+        main(
+            args.input,
+            args.output,
+            fmt=args.format,
+            chunksize=args.chunksize,
+            workers=args.workers,
+            explain=args.explain,
+            top_k=args.top_k,
+            include_proba=args.include_proba,
+            resume=args.resume,
+            version=args.version,
+            id_column=args.id_column,
+        )
+    except BulkScoringError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        parser.error(str(e))
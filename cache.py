@@ -0,0 +1,102 @@
+"""
+AI Healthcare Triage Engine — Bounded TTL/LRU Store
+=====================================================
+Thread-safe in-memory key/value store with a maximum entry count (least
+recently used entries are evicted first) and per-entry time-to-live.
+Used by the serving layer for deferred explanations and cached results.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Parameters
+    ----------
+    max_entries : int   — entries kept before LRU eviction kicks in
+    ttl_s : float       — seconds an entry stays valid (None = no expiry)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data = OrderedDict()  # key → (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expires_at(self):
+        return time.monotonic() + self.ttl_s if self.ttl_s else None
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self._expires_at(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key, value) -> bool:
+        """Replace the value of a live entry, keeping its expiry; False if gone."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return False
+            self._data[key] = (entry[0], value)
+            return True
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                k for k, (expires_at, _) in self._data.items()
+                if expires_at is not None and expires_at <= now
+            ]
+            for k in expired:
+                del self._data[k]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,373 @@
+"""
+AI Healthcare Triage Engine — Forest Pruning & Distillation
+=============================================================
+Serving latency grows with the total number of tree nodes, and
+``model_params`` trains 3 × 200 trees of depth up to 30. This tool derives
+smaller candidates from a trained model (the teacher) without re-running
+``train.py``:
+
+  trees     the first k trees of every forest (the trees are i.i.d., so the
+            first k are as good a subset as any)
+  depth     every tree cut at a maximum depth; a cut node predicts the class
+            distribution it already stores
+  students  a smaller forest, or a HistGradientBoosting model, fitted to the
+            teacher's predictions on the training split
+
+Each candidate is scored on the held-out split of ``train.main`` (the
+teacher's own preprocessor and label encoders, test_size 0.2, random_state
+42, stratified on Disease): accuracy / F1 and agreement with the teacher per
+target, node count, artifact size, and single-row / batch latency. The
+report marks the F1 / single-row-latency frontier.
+
+``--emit NAME`` publishes a candidate as a new model version: a drop-in
+triage_model.joblib with its compiled_forest/ and metrics.json, next to the
+teacher's preprocessor, label encoders and specialty map. It is assembled in
+a staging directory, so the model/ working copy (which may hold unpublished
+train.py / retrain.py output) is never touched; ``--publish`` also makes the
+new version CURRENT. ``--emit auto`` picks the fastest candidate whose mean
+F1 is within ``distill.max_f1_drop`` of the teacher. Only forest candidates
+can be emitted: the compiled engine, shared-model workers and the SHAP
+explainer all read RandomForest trees.
+
+Usage:
+    python distill.py
+    python distill.py --emit auto --publish
+    python distill.py --version 20250101-120000 --emit trees_50_depth_16
+"""
+
+import os
+import copy
+import json
+import shutil
+import argparse
+import tempfile
+import warnings
+
+import numpy as np
+import joblib
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.multioutput import MultiOutputClassifier
+
+import model_registry
+from config_loader import config
+from sweep import mark_frontier, measure_latency
+from train import (
+    MODEL_DIR,
+    TARGET_NAMES,
+    load_engineered,
+    build_model,
+    export_compiled_forest,
+)
+
+warnings.filterwarnings("ignore")
+
+REPORT_PATH = os.path.join(MODEL_DIR, "distill_report.json")
+# Artifacts an emitted model is served with, taken from the teacher
+_TEACHER_ARTIFACTS = [f for f in model_registry.ARTIFACT_FILES if f != "triage_model.joblib"]
+
+
+# ── 1. Held-out split ─────────────────────────────────────────────────────────
+def load_split(path: str) -> dict:
+    """
+    ``train.main``'s train / test split of the features produced by the
+    teacher's own preprocessor and label encoders (in ``path``), so the test
+    rows are the ones the teacher never saw.
+    """
+    df = load_engineered()
+    preprocessor = joblib.load(os.path.join(path, "preprocessor.joblib"))
+    label_encoders = joblib.load(os.path.join(path, "label_encoders.joblib"))
+    X = preprocessor.transform(df).astype(np.float32)
+    y = np.column_stack([label_encoders[target].transform(df[target]) for target in TARGET_NAMES])
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y[:, 0]
+    )
+    print(f"[INFO] Split: {X_train.shape[0]:,} train / {X_test.shape[0]:,} test × {X.shape[1]} features")
+    return {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+
+def _dense(X):
+    return X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+
+
+# ── 2. Pruning ────────────────────────────────────────────────────────────────
+def cap_depth(tree, max_depth: int):
+    """
+    Copy of a fitted decision tree with every node at ``max_depth`` made a
+    leaf; nodes below it are dropped. Cut nodes keep their stored class
+    distribution, which is what they now predict.
+    """
+    tree = copy.deepcopy(tree)
+    state = tree.tree_.__getstate__()
+    nodes = state["nodes"]
+    left, right = nodes["left_child"], nodes["right_child"]
+
+    # sklearn numbers children after their parent, so one forward pass
+    # reaches every parent before its children
+    keep = np.zeros(len(nodes), dtype=bool)
+    depth = np.zeros(len(nodes), dtype=np.intp)
+    keep[0] = True
+    for i in range(len(nodes)):
+        if keep[i] and left[i] != -1 and depth[i] < max_depth:
+            keep[left[i]] = keep[right[i]] = True
+            depth[left[i]] = depth[right[i]] = depth[i] + 1
+
+    kept = np.flatnonzero(keep)
+    remap = np.full(len(nodes), -1, dtype=np.intp)
+    remap[kept] = np.arange(kept.size)
+    pruned = nodes[kept].copy()
+    internal = (pruned["left_child"] != -1) & (depth[kept] < max_depth)
+    pruned["left_child"] = np.where(internal, remap[pruned["left_child"]], -1)
+    pruned["right_child"] = np.where(internal, remap[pruned["right_child"]], -1)
+    pruned["feature"] = np.where(internal, pruned["feature"], -2)
+    pruned["threshold"] = np.where(internal, pruned["threshold"], -2.0)
+
+    state.update(
+        nodes=pruned,
+        values=state["values"][kept].copy(),
+        node_count=kept.size,
+        max_depth=int(depth[kept].max()),
+    )
+    tree.tree_.__setstate__(state)
+    return tree
+
+
+def prune(model, n_trees: int = None, max_depth: int = None):
+    """
+    The teacher with the first ``n_trees`` trees of every target's forest,
+    each cut at ``max_depth`` (None keeps all trees / full depth).
+    """
+    pruned = copy.copy(model)
+    pruned.estimators_ = []
+    for forest in model.estimators_:
+        forest = copy.copy(forest)
+        trees = forest.estimators_[:n_trees]
+        forest.estimators_ = [cap_depth(t, max_depth) for t in trees] if max_depth else list(trees)
+        forest.n_estimators = len(forest.estimators_)
+        pruned.estimators_.append(forest)
+    return pruned
+
+
+# ── 3. Students ───────────────────────────────────────────────────────────────
+def fit_student(spec: dict, X_train, teacher_labels: np.ndarray):
+    """
+    Fit a student to the teacher's labels: ``kind`` "forest" takes any
+    ``build_model`` override, "hgb" any ``HistGradientBoostingClassifier``
+    parameter (dense input).
+    """
+    params = {k: v for k, v in spec.items() if k not in ("name", "kind")}
+    kind = spec.get("kind", "forest")
+    if kind == "forest":
+        model = build_model(**params)
+        return model.fit(X_train, teacher_labels)
+    if kind == "hgb":
+        params.setdefault("random_state", config["model_params"]["random_state"])
+        model = MultiOutputClassifier(HistGradientBoostingClassifier(**params))
+        return model.fit(_dense(X_train), teacher_labels)
+    raise ValueError(f"Unknown student kind: {kind!r}")
+
+
+def is_forest(model) -> bool:
+    return all(isinstance(est, RandomForestClassifier) for est in model.estimators_)
+
+
+def count_nodes(model) -> int:
+    total = 0
+    for est in model.estimators_:
+        if isinstance(est, RandomForestClassifier):
+            total += sum(tree.tree_.node_count for tree in est.estimators_)
+        else:
+            total += sum(p.nodes.size for iteration in est._predictors for p in iteration)
+    return int(total)
+
+
+def candidates(teacher, cfg: dict) -> list:
+    """``(name, kind, params, build)`` for every candidate; ``build(data, teacher_train)`` fits it."""
+    out = [("teacher", "teacher", {}, lambda data, labels: teacher)]
+    n_trees_full = len(teacher.estimators_[0].estimators_)
+    subsets = [k for k in cfg.get("tree_subsets", [25, 50, 100]) if k < n_trees_full] + [None]
+    for n_trees in subsets:
+        for max_depth in cfg.get("depth_caps", [10, 16, 22]) + [None]:
+            if n_trees is None and max_depth is None:
+                continue
+            name = "_".join(
+                part for part in (
+                    f"trees_{n_trees}" if n_trees else "",
+                    f"depth_{max_depth}" if max_depth else "",
+                ) if part
+            )
+            out.append((
+                name, "pruned", {"n_trees": n_trees, "max_depth": max_depth},
+                lambda data, labels, k=n_trees, d=max_depth: prune(teacher, k, d),
+            ))
+    for i, spec in enumerate(cfg.get("students", [])):
+        name = spec.get("name") or f"{spec.get('kind', 'forest')}_{i}"
+        out.append((
+            name, "student", spec,
+            lambda data, labels, spec=spec: fit_student(spec, data["X_train"], labels),
+        ))
+    return out
+
+
+# ── 4. Evaluation ─────────────────────────────────────────────────────────────
+def evaluate_candidate(model, data: dict, teacher_test: np.ndarray,
+                       batch_size: int = 256, repeats: int = 50) -> dict:
+    """Held-out scores, teacher agreement, size and latency of one candidate."""
+    X_test = data["X_test"] if is_forest(model) else _dense(data["X_test"])
+    y_test = data["y_test"]
+    y_pred = model.predict(X_test)
+    scores = {}
+    for i, target in enumerate(TARGET_NAMES):
+        scores[target] = {
+            "accuracy": round(accuracy_score(y_test[:, i], y_pred[:, i]), 4),
+            "f1_weighted": round(f1_score(y_test[:, i], y_pred[:, i], average="weighted"), 4),
+            "teacher_agreement": round(float(np.mean(y_pred[:, i] == teacher_test[:, i])), 4),
+        }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "triage_model.joblib")
+        joblib.dump(model, path)
+        model_mb = os.path.getsize(path) / (1024 * 1024)
+
+    return {
+        "metrics": scores,
+        "mean_f1_weighted": round(float(np.mean([s["f1_weighted"] for s in scores.values()])), 4),
+        "n_nodes": count_nodes(model),
+        "model_mb": round(model_mb, 2),
+        "latency": measure_latency(model, X_test, batch_size, repeats),
+        "emittable": is_forest(model),
+    }
+
+
+def choose(results: list, max_f1_drop: float):
+    """Fastest emittable candidate whose mean F1 is within ``max_f1_drop`` of the teacher."""
+    teacher_f1 = next(r["mean_f1_weighted"] for r in results if r["name"] == "teacher")
+    eligible = [
+        r for r in results
+        if r["emittable"] and r["name"] != "teacher"
+        and r["mean_f1_weighted"] >= teacher_f1 - max_f1_drop
+    ]
+    return min(eligible, key=lambda r: r["latency"]["single_ms_p50"]) if eligible else None
+
+
+# ── 5. Emission ───────────────────────────────────────────────────────────────
+def emit_model(model, result: dict, teacher_version: str, teacher_path: str,
+               activate: bool = False) -> str:
+    """
+    Publish ``model`` as a new model version with its compiled_forest/ and
+    metrics.json, plus the teacher's other artifacts; returns the version.
+    Files are staged in a temporary directory, never in model/ itself.
+    """
+    with tempfile.TemporaryDirectory(prefix=".distill-", dir=MODEL_DIR) as staging:
+        for fname in _TEACHER_ARTIFACTS:
+            shutil.copy2(os.path.join(teacher_path, fname), os.path.join(staging, fname))
+        joblib.dump(model, os.path.join(staging, "triage_model.joblib"))
+        export_compiled_forest(model, os.path.join(staging, "compiled_forest"))
+        metrics = {
+            **result["metrics"],
+            "distill": {
+                "candidate": result["name"],
+                "params": result["params"],
+                "teacher_version": teacher_version,
+                "n_nodes": result["n_nodes"],
+                "latency": result["latency"],
+            },
+        }
+        with open(os.path.join(staging, "metrics.json"), "w") as f:
+            json.dump(metrics, f, indent=2)
+        version = model_registry.publish(
+            staging, activate_version=activate,
+            note=f"distill.py {result['name']} of {teacher_version}",
+        )
+    print(f"[INFO] Emitted {result['name']} as model version {version}")
+    return version
+
+
+# ── 6. Main routine ───────────────────────────────────────────────────────────
+def main(version: str = None, emit: str = None, publish: bool = False,
+         output: str = REPORT_PATH) -> dict:
+    cfg = config.get("distill", {})
+    batch_size = cfg.get("latency_batch_size", 256)
+    repeats = cfg.get("latency_repeats", 50)
+
+    teacher_version, teacher_path = model_registry.resolve(version)
+    teacher = joblib.load(os.path.join(teacher_path, "triage_model.joblib"))
+    print(f"[INFO] Teacher: model version {teacher_version} ({count_nodes(teacher):,} nodes)")
+    data = load_split(teacher_path)
+    teacher_train = teacher.predict(data["X_train"])
+    teacher_test = teacher.predict(data["X_test"])
+
+    specs = candidates(teacher, cfg)
+    names = [name for name, _, _, _ in specs]
+    if emit not in (None, "auto") and emit not in names:
+        raise ValueError(f"Unknown candidate {emit!r}; choose from: {', '.join(names)}")
+
+    results = []
+    for name, kind, params, build in specs:
+        model = build(data, teacher_train)
+        result = {"name": name, "kind": kind, "params": params,
+                  **evaluate_candidate(model, data, teacher_test, batch_size, repeats)}
+        results.append(result)
+        print(f"[INFO] {name:<24} F1 {result['mean_f1_weighted']:.4f}  |  {result['n_nodes']:>9,} nodes  |  "
+              f"{result['model_mb']:6.1f} MiB  |  1 row {result['latency']['single_ms_p50']:.2f} ms")
+        del model
+    mark_frontier(results)
+
+    chosen = None
+    if emit == "auto":
+        chosen = choose(results, cfg.get("max_f1_drop", 0.002))
+        if chosen is None:
+            print("[WARN] No forest candidate is within distill.max_f1_drop of the teacher; nothing emitted")
+    elif emit is not None:
+        chosen = next(r for r in results if r["name"] == emit)
+        if not chosen["emittable"]:
+            raise ValueError(
+                f"{emit!r} is not a RandomForest model; the compiled engine and the SHAP "
+                "explainer need forest trees, so only forest candidates can be emitted"
+            )
+
+    report = {
+        "teacher_version": teacher_version,
+        "n_train": int(data["X_train"].shape[0]),
+        "n_test": int(data["X_test"].shape[0]),
+        "candidates": results,
+        "emitted": chosen["name"] if chosen else None,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'candidate':<24} {'F1':>7} {'agree':>7} {'nodes':>10} {'MiB':>7} {'1-row ms':>9} {'batch ms':>9}")
+    for r in sorted(results, key=lambda r: r["latency"]["single_ms_p50"]):
+        agreement = np.mean([s["teacher_agreement"] for s in r["metrics"].values()])
+        print(f"{r['name']:<24} {r['mean_f1_weighted']:>7.4f} {agreement:>7.4f} {r['n_nodes']:>10,} "
+              f"{r['model_mb']:>7.1f} {r['latency']['single_ms_p50']:>9.2f} {r['latency']['batch_ms_p50']:>9.2f}"
+              f"{'  *' if r['on_frontier'] else ''}")
+    print("\n[INFO] * = on the F1 / single-row latency frontier")
+    print(f"[INFO] Report saved to {output}")
+
+    if chosen is not None:
+        build = specs[names.index(chosen["name"])][3]
+        emit_model(build(data, teacher_train), chosen, teacher_version, teacher_path, activate=publish)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Forest pruning & distillation")
+    parser.add_argument("--version", default=None,
+                        help="Teacher model version (default: model/CURRENT, else model/)")
+    parser.add_argument("--emit", default=None,
+                        help="Candidate to publish as a new model version (model/ is left alone), or 'auto'")
+    parser.add_argument("--publish", action="store_true",
+                        help="Also make the emitted model version CURRENT")
+    parser.add_argument("--output", default=REPORT_PATH,
+                        help="Where to write the JSON report")
+    args = parser.parse_args()
+    if args.publish and not args.emit:
+        parser.error("--publish needs --emit")
+
+    try:
+        main(version=args.version, emit=args.emit, publish=args.publish, output=args.output)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,327 @@
+"""
+AI Healthcare Triage Engine — Lightweight Online Preprocessing
+================================================================
+Re-implements the fitted training ``ColumnTransformer``
+(StandardScaler + OneHotEncoder + TfidfVectorizer) from its extracted
+parameters, building the feature matrix straight from request rows with
+NumPy / scipy.sparse — no per-request DataFrame or column dispatch.
+
+The output is bit-for-bit identical to ``preprocessor.transform(df)``;
+``verify_predictions.py`` checks this against the real transformer.
+
+Symptom text is a small set of recurring comma-separated phrases, so with
+``text_cache_size`` > 0 the text block is served from two caches:
+
+  - a symptom-set cache: the normalized phrase multiset (order-insensitive)
+    → the finished TF-IDF row
+  - a phrase table: phrase → (term index, count) pairs, seeded with every
+    vocabulary term, so a new combination of known phrases skips the
+    regex analyzer entirely
+
+Both are exact: tokens never span a comma, and every row is weighted and
+normalized on its own.
+"""
+
+import re
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from cache import TTLCache
+
+# Phrase splitting is only exact when no token can contain or span a comma
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+class FastPreprocessor:
+    """
+    Parameters
+    ----------
+    numeric_columns : list      — columns scaled by (x - mean) / scale
+    mean, scale : ndarray       — StandardScaler ``mean_`` / ``scale_``
+    categorical_column : str    — the one-hot encoded column
+    categories : list           — OneHotEncoder ``categories_[0]``
+    text_column : str           — free-text column fed to TF-IDF
+    vocabulary : dict           — term → column index
+    idf : ndarray               — TfidfVectorizer ``idf_``
+    token_pattern : str
+    stop_words : frozenset
+    lowercase : bool
+    norm : str                  — "l2", "l1" or None
+    sparse_output : bool        — ColumnTransformer ``sparse_output_``
+    text_cache_size : int       — symptom sets kept in the TF-IDF row cache
+                                  (0 disables both symptom caches)
+    phrase_table_size : int     — phrases kept in the phrase table
+    """
+
+    def __init__(
+        self,
+        numeric_columns,
+        mean,
+        scale,
+        categorical_column,
+        categories,
+        text_column,
+        vocabulary,
+        idf,
+        token_pattern,
+        stop_words,
+        lowercase=True,
+        norm="l2",
+        sparse_output=True,
+        text_cache_size=0,
+        phrase_table_size=16384,
+    ):
+        self.numeric_columns = list(numeric_columns)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.categorical_column = categorical_column
+        self.category_index = {c: i for i, c in enumerate(categories)}
+        self.n_categories = len(categories)
+        self.text_column = text_column
+        self.vocabulary = dict(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.token_pattern = re.compile(token_pattern)
+        self.stop_words = frozenset(stop_words or ())
+        self.lowercase = lowercase
+        self.norm = norm
+        self.sparse_output = sparse_output
+        self.n_features_out = len(self.numeric_columns) + self.n_categories + len(self.idf)
+
+        self.text_cache = None
+        self.phrase_table = None
+        if text_cache_size and token_pattern == DEFAULT_TOKEN_PATTERN:
+            self.text_cache = TTLCache(max_entries=text_cache_size)
+            self.phrase_table = TTLCache(max_entries=max(phrase_table_size, len(self.vocabulary)))
+            for term, j in self.vocabulary.items():
+                if self.analyze(term) == [term]:
+                    self.phrase_table.set(term, ((j, 1),))
+
+    @classmethod
+    def from_column_transformer(cls, ct, **cache_kwargs) -> "FastPreprocessor":
+        """
+        Extract fitted parameters from the training ColumnTransformer.
+        Raises ``ValueError`` if its layout is not the one ``train.py`` builds.
+        ``cache_kwargs``: ``text_cache_size`` / ``phrase_table_size``.
+        """
+        parts = {name: (transformer, columns) for name, transformer, columns in ct.transformers_}
+        try:
+            scaler, numeric_columns = parts["num"]
+            encoder, categorical_columns = parts["cat"]
+            vectorizer, text_column = parts["text"]
+        except KeyError as e:
+            raise ValueError(f"Unsupported preprocessor layout: missing {e}")
+
+        if [name for name, _, _ in ct.transformers_ if name != "remainder"] != ["num", "cat", "text"]:
+            raise ValueError("Unsupported preprocessor layout: unexpected transformer order")
+        if len(categorical_columns) != 1 or getattr(encoder, "handle_unknown", None) != "ignore":
+            raise ValueError("Unsupported OneHotEncoder configuration")
+        if getattr(encoder, "drop_idx_", None) is not None or getattr(encoder, "_infrequent_enabled", False):
+            raise ValueError("Unsupported OneHotEncoder configuration")
+        if (
+            vectorizer.analyzer != "word"
+            or vectorizer.ngram_range != (1, 1)
+            or vectorizer.tokenizer is not None
+            or vectorizer.preprocessor is not None
+            or vectorizer.strip_accents is not None
+            or vectorizer.binary
+            or vectorizer.sublinear_tf
+            or not vectorizer.use_idf
+        ):
+            raise ValueError("Unsupported TfidfVectorizer configuration")
+
+        return cls(
+            numeric_columns=numeric_columns,
+            mean=scaler.mean_ if scaler.with_mean else None,
+            scale=scaler.scale_ if scaler.with_std else None,
+            categorical_column=categorical_columns[0],
+            categories=encoder.categories_[0].tolist(),
+            text_column=text_column,
+            vocabulary=vectorizer.vocabulary_,
+            idf=vectorizer.idf_,
+            token_pattern=vectorizer.token_pattern,
+            stop_words=vectorizer.get_stop_words(),
+            lowercase=vectorizer.lowercase,
+            norm=vectorizer.norm,
+            sparse_output=ct.sparse_output_,
+            **cache_kwargs,
+        )
+
+    # ── per-block transforms ────────────────────────────────────────────────
+    def analyze(self, text: str) -> list:
+        """Same tokens as ``TfidfVectorizer.build_analyzer()(text)``."""
+        if self.lowercase:
+            text = text.lower()
+        return [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+
+    def _numeric(self, rows: list) -> np.ndarray:
+        X = np.array([[row[c] for c in self.numeric_columns] for row in rows], dtype=np.float64)
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    def _one_hot(self, rows: list) -> np.ndarray:
+        X = np.zeros((len(rows), self.n_categories), dtype=np.float64)
+        for i, row in enumerate(rows):
+            j = self.category_index.get(row[self.categorical_column])
+            if j is not None:  # handle_unknown="ignore" → all zeros
+                X[i, j] = 1.0
+        return X
+
+    # ── symptom text ────────────────────────────────────────────────────────
+    def symptom_key(self, text: str) -> tuple:
+        """Order-insensitive key of a symptom string: its sorted, normalized phrases."""
+        if self.lowercase:
+            text = text.lower()
+        return tuple(sorted(filter(None, (" ".join(p.split()) for p in text.split(",")))))
+
+    def _phrase_terms(self, phrase: str) -> tuple:
+        terms = self.phrase_table.get(phrase)
+        if terms is None:
+            counts = Counter(self.vocabulary[t] for t in self.analyze(phrase) if t in self.vocabulary)
+            terms = tuple(sorted(counts.items()))
+            self.phrase_table.set(phrase, terms)
+        return terms
+
+    def term_counts(self, text: str, key: tuple = None) -> list:
+        """Sorted ``(term index, count)`` pairs of the in-vocabulary tokens of ``text``."""
+        if self.phrase_table is None:
+            counts = Counter(self.vocabulary[t] for t in self.analyze(text) if t in self.vocabulary)
+            return sorted(counts.items())
+        counts = Counter()
+        for phrase in key if key is not None else self.symptom_key(text):
+            for j, n in self._phrase_terms(phrase):
+                counts[j] += n
+        return sorted(counts.items())
+
+    def _term_counts(self, texts: list, keys: list = None) -> sp.csr_matrix:
+        """Raw term counts with sorted column indices (CountVectorizer layout)."""
+        indices, values, indptr = [], [], [0]
+        for i, text in enumerate(texts):
+            for j, n in self.term_counts(text, keys[i] if keys is not None else None):
+                indices.append(j)
+                values.append(n)
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (
+                np.asarray(values, dtype=np.float64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int32),
+            ),
+            shape=(len(texts), len(self.idf)),
+        )
+
+    def _tfidf(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        counts.data *= self.idf[counts.indices]
+        if self.norm is not None:
+            _normalize_rows(counts, self.norm)
+        return counts
+
+    def _text_features(self, texts: list) -> sp.csr_matrix:
+        """TF-IDF block, served from the symptom-set cache where possible."""
+        if self.text_cache is None:
+            return self._tfidf(self._term_counts(texts))
+
+        keys = [self.symptom_key(text) for text in texts]
+        cached = [self.text_cache.get(key) for key in keys]
+        misses = {}  # key → first position; repeats within a batch are computed once
+        for i, row in enumerate(cached):
+            if row is None:
+                misses.setdefault(keys[i], i)
+        if misses:
+            positions = list(misses.values())
+            X = self._tfidf(self._term_counts([texts[i] for i in positions], [keys[i] for i in positions]))
+            for n, (key, i) in enumerate(misses.items()):
+                lo, hi = X.indptr[n], X.indptr[n + 1]
+                row = (X.indices[lo:hi].copy(), X.data[lo:hi].copy())
+                self.text_cache.set(key, row)
+                cached[i] = row
+            for i, row in enumerate(cached):
+                if row is None:
+                    cached[i] = cached[misses[keys[i]]]
+
+        indptr = np.zeros(len(texts) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(indices) for indices, _ in cached])
+        return sp.csr_matrix(
+            (
+                np.concatenate([data for _, data in cached]) if cached else np.zeros(0),
+                np.concatenate([indices for indices, _ in cached]) if cached else np.zeros(0, np.int32),
+                indptr,
+            ),
+            shape=(len(texts), len(self.idf)),
+        )
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the symptom-set cache and phrase table (None when off)."""
+        if self.text_cache is None:
+            return None
+        return {"symptom_sets": self.text_cache.stats(), "phrases": self.phrase_table.stats()}
+
+    # ── public API ──────────────────────────────────────────────────────────
+    def transform(self, rows: list):
+        """
+        Feature matrix for ``rows`` (dicts keyed by training column names,
+        as produced by ``predict._record_to_row``).
+        """
+        blocks = [
+            self._numeric(rows),
+            self._one_hot(rows),
+            self._text_features([row[self.text_column] for row in rows]),
+        ]
+        if self.sparse_output:
+            return _hstack_csr(blocks)
+        return np.hstack([b.toarray() if sp.issparse(b) else b for b in blocks])
+
+
+def _normalize_rows(X: sp.csr_matrix, norm: str):
+    """
+    In-place row normalization of a CSR matrix, reproducing
+    ``sklearn.preprocessing.normalize`` bit for bit: each row's norm is
+    accumulated sequentially in index order, as its Cython kernels do.
+    """
+    if norm not in ("l1", "l2"):
+        raise ValueError(f"Unsupported norm: {norm!r}")
+    row_nnz = np.diff(X.indptr)
+    terms = X.data * X.data if norm == "l2" else np.abs(X.data)
+
+    norms = np.zeros(X.shape[0], dtype=np.float64)
+    for k in range(int(row_nnz.max()) if row_nnz.size else 0):
+        has_k = row_nnz > k
+        norms[has_k] += terms[X.indptr[:-1][has_k] + k]
+    if norm == "l2":
+        norms = np.sqrt(norms)
+    norms[norms == 0.0] = 1.0
+    X.data /= np.repeat(norms, row_nnz)
+
+
+def _hstack_csr(blocks: list) -> sp.csr_matrix:
+    """
+    ``scipy.sparse.hstack(blocks).tocsr()`` for dense/CSR blocks, built
+    directly: zero entries are dropped and columns stay sorted per row.
+    """
+    rows, cols, data = [], [], []
+    offset = 0
+    for block in blocks:
+        if sp.issparse(block):
+            coo = block.tocoo()
+            r, c, d = coo.row, coo.col, coo.data
+        else:
+            r, c = np.nonzero(block)
+            d = block[r, c]
+        rows.append(r)
+        cols.append(c + offset)
+        data.append(d)
+        offset += block.shape[1]
+
+    rows = np.concatenate(rows)
+    # Stable sort by row keeps each row's entries in block (= column) order
+    order = np.argsort(rows, kind="stable")
+    n_rows = blocks[0].shape[0]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_rows))])
+    return sp.csr_matrix(
+        (np.concatenate(data)[order], np.concatenate(cols)[order].astype(np.int32), indptr),
+        shape=(n_rows, offset),
+    )
@@ -0,0 +1,132 @@
+"""
+AI Healthcare Triage Engine — Inference Worker Pool
+=====================================================
+Bounded thread/process pool that runs blocking sklearn + SHAP inference off
+the asyncio event loop, so slow predictions cannot starve other requests
+(health checks included).
+
+Admission is limited to ``max_workers + max_queue`` outstanding jobs; callers
+beyond that get ``PoolSaturatedError`` immediately (mapped to HTTP 429 by the
+backend) instead of queueing without bound.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the pool already holds its maximum number of jobs."""
+
+
+class InferencePool:
+    """
+    Parameters
+    ----------
+    executor : str          — "thread" or "process"
+    max_workers : int       — concurrent inference jobs
+    max_queue : int         — jobs allowed to wait for a free worker
+    request_timeout_s : float — per-job timeout seen by the caller
+    initializer : callable  — optional per-worker setup (process pools)
+    """
+
+    def __init__(
+        self,
+        executor: str = "thread",
+        max_workers: int = 2,
+        max_queue: int = 32,
+        request_timeout_s: float = 10.0,
+        initializer=None,
+    ):
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=initializer
+            )
+        elif executor == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="inference",
+                initializer=initializer,
+            )
+        else:
+            raise ValueError(f"Unknown executor type: {executor!r}")
+
+        self.kind = executor
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.capacity = max_workers + max_queue
+        self.request_timeout_s = request_timeout_s
+
+        # Released from the executor's completion callback rather than by the
+        # awaiting coroutine, so a timed-out job keeps its slot until the
+        # worker has actually finished it.
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    @classmethod
+    def from_config(cls, serving_cfg: dict, initializer=None) -> "InferencePool":
+        return cls(
+            executor=serving_cfg.get("executor", "thread"),
+            max_workers=serving_cfg.get("max_workers", 2),
+            max_queue=serving_cfg.get("max_queue", 32),
+            request_timeout_s=serving_cfg.get("request_timeout_s", 10.0),
+            initializer=initializer,
+        )
+
+    def _release(self, _future):
+        with self._lock:
+            self._outstanding -= 1
+            self._completed += 1
+        self._slots.release()
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` on a worker and await its result.
+
+        Raises ``PoolSaturatedError`` if no slot is free and
+        ``asyncio.TimeoutError`` if the job exceeds ``request_timeout_s``.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturatedError(
+                f"Inference pool saturated ({self.capacity} jobs outstanding)"
+            )
+
+        with self._lock:
+            self._outstanding += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.request_timeout_s
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executor": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "outstanding": self._outstanding,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,172 @@
+"""
+AI Healthcare Triage Engine — Versioned Model Artifacts
+=========================================================
+Published model versions live under model/:
+
+    model/versions/<version>/   triage_model.joblib, preprocessor.joblib,
+                                label_encoders.joblib, specialty_map.joblib,
+                                compiled_forest/, metrics.json, version.json
+    model/CURRENT               name of the version serving should load
+
+``train.py`` / ``retrain.py`` keep writing into model/ itself, which acts as
+the working copy; ``publish`` snapshots it into a new version directory and
+(optionally) points CURRENT at it. Without a CURRENT file, serving reads
+model/ directly and reports the version as "unversioned".
+
+Usage:
+    python model_registry.py list
+    python model_registry.py publish [--version NAME] [--no-activate]
+    python model_registry.py activate NAME
+"""
+
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime, timezone
+
+from config_loader import config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, config["paths"]["model_dir"])
+VERSIONS_DIR = os.path.join(MODEL_DIR, "versions")
+CURRENT_FILE = os.path.join(MODEL_DIR, "CURRENT")
+
+UNVERSIONED = "unversioned"
+
+ARTIFACT_FILES = (
+    "triage_model.joblib",
+    "preprocessor.joblib",
+    "label_encoders.joblib",
+    "specialty_map.joblib",
+)
+# Copied along when present
+OPTIONAL_ARTIFACTS = ("compiled_forest", "metrics.json")
+
+
+def version_dir(version: str) -> str:
+    """Directory holding ``version``'s artifacts."""
+    if version in (None, UNVERSIONED):
+        return MODEL_DIR
+    if not version or os.sep in version or version.startswith(".") or version.endswith(".tmp"):
+        raise ValueError(f"Invalid model version name: {version!r}")
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def current_version() -> str:
+    """Version named in model/CURRENT, or None when serving is unversioned."""
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve(version: str = None) -> tuple:
+    """
+    ``(version, directory)`` to load: the requested version, else CURRENT,
+    else model/ itself. Raises ``ValueError`` for unknown versions.
+    """
+    version = version or current_version() or UNVERSIONED
+    path = version_dir(version)
+    if not os.path.exists(os.path.join(path, "preprocessor.joblib")):
+        raise ValueError(f"Unknown model version: {version!r}")
+    return version, path
+
+
+def list_versions() -> list:
+    """Manifest of every published version, oldest first."""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    current = current_version()
+    versions = []
+    for name in sorted(os.listdir(VERSIONS_DIR)):
+        manifest = os.path.join(VERSIONS_DIR, name, "version.json")
+        if not os.path.exists(manifest):
+            continue  # incomplete publish
+        with open(manifest) as f:
+            info = json.load(f)
+        info["current"] = name == current
+        versions.append(info)
+    return versions
+
+
+def activate(version: str):
+    """Atomically point model/CURRENT at an existing published version."""
+    path = version_dir(version)
+    if version == UNVERSIONED:
+        if os.path.exists(CURRENT_FILE):
+            os.remove(CURRENT_FILE)
+        return
+    if not os.path.exists(os.path.join(path, "version.json")):
+        raise ValueError(f"Unknown model version: {version!r}")
+    with open(CURRENT_FILE + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(CURRENT_FILE + ".tmp", CURRENT_FILE)
+
+
+def publish(src_dir: str = MODEL_DIR, version: str = None, activate_version: bool = True,
+            note: str = None) -> str:
+    """
+    Snapshot the artifacts in ``src_dir`` as a new version. The directory is
+    assembled under a temporary name and renamed into place, so readers
+    never see a partial version.
+    """
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    dest = version_dir(version)
+    if os.path.exists(dest):
+        raise ValueError(f"Model version {version!r} already exists")
+
+    staging = dest + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for fname in ARTIFACT_FILES:
+        shutil.copy2(os.path.join(src_dir, fname), os.path.join(staging, fname))
+    for name in OPTIONAL_ARTIFACTS:
+        src = os.path.join(src_dir, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(staging, name))
+        elif os.path.exists(src):
+            shutil.copy2(src, os.path.join(staging, name))
+
+    with open(os.path.join(staging, "version.json"), "w") as f:
+        json.dump(
+            {
+                "version": version,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "source": os.path.relpath(src_dir, BASE_DIR),
+                "note": note,
+            },
+            f,
+            indent=2,
+        )
+    os.replace(staging, dest)
+
+    if activate_version:
+        activate(version)
+    print(f"[INFO] Published model version {version}{' (active)' if activate_version else ''}")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Model versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List published versions")
+    p_publish = sub.add_parser("publish", help="Snapshot model/ as a new version")
+    p_publish.add_argument("--version", default=None, help="Version name (default: UTC timestamp)")
+    p_publish.add_argument("--note", default=None)
+    p_publish.add_argument("--no-activate", action="store_true", help="Do not update CURRENT")
+    p_activate = sub.add_parser("activate", help="Point CURRENT at a version")
+    p_activate.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for info in list_versions():
+            print(f"{'*' if info['current'] else ' '} {info['version']}  {info['created']}  {info.get('note') or ''}")
+        if current_version() is None:
+            print(f"* {UNVERSIONED} (model/)")
+    elif args.command == "publish":
+        publish(version=args.version, activate_version=not args.no_activate, note=args.note)
+    else:
+        activate(args.version)
+        print(f"[INFO] CURRENT → {args.version}")
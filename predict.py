@@ -1,47 +1,544 @@
 """
 AI Healthcare Triage Engine — Prediction Interface
 ====================================================
-Loads the trained model from model/ and exposes a ``predict()`` function that
+Loads the trained model from model/ (or the published version named in
+model/CURRENT, see model_registry.py) and exposes a ``predict()`` function that
 returns structured JSON with disease prediction, risk level, confidence scores,
 and SHAP-based feature-importance explanations.
 """
 
 import os
+import copy
 import json
+import math
 import argparse
+import threading
+import time
 import warnings
 import numpy as np
 import pandas as pd
 import joblib
 
+import model_registry
+import rules
 from config_loader import config
+from cache import TTLCache
+from fast_preprocessor import FastPreprocessor
+from model_registry import ARTIFACT_FILES
+import response_index
+from response_index import ResponseIndex
+from telemetry import BATCH_ROWS, STAGE_SECONDS
 
 warnings.filterwarnings("ignore")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, config["paths"]["model_dir"])
 
-# ── Lazy-loaded singletons ────────────────────────────────────────────────────
-_model = None
-_preprocessor = None
-_label_encoders = None
-_specialty_map = None
+TARGET_NAMES = ["Disease", "Normal_Abnormal", "Risk_Level"]
+# Targets that inference.rule_targets derives from vitals instead of the forest
+RULE_TARGETS = ("Normal_Abnormal", "Risk_Level")
 
+_MISSING = object()
 
-def _load_artifacts():
-    """Load model, preprocessor, label encoders, and specialty map once."""
-    global _model, _preprocessor, _label_encoders, _specialty_map
-    if _model is None:
-        _model = joblib.load(os.path.join(MODEL_DIR, "triage_model.joblib"))
-        _preprocessor = joblib.load(os.path.join(MODEL_DIR, "preprocessor.joblib"))
-        _label_encoders = joblib.load(os.path.join(MODEL_DIR, "label_encoders.joblib"))
-        _specialty_map = joblib.load(os.path.join(MODEL_DIR, "specialty_map.joblib"))
+# ── Compiled forest ────────────────────────────────────────────────────────────
+COMPILED_FOREST_DIR = os.path.join(MODEL_DIR, "compiled_forest")
+_COMPILED_ARRAYS = ("feature", "threshold", "left", "right", "value", "weight", "roots")
+
+
+class CompiledTreeEnsemble:
+    """
+    One target's RandomForest flattened by ``train.export_compiled_forest``.
+    Mirrors the parts of the sklearn estimator that predict.py uses
+    (``classes_``, ``feature_importances_``, ``predict_proba``).
+    """
+
+    # Rows scored per traversal, bounding the (n_trees × rows) index arrays
+    chunk_size = 4096
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.weight = arrays["weight"]
+        self.roots = arrays["roots"]
+        self.max_depth = meta["max_depth"]
+        self.n_features_in_ = meta["n_features"]
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_classes_ = len(self.classes_)
+        self.feature_importances_ = np.asarray(meta["feature_importances"])
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached in every tree, shape (n_trees, n_rows)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+
+        # One (tree, row) pair per slot; only pairs not yet at a leaf stay
+        # active, so each step costs what is left of the traversal.
+        nodes = np.repeat(self.roots, n_rows)
+        row_offsets = np.tile(np.arange(n_rows) * n_features, len(self.roots))
+        active = np.arange(nodes.size)
+        current = nodes
+        for _ in range(self.max_depth):
+            left = self.left[current]
+            internal = left != current  # leaves point to themselves
+            if not internal.all():
+                active, current, left = active[internal], current[internal], left[internal]
+                if not active.size:
+                    break
+            go_left = (
+                flat_X[row_offsets[active] + self.feature[current]]
+                <= self.threshold[current]
+            )
+            current = np.where(go_left, left, self.right[current])
+            nodes[active] = current
+        return nodes.reshape(len(self.roots), n_rows)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities; CSR input is densified one chunk at a time."""
+        if not hasattr(X, "toarray"):
+            X = np.asarray(X)
+        proba = np.empty((X.shape[0], self.n_classes_), dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_size):
+            block = X[start:start + self.chunk_size]
+            leaves = self.apply(block.toarray() if hasattr(block, "toarray") else block)
+            # Accumulate tree by tree, in the same order as sklearn
+            acc = np.zeros((leaves.shape[1], self.n_classes_), dtype=np.float64)
+            for tree_leaves in leaves:
+                acc += self.value[tree_leaves]
+            acc /= len(self.roots)
+            proba[start:start + self.chunk_size] = acc
+        return proba
+
+    def to_shap_model(self) -> dict:
+        """Tree list in the dict format accepted by ``shap.TreeExplainer``."""
+        ends = np.append(self.roots[1:], len(self.feature))
+        scaling = 1.0 / len(self.roots)
+        trees = []
+        for start, end in zip(self.roots, ends):
+            local = np.arange(end - start)
+            left = np.asarray(self.left[start:end]) - start
+            right = np.asarray(self.right[start:end]) - start
+            is_leaf = left == local
+            children_left = np.where(is_leaf, -1, left).astype(np.int32)
+            trees.append(
+                {
+                    "children_left": children_left,
+                    "children_right": np.where(is_leaf, -1, right).astype(np.int32),
+                    "children_default": children_left,
+                    "features": np.where(is_leaf, -2, self.feature[start:end]).astype(np.int32),
+                    "thresholds": np.asarray(self.threshold[start:end], dtype=np.float64),
+                    "values": np.asarray(self.value[start:end]) * scaling,
+                    "node_sample_weight": np.asarray(self.weight[start:end], dtype=np.float64),
+                }
+            )
+        return {"trees": trees}
+
+
+class CompiledForest:
+    """All targets of the exported forest; ``estimators_`` follows TARGET_NAMES."""
+
+    def __init__(self, path: str = COMPILED_FOREST_DIR, mmap_mode: str = None):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.estimators_ = []
+        for target in TARGET_NAMES:
+            arrays = {
+                name: np.load(os.path.join(path, f"{target}_{name}.npy"), mmap_mode=mmap_mode)
+                for name in _COMPILED_ARRAYS
+            }
+            self.estimators_.append(CompiledTreeEnsemble(arrays, meta["targets"][target]))
+
+
+# ── Loaded artifacts ──────────────────────────────────────────────────────────
+EXPLAIN_MODES = ("none", "fast", "shap")
+
+# Representative patient used to warm up a freshly loaded model
+WARMUP_RECORD = {
+    "age": 45,
+    "gender": "Male",
+    "symptoms": "Severe Chest Pain, Sweating, Shortness of Breath",
+    "blood_pressure": "150/95",
+    "heart_rate": 96,
+    "temperature": 99.1,
+}
+
+
+class ArtifactBundle:
+    """
+    One loaded model version: the artifacts plus the explanation and
+    preprocessing state derived from them.  Every request reads the module's
+    ``_bundle`` reference once and uses only that object, so a reload can
+    swap in a new version while in-flight requests finish on the old one.
+    """
+
+    def __init__(self, version, path, engine, model, preprocessor, label_encoders,
+                 specialty_map, signature):
+        self.version = version
+        self.path = path
+        self.engine = engine
+        self.model = model
+        self.preprocessor = preprocessor
+        self.label_encoders = label_encoders
+        self.specialty_map = specialty_map
+        self.signature = signature
+        # Disease class code → specialty (and the rest of the response fragment)
+        self._response_index = response_index.for_artifacts(label_encoders, specialty_map)
+        self._response_index.get()  # built now rather than on the first request
+
+        # Normal_Abnormal / Risk_Level decided by the vital-sign rules (exactly
+        # as training derives them) instead of their forests
+        self.rule_targets = _inference_cfg.get("rule_targets", False)
+        self.base_risk_codes = rules.base_risk_codes(label_encoders["Disease"].classes_)
+        self.rule_label_codes = {
+            "Normal_Abnormal": label_encoders["Normal_Abnormal"].transform(rules.NORMAL_ABNORMAL_LABELS),
+            "Risk_Level": label_encoders["Risk_Level"].transform(rules.RISK_LABELS),
+        }
+
+        self.feature_names = _get_feature_names(preprocessor)
+        self.global_importances = np.mean(
+            [est.feature_importances_ for est in model.estimators_], axis=0
+        )
+        self.explainer = _build_explainer(model)
+
+        # The exact token view the TfidfVectorizer has of a symptom string
+        text_vectorizer = preprocessor.named_transformers_["text"]
+        self.symptom_analyzer = text_vectorizer.build_analyzer()
+        self.symptom_vocabulary = text_vectorizer.vocabulary_
+
+        # Pandas-free transform rebuilt from the fitted parameters; the
+        # ColumnTransformer stays the fallback for unexpected layouts
+        self.fast_preprocessor = None
+        if _inference_cfg.get("preprocessing", "fast") == "fast":
+            symptom_cfg = _inference_cfg.get("symptom_cache", {})
+            cache_kwargs = (
+                {
+                    "text_cache_size": symptom_cfg.get("max_entries", 4096),
+                    "phrase_table_size": symptom_cfg.get("max_phrases", 16384),
+                }
+                if symptom_cfg.get("enabled", False)
+                else {}
+            )
+            try:
+                self.fast_preprocessor = FastPreprocessor.from_column_transformer(
+                    preprocessor, **cache_kwargs
+                )
+            except (ValueError, AttributeError):
+                self.fast_preprocessor = None
+
+    @property
+    def response_index(self) -> ResponseIndex:
+        """This version's response index, current with config.json."""
+        return self._response_index.get()
+
+
+# ── Result cache ──────────────────────────────────────────────────────────────
+# predict() is deterministic in its transformed input, so identical requests
+# (kiosk retries, resubmitted forms, common symptom sets) are served from an
+# LRU/TTL cache.  Entries are keyed on the artifact signature, so loading a
+# different model never returns results computed by the previous one.
+_inference_cfg = config.get("inference", {})
+_result_cache_cfg = _inference_cfg.get("result_cache", {})
+_result_cache = (
+    TTLCache(
+        max_entries=_result_cache_cfg.get("max_entries", 4096),
+        ttl_s=_result_cache_cfg.get("ttl_s", 600),
+    )
+    if _result_cache_cfg.get("enabled", False)
+    else None
+)
+
+_bundle = None
+_load_lock = threading.Lock()    # guards the first load and the swap
+_reload_lock = threading.Lock()  # one reload at a time
+_load_timings = {}
+
+# Following model/CURRENT: a changed pointer triggers a background reload
+_reload_cfg = _inference_cfg.get("reload", {})
+_watch_current = _reload_cfg.get("watch", False)
+_next_poll = 0.0
+
+# ── Server workers ────────────────────────────────────────────────────────────
+# Several server processes (serving.server_workers, or WEB_CONCURRENCY as
+# read by uvicorn and gunicorn) would each unpickle their own forests.  With
+# inference.shared_model they attach the compiled forest instead: its .npy
+# arrays are memory-mapped read-only, so every worker maps the same
+# page-cache copy and only the first one to touch a page reads it from disk.
+SERVER_WORKERS = max(
+    1, int(os.environ.get("WEB_CONCURRENCY") or config.get("serving", {}).get("server_workers", 1))
+)
+
+
+def shared_model() -> bool:
+    """True when this process is one of several server workers sharing the model."""
+    return SERVER_WORKERS > 1 and _inference_cfg.get("shared_model", True)
+
+
+def default_load_options(version: str = None) -> dict:
+    """
+    ``engine`` and ``mmap_mode`` for loads that do not name them: config
+    inference.engine / inference.mmap_mode, or the memory-mapped compiled
+    forest when ``shared_model()``.
+    """
+    options = {"engine": _inference_cfg.get("engine", "sklearn"), "mmap_mode": _inference_cfg.get("mmap_mode")}
+    if shared_model():
+        _, path = model_registry.resolve(version)
+        if os.path.exists(os.path.join(path, "compiled_forest", "meta.json")):
+            return {"engine": "compiled", "mmap_mode": "r"}
+        print(f"[WARN] {SERVER_WORKERS} server workers but no compiled_forest/ in {path}; "
+              "each worker loads its own copy of the model (run: python train.py --export-compiled)")
+    return options
+
+
+def _artifact_paths(engine: str) -> list:
+    """Files the given inference engine loads (relative to the version dir)."""
+    if engine == "compiled":
+        compiled = [os.path.join("compiled_forest", "meta.json")] + [
+            os.path.join("compiled_forest", f"{target}_{name}.npy")
+            for target in TARGET_NAMES
+            for name in _COMPILED_ARRAYS
+        ]
+        return [f for f in ARTIFACT_FILES if f != "triage_model.joblib"] + compiled
+    return list(ARTIFACT_FILES)
+
+
+def _read_artifact_signature(engine: str = "sklearn", path: str = MODEL_DIR) -> tuple:
+    """(name, mtime_ns, size) of every artifact file — changes on retrain."""
+    signature = []
+    for fname in _artifact_paths(engine):
+        st = os.stat(os.path.join(path, fname))
+        signature.append((fname, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _load_bundle(version: str = None, engine: str = None, mmap_mode: str = None):
+    """Read one model version from disk; returns ``(bundle, timings)``."""
+    engine = engine or _inference_cfg.get("engine", "sklearn")
+    version, path = model_registry.resolve(version)
+    timings = {}
+    t_start = time.perf_counter()
+    signature = (version,) + _read_artifact_signature(engine, path)
+
+    loaded = {}
+    for fname in ARTIFACT_FILES:
+        if engine == "compiled" and fname == "triage_model.joblib":
+            continue
+        t0 = time.perf_counter()
+        loaded[fname] = joblib.load(os.path.join(path, fname), mmap_mode=mmap_mode)
+        timings[fname] = time.perf_counter() - t0
+
+    if engine == "compiled":
+        t0 = time.perf_counter()
+        model = CompiledForest(os.path.join(path, "compiled_forest"), mmap_mode=mmap_mode)
+        timings["compiled_forest"] = time.perf_counter() - t0
+    else:
+        model = loaded["triage_model.joblib"]
+
+    t0 = time.perf_counter()
+    bundle = ArtifactBundle(
+        version=version,
+        path=path,
+        engine=engine,
+        model=model,
+        preprocessor=loaded["preprocessor.joblib"],
+        label_encoders=loaded["label_encoders.joblib"],
+        specialty_map=loaded["specialty_map.joblib"],
+        signature=signature,
+    )
+    timings["explainer"] = time.perf_counter() - t0
+    timings["total"] = time.perf_counter() - t_start
+
+    timings = {k: round(v, 4) for k, v in timings.items()}
+    timings.update(
+        {
+            "model_version": version,
+            "mmap_mode": mmap_mode,
+            "engine": engine,
+            "preprocessing": "fast" if bundle.fast_preprocessor is not None else "sklearn",
+        }
+    )
+    return bundle, timings
+
+
+def _warm_up(bundle: ArtifactBundle) -> float:
+    """Score WARMUP_RECORD once (incl. SHAP) on ``bundle``; returns seconds."""
+    t0 = time.perf_counter()
+    _score_rows(bundle, [_record_to_row(WARMUP_RECORD)], top_k=1, include_proba=True)
+    return round(time.perf_counter() - t0, 4)
+
+
+def load_artifacts(mmap_mode: str = None, warmup: bool = False, engine: str = None,
+                   version: str = None) -> dict:
+    """
+    Load model, preprocessor, label encoders, and specialty map once.
+
+    Parameters
+    ----------
+    engine : str        — "sklearn" (triage_model.joblib) or "compiled"
+                          (compiled_forest/ arrays); defaults to config
+                          inference.engine
+    mmap_mode : str     — passed to ``joblib.load`` (e.g. "r") so large numpy
+                          arrays are memory-mapped instead of copied
+    warmup : bool       — run one uncached prediction (incl. SHAP) so the
+                          first real request does not pay first-call costs
+    version : str       — model version to load (default: model/CURRENT, or
+                          model/ itself when unversioned)
+
+    Returns
+    -------
+    dict of per-stage load timings in seconds (see ``load_stats()``)
+    """
+    global _bundle
+    with _load_lock:
+        if _bundle is None:
+            bundle, timings = _load_bundle(version, engine, mmap_mode)
+            if _result_cache is not None:
+                _result_cache.clear()
+            _bundle = bundle
+            _load_timings.clear()
+            _load_timings.update(timings)
+
+        if warmup and "warmup" not in _load_timings:
+            _load_timings["warmup"] = _warm_up(_bundle)
+
+    return load_stats()
+
+
+def _reload(version: str = None, mmap_mode=_MISSING, warmup: bool = True, engine: str = None) -> dict:
+    global _bundle
+    previous = _bundle
+    if mmap_mode is _MISSING:
+        mmap_mode = _load_timings.get("mmap_mode", _inference_cfg.get("mmap_mode"))
+    engine = engine or (previous.engine if previous is not None else None)
+
+    # Load and warm up off to the side; requests keep using the old bundle
+    bundle, timings = _load_bundle(version, engine, mmap_mode)
+    if warmup:
+        timings["warmup"] = _warm_up(bundle)
+
+    with _load_lock:
+        _bundle = bundle
+        _load_timings.clear()
+        _load_timings.update(timings)
+    # Old entries are keyed on the previous signature and can never hit again
+    if _result_cache is not None:
+        _result_cache.clear()
+
+    previous_version = previous.version if previous is not None else None
+    print(f"[INFO] Model version {previous_version} → {bundle.version} "
+          f"(loaded in {timings['total']:.2f}s)")
+    return {"previous_version": previous_version, **load_stats()}
+
+
+def reload_artifacts(version: str = None, mmap_mode=_MISSING, warmup: bool = True,
+                     engine: str = None) -> dict:
+    """
+    Load ``version`` (default: model/CURRENT) in the calling thread, then
+    atomically make it the one new requests use.  Requests already running
+    finish on the previous version.  ``mmap_mode`` and ``engine`` default to
+    those of the current load.
+
+    Returns the new load timings plus ``previous_version``.
+    """
+    with _reload_lock:
+        return _reload(version, mmap_mode, warmup, engine)
+
+
+def preload_version(version: str = None, warmup: bool = True) -> dict:
+    """
+    Load (and warm up) ``version`` off to the side without serving it, e.g.
+    to check a version before activating it; returns its load timings.
+    """
+    bundle, timings = _load_bundle(version, **default_load_options(version))
+    if warmup:
+        timings["warmup"] = _warm_up(bundle)
+    return timings
+
+
+def _background_reload(version: str):
+    if not _reload_lock.acquire(blocking=False):
+        return  # a reload is already in progress
+    try:
+        if _bundle is None or _bundle.version != version:
+            _reload(version)
+    except Exception as e:
+        print(f"[WARN] Reloading model version {version!r} failed: {e!r}")
+    finally:
+        _reload_lock.release()
+
+
+def _poll_current_version():
+    """Start a background reload when model/CURRENT names another version."""
+    global _next_poll
+    now = time.monotonic()
+    if now < _next_poll:
+        return
+    _next_poll = now + _reload_cfg.get("poll_interval_s", 5.0)
+    target = model_registry.current_version() or model_registry.UNVERSIONED
+    if target != _bundle.version and not _reload_lock.locked():
+        threading.Thread(
+            target=_background_reload, args=(target,), name="model-reload", daemon=True
+        ).start()
+
+
+def _load_artifacts() -> ArtifactBundle:
+    """
+    Bundle for one request: lazy first load (see ``default_load_options``),
+    then — if inference.reload.watch is on — a throttled check of
+    model/CURRENT.
+    """
+    if _bundle is None:
+        load_artifacts(**default_load_options())
+    elif _watch_current:
+        _poll_current_version()
+    return _bundle
+
+
+def _init_worker():
+    """
+    Process-pool initializer: load (and, with inference.warmup, warm up) the
+    model before the worker takes its first job, then follow model/CURRENT.
+    """
+    global _watch_current
+    _watch_current = True
+    timings = load_artifacts(**default_load_options(), warmup=_inference_cfg.get("warmup", False))
+    print(
+        f"[INFO] Worker process {os.getpid()}: model version {timings['model_version']} "
+        f"loaded in {timings['total']:.2f}s"
+        + (f" (warm-up {timings['warmup']:.2f}s)" if "warmup" in timings else "")
+    )
+
+
+def response_index_for(version: str) -> ResponseIndex:
+    """
+    Response index for a result's ``model_version``: the loaded bundle's own
+    index when it serves that version, else (a process that scores on
+    worker processes, or a result from a version just swapped out) one built
+    from that version's label encoders and specialty map.
+    """
+    bundle = _bundle
+    if bundle is not None and bundle.version == version:
+        return bundle.response_index
+    return response_index.for_version(version)
+
+
+def model_version() -> str:
+    """Version currently serving requests (None before the first load)."""
+    return _bundle.version if _bundle is not None else None
+
+
+def load_stats() -> dict:
+    """Timings (seconds) of the last artifact load and warm-up."""
+    return dict(_load_timings)
 
 
 def _parse_bp(bp_string: str):
     """Parse '150/95' → (150.0, 95.0)."""
     parts = bp_string.strip().split("/")
-    return float(parts[0]), float(parts[1])
+    return _finite(parts[0], "blood_pressure"), _finite(parts[1], "blood_pressure")
 
 
 def _get_feature_names(preprocessor) -> list:
@@ -59,51 +556,377 @@ def _get_feature_names(preprocessor) -> list:
     return names
 
 
-def _get_explanation(model, preprocessor, X_transformed, top_n: int = 5) -> dict:
+def _build_explainer(model):
     """
-    Compute per-prediction feature importance using the RandomForest's
-    built-in feature_importances_ (averaged across the 3 output estimators).
-    Falls back gracefully if SHAP is unavailable.
+    Build the SHAP TreeExplainer for the Disease estimator (index 0) — it's
+    the most informative target.  Returns None if SHAP is unavailable.
     """
-    feature_names = _get_feature_names(preprocessor)
-
     try:
         import shap
 
-        # Use the Disease estimator (index 0) for explanation — it's the most
-        # informative target.  TreeExplainer is fast for RF.
         disease_estimator = model.estimators_[0]
-        explainer = shap.TreeExplainer(disease_estimator)
-        shap_values = explainer.shap_values(X_transformed)
-
-        # shap_values is a list (one array per class). Average absolute values
-        # across classes to get overall importance for this sample.
-        if isinstance(shap_values, list):
-            abs_shap = np.mean(
-                [np.abs(sv) for sv in shap_values], axis=0
-            )  # shape (1, n_features)
-        else:
-            abs_shap = np.abs(shap_values)
-
-        importances = abs_shap[0]
-        method = "shap"
+        if isinstance(disease_estimator, CompiledTreeEnsemble):
+            return shap.TreeExplainer(disease_estimator.to_shap_model())
+        return shap.TreeExplainer(disease_estimator)
     except Exception:
+        return None
+
+
+# Rows per SHAP call: bounds the dense copy of the CSR features and the
+# (rows × features × classes) SHAP output held at once
+SHAP_CHUNK_ROWS = 256
+
+
+def _shap_importances(explainer, X_transformed):
+    """Mean |SHAP| across Disease classes, shape (n_rows, n_features)."""
+    n_rows = X_transformed.shape[0]
+    if n_rows > SHAP_CHUNK_ROWS:
+        return np.vstack([
+            _shap_importances(explainer, X_transformed[start:start + SHAP_CHUNK_ROWS])
+            for start in range(0, n_rows, SHAP_CHUNK_ROWS)
+        ])
+
+    # TreeExplainer needs a dense matrix; the ColumnTransformer emits CSR
+    if hasattr(X_transformed, "toarray"):
+        X_transformed = X_transformed.toarray()
+    shap_values = explainer.shap_values(X_transformed)
+
+    # Older SHAP returns a list (one array per class), newer an array of shape
+    # (n_rows, n_features, n_classes). Average absolute values across classes
+    # to get overall importance for each sample.
+    if isinstance(shap_values, list):
+        return np.mean([np.abs(sv) for sv in shap_values], axis=0)
+    shap_values = np.abs(shap_values)
+    if shap_values.ndim == 3:
+        return shap_values.mean(axis=2)
+    return shap_values
+
+
+def _fast_importances(X_transformed, global_importances):
+    """
+    Cheap per-row attribution: the forest's global feature_importances_
+    weighted by the magnitude of each transformed feature in the row, so
+    symptoms the patient did not report and unremarkable vitals rank low.
+    """
+    if hasattr(X_transformed, "toarray"):
+        # Scale the stored entries only; zeros stay zero
+        return abs(X_transformed).multiply(global_importances).toarray()
+    return np.abs(X_transformed) * global_importances
+
+
+def _get_explanations(bundle, X_transformed, mode: str = "shap", top_n: int = 5) -> list:
+    """
+    Compute per-prediction feature importance for every row of
+    ``X_transformed`` with ``bundle``'s model.
+
+    mode="shap" uses the cached TreeExplainer on the Disease estimator and
+    falls back gracefully to the RandomForest's built-in feature_importances_
+    (averaged across the 3 output estimators) if SHAP is unavailable.
+    mode="fast" skips SHAP entirely (see ``_fast_importances``).
+    mode="none" returns None for every row.
+    """
+    n_rows = X_transformed.shape[0]
+    if mode == "none":
+        return [None] * n_rows
+
+    t0 = time.perf_counter()
+    importances = None
+    if mode == "shap" and bundle.explainer is not None:
+        try:
+            importances = _shap_importances(bundle.explainer, X_transformed)
+            method = "shap"
+        except Exception:
+            importances = None
+    if importances is None and mode == "fast":
+        importances = _fast_importances(X_transformed, bundle.global_importances)
+        method = "fast"
+    if importances is None:
         # Fallback: use the mean of per-estimator feature_importances_
-        importances = np.mean(
-            [est.feature_importances_ for est in model.estimators_], axis=0
-        )
+        importances = np.tile(bundle.global_importances, (n_rows, 1))
         method = "feature_importance"
 
-    # Build top-N list
-    top_idx = np.argsort(importances)[::-1][:top_n]
-    top_features = []
-    for idx in top_idx:
-        fname = feature_names[idx] if idx < len(feature_names) else f"feature_{idx}"
-        top_features.append(
-            {"feature": fname, "importance": round(float(importances[idx]), 4)}
+    feature_names = bundle.feature_names
+    explanations = []
+    for row_importances in importances:
+        # Build top-N list
+        top_idx = np.argsort(row_importances)[::-1][:top_n]
+        top_features = []
+        for idx in top_idx:
+            fname = feature_names[idx] if idx < len(feature_names) else f"feature_{idx}"
+            top_features.append(
+                {"feature": fname, "importance": round(float(row_importances[idx]), 4)}
+            )
+        explanations.append({"method": method, "top_features": top_features})
+
+    STAGE_SECONDS.observe(time.perf_counter() - t0, stage=f"explain_{method}")
+    return explanations
+
+
+def _get_explanation(bundle, X_transformed, mode: str = "shap", top_n: int = 5) -> dict:
+    """Explanation for a single-row ``X_transformed`` (see ``_get_explanations``)."""
+    return _get_explanations(bundle, X_transformed, mode=mode, top_n=top_n)[0]
+
+
+# ── Batch scoring core ─────────────────────────────────────────────────────────
+
+
+class InvalidRecordError(ValueError):
+    """A patient record that cannot be scored (missing, non-finite or malformed fields)."""
+
+
+# Exceptions raised by _record_to_row for malformed input
+_RECORD_ERRORS = (KeyError, ValueError, TypeError, IndexError, AttributeError)
+
+
+def _finite(value, name: str) -> float:
+    """``float(value)``, rejecting NaN and ±inf (the forest cannot score them)."""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number, got {value!r}")
+    return number
+
+
+def _text(value, name: str) -> str:
+    """Non-empty string field; None / NaN / numbers are rejected instead of stringified."""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} must be a non-empty string, got {value!r}")
+    return value
+
+
+def _record_to_row(record: dict) -> dict:
+    """
+    Validate one patient record and convert it to a training-schema row.
+    Raises ``KeyError`` / ``ValueError`` / ``TypeError`` for malformed input.
+    """
+    blood_pressure = _text(record["blood_pressure"], "blood_pressure")
+    systolic, diastolic = _parse_bp(blood_pressure)
+    return {
+        "Age": _finite(record["age"], "age"),
+        "Gender": _text(record["gender"], "gender"),
+        "Detailed_Symptoms": _text(record["symptoms"], "symptoms").strip().lower(),
+        "Blood Pressure": blood_pressure,
+        "Heart Rate": _finite(record["heart_rate"], "heart_rate"),
+        "Temperature": _finite(record["temperature"], "temperature"),
+        "BP_Systolic": systolic,
+        "BP_Diastolic": diastolic,
+    }
+
+
+def _transform_rows(bundle, rows: list):
+    """Feature matrix for validated rows, bypassing pandas when possible."""
+    if bundle.fast_preprocessor is not None:
+        return bundle.fast_preprocessor.transform(rows)
+    return bundle.preprocessor.transform(pd.DataFrame(rows))
+
+
+def _forest_predict(model, X, targets: tuple = TARGET_NAMES) -> list:
+    """
+    Score ``X`` with the output estimators of ``targets`` (default: all), each
+    in a single tree traversal.
+
+    ``MultiOutputClassifier.predict`` followed by ``predict_proba`` walks every
+    tree twice; here ``predict_proba`` runs once per target and the label is
+    taken as its argmax, exactly as ``RandomForestClassifier.predict`` does.
+
+    Returns
+    -------
+    list of ``(y_encoded, proba)`` tuples, one per entry in ``targets``,
+    with shapes ``(n_rows,)`` and ``(n_rows, n_classes)``.
+    """
+    outputs = []
+    for target in targets:
+        estimator = model.estimators_[TARGET_NAMES.index(target)]
+        with STAGE_SECONDS.time(stage=f"predict_proba_{target.lower()}"):
+            proba = estimator.predict_proba(X)
+        y_encoded = estimator.classes_.take(np.argmax(proba, axis=1), axis=0)
+        outputs.append((y_encoded, proba))
+    return outputs
+
+
+def _rule_predict(bundle, rows: list, disease_codes) -> list:
+    """
+    ``(y_encoded, proba)`` for Normal_Abnormal and Risk_Level from the
+    vital-sign rules, in ``_forest_predict``'s format; ``proba`` is one-hot.
+    """
+    vitals = rules.vitals_matrix(rows)
+    codes = {
+        "Normal_Abnormal": rules.is_abnormal(vitals).astype(np.intp),
+        "Risk_Level": rules.escalate(bundle.base_risk_codes[disease_codes], rules.is_critical(vitals)),
+    }
+    outputs = []
+    for target in RULE_TARGETS:
+        y_encoded = bundle.rule_label_codes[target][codes[target]]
+        proba = np.zeros((len(rows), len(bundle.label_encoders[target].classes_)))
+        proba[np.arange(len(rows)), y_encoded] = 1.0
+        outputs.append((y_encoded, proba))
+    return outputs
+
+
+def _top_k_differential(le, proba_row, top_k: int) -> list:
+    """Top-k Disease classes (``le``: the Disease encoder) for one row."""
+    top_idx = np.argsort(proba_row)[::-1][:top_k]
+    return [
+        {"disease": le.classes_[idx], "probability": round(float(proba_row[idx]), 4)}
+        for idx in top_idx
+    ]
+
+
+def _score_rows(
+    bundle, rows: list, top_k: int = 0, include_proba: bool = False, explain: str = "shap"
+) -> list:
+    """
+    Run preprocessing, the forest, label decoding and explanations once over
+    all ``rows`` (already validated by ``_record_to_row``) with ``bundle``.
+    """
+    label_encoders = bundle.label_encoders
+    BATCH_ROWS.observe(len(rows))
+
+    # Transform (one matrix matching the training schema)
+    with STAGE_SECONDS.time(stage="preprocess"):
+        X = _transform_rows(bundle, rows)
+
+    # One forest pass per target: labels are the argmax of the probabilities
+    if bundle.rule_targets:
+        forest_outputs = _forest_predict(bundle.model, X, targets=("Disease",))
+        with STAGE_SECONDS.time(stage="rules"):
+            forest_outputs += _rule_predict(bundle, rows, forest_outputs[0][0])
+    else:
+        forest_outputs = _forest_predict(bundle.model, X)
+
+    # Decode labels and collect the probability of each predicted class
+    labels = {}
+    confidences = {}
+    probas = {}
+    with STAGE_SECONDS.time(stage="decode"):
+        for target, (y_encoded, proba) in zip(TARGET_NAMES, forest_outputs):
+            if target != "Disease":  # Disease is decoded through the response index
+                labels[target] = label_encoders[target].inverse_transform(y_encoded)
+            confidences[target.lower()] = proba.max(axis=1)
+            probas[target] = proba
+
+    # Explanation
+    explanations = _get_explanations(bundle, X, mode=explain)
+
+    entries = bundle.response_index.entries
+    disease_codes = forest_outputs[0][0]
+    results = []
+    for r in range(len(rows)):
+        entry = entries[disease_codes[r]]
+        result = {
+            "disease": entry.disease,
+            "normal_abnormal": labels["Normal_Abnormal"][r],
+            "risk_level": labels["Risk_Level"][r],
+            "confidence": {
+                key: round(float(values[r]), 4)
+                for key, values in confidences.items()
+            },
+            "explanation": explanations[r],
+            "specialty": entry.specialty,
+            "model_version": bundle.version,
+        }
+        if top_k > 0:
+            result["differential"] = _top_k_differential(
+                label_encoders["Disease"], probas["Disease"][r], top_k
+            )
+        if include_proba:
+            result["probabilities"] = {
+                target.lower(): {
+                    label: round(float(p), 4)
+                    for label, p in zip(label_encoders[target].classes_, proba[r])
+                }
+                for target, proba in probas.items()
+            }
+        results.append(result)
+    return results
+
+
+def _cache_key(bundle, row: dict, options: tuple) -> tuple:
+    """
+    Normalized cache key for one validated row: numeric features, gender and
+    the in-vocabulary symptom tokens as a sorted multiset (TF-IDF ignores
+    order, case, punctuation, stop words and out-of-vocabulary terms).
+    """
+    if bundle.fast_preprocessor is not None:
+        # (term index, count) pairs, via the phrase table when it is enabled
+        tokens = tuple(bundle.fast_preprocessor.term_counts(row["Detailed_Symptoms"]))
+    else:
+        tokens = tuple(
+            sorted(
+                t for t in bundle.symptom_analyzer(row["Detailed_Symptoms"])
+                if t in bundle.symptom_vocabulary
+            )
         )
+    return (
+        bundle.signature,
+        row["Age"],
+        row["Gender"],
+        tokens,
+        row["BP_Systolic"],
+        row["BP_Diastolic"],
+        row["Heart Rate"],
+        row["Temperature"],
+        options,
+    )
+
+
+def _score_rows_cached(
+    bundle, rows: list, top_k: int = 0, include_proba: bool = False, explain: str = "shap"
+) -> list:
+    """``_score_rows`` behind the result cache; only misses reach the model."""
+    if _result_cache is None:
+        return _score_rows(bundle, rows, top_k, include_proba, explain)
+
+    options = (top_k, include_proba, explain)
+    with STAGE_SECONDS.time(stage="cache_lookup"):
+        keys = [_cache_key(bundle, row, options) for row in rows]
+        results = [_result_cache.get(key) for key in keys]
+
+    miss_idx = [i for i, result in enumerate(results) if result is None]
+    if miss_idx:
+        scored = _score_rows(bundle, [rows[i] for i in miss_idx], top_k, include_proba, explain)
+        for i, result in zip(miss_idx, scored):
+            _result_cache.set(keys[i], result)
+            results[i] = result
+
+    # Callers (e.g. backend._augment_result) mutate results in place
+    return [copy.deepcopy(result) for result in results]
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the result cache (None when disabled)."""
+    return _result_cache.stats() if _result_cache is not None else None
+
+
+def symptom_cache_stats() -> dict:
+    """Hit/miss counters of the symptom-set cache and phrase table (None when off)."""
+    bundle = _bundle
+    if bundle is None or bundle.fast_preprocessor is None:
+        return None
+    return bundle.fast_preprocessor.cache_stats()
 
-    return {"method": method, "top_features": top_features}
+
+def _validate_records(records: list):
+    """
+    Convert records to rows, collecting per-record errors.
+
+    Returns ``(results, rows, positions)``: ``results`` has one slot per record
+    with ``{"error": str}`` for malformed ones and None elsewhere; ``rows[j]``
+    is the validated row for ``records[positions[j]]``.
+    """
+    results = [None] * len(records)
+    rows, positions = [], []
+    for pos, record in enumerate(records):
+        try:
+            rows.append(_record_to_row(record))
+            positions.append(pos)
+        except _RECORD_ERRORS as e:
+            results[pos] = {"error": f"Invalid record: {e!r}"}
+    return results, rows, positions
+
+
+def _check_explain_mode(explain: str):
+    if explain not in EXPLAIN_MODES:
+        raise ValueError(f"explain must be one of {EXPLAIN_MODES}, got {explain!r}")
 
 
 # ── Public API ─────────────────────────────────────────────────────────────────
@@ -114,6 +937,9 @@ def predict(
     blood_pressure: str,
     heart_rate: int,
     temperature: float,
+    top_k: int = 0,
+    include_proba: bool = False,
+    explain: str = "shap",
 ) -> dict:
     """
     Run the triage model on a single patient record.
@@ -126,68 +952,94 @@ def predict(
     blood_pressure : str    — e.g. "150/95"
     heart_rate : int
     temperature : float     — in °F
+    top_k : int             — if > 0, add a ``differential`` list with the
+                              top-k Disease classes and their probabilities
+    include_proba : bool    — if True, add ``probabilities`` with the full
+                              class-probability vector of every target
+    explain : str           — "shap" (default), "fast" (importance-weighted
+                              features, no SHAP) or "none" (explanation=None)
 
     Returns
     -------
     dict with keys: disease, normal_abnormal, risk_level, confidence,
-                    explanation, specialty
+                    explanation, specialty (+ differential / probabilities)
+
+    Raises ``InvalidRecordError`` (a ``ValueError``) for a malformed record.
     """
-    _load_artifacts()
+    _check_explain_mode(explain)
+    bundle = _load_artifacts()
 
-    systolic, diastolic = _parse_bp(blood_pressure)
+    with STAGE_SECONDS.time(stage="parse"):
+        try:
+            row = _record_to_row(
+                {
+                    "age": age,
+                    "gender": gender,
+                    "symptoms": symptoms,
+                    "blood_pressure": blood_pressure,
+                    "heart_rate": heart_rate,
+                    "temperature": temperature,
+                }
+            )
+        except _RECORD_ERRORS as e:
+            raise InvalidRecordError(f"Invalid record: {e!r}") from e
+    return _score_rows_cached(
+        bundle, [row], top_k=top_k, include_proba=include_proba, explain=explain
+    )[0]
 
-    # Build a single-row DataFrame matching training schema
-    row = pd.DataFrame(
-        [
-            {
-                "Age": age,
-                "Gender": gender,
-                "Detailed_Symptoms": symptoms.strip().lower(),
-                "Blood Pressure": blood_pressure,
-                "Heart Rate": heart_rate,
-                "Temperature": temperature,
-                "BP_Systolic": systolic,
-                "BP_Diastolic": diastolic,
-            }
-        ]
-    )
 
-    # Transform
-    X = _preprocessor.transform(row)
+def predict_batch(
+    records: list, top_k: int = 0, include_proba: bool = False, explain: str = "shap"
+) -> list:
+    """
+    Run the triage model on many patient records in one vectorized pass.
 
-    # Predict class indices
-    y_pred = _model.predict(X)  # shape (1, 3)
+    Parameters
+    ----------
+    records : list of dict
+        Each dict carries the keyword arguments of ``predict()``: age, gender,
+        symptoms, blood_pressure, heart_rate, temperature.
+    top_k, include_proba, explain
+        Optional outputs, as in ``predict()``.
 
-    # Predict probabilities for confidence
-    confidences = {}
-    target_names = ["Disease", "Normal_Abnormal", "Risk_Level"]
-    predictions = {}
+    Returns
+    -------
+    list of dict, one per input record and in the same order.  Valid records
+    get the same dict as ``predict()``; malformed ones get ``{"error": str}``
+    without affecting the rest of the batch.
+    """
+    _check_explain_mode(explain)
+    bundle = _load_artifacts()
 
-    for i, target in enumerate(target_names):
-        le = _label_encoders[target]
-        pred_label = le.inverse_transform([y_pred[0, i]])[0]
-        predictions[target] = pred_label
+    with STAGE_SECONDS.time(stage="parse"):
+        results, rows, positions = _validate_records(records)
 
-        # Probability of the predicted class
-        proba = _model.estimators_[i].predict_proba(X)[0]
-        pred_class_idx = y_pred[0, i]
-        confidences[target.lower()] = round(float(proba[pred_class_idx]), 4)
+    if rows:
+        scored = _score_rows_cached(bundle, rows, top_k, include_proba, explain)
+        for pos, result in zip(positions, scored):
+            results[pos] = result
 
-    # Specialty
-    disease = predictions["Disease"]
-    specialty = _specialty_map.get(disease, "General Medicine")
+    return results
 
-    # Explanation
-    explanation = _get_explanation(_model, _preprocessor, X)
 
-    return {
-        "disease": disease,
-        "normal_abnormal": predictions["Normal_Abnormal"],
-        "risk_level": predictions["Risk_Level"],
-        "confidence": confidences,
-        "explanation": explanation,
-        "specialty": specialty,
-    }
+def explain_records(records: list, mode: str = "shap") -> list:
+    """
+    Compute only the explanation for each record (same record format as
+    ``predict_batch``), without running the forest.  Used to fill in
+    explanations after a prediction made with ``explain="none"``.
+    Malformed records get ``{"error": str}``.
+    """
+    _check_explain_mode(mode)
+    bundle = _load_artifacts()
+
+    results, rows, positions = _validate_records(records)
+
+    if rows:
+        X = _transform_rows(bundle, rows)
+        for pos, explanation in zip(positions, _get_explanations(bundle, X, mode=mode)):
+            results[pos] = explanation
+
+    return results
 
 
 # ── CLI entry point ────────────────────────────────────────────────────────────
@@ -201,6 +1053,8 @@ def main():
     parser.add_argument("--bp", type=str, required=True, help="Blood pressure, e.g. 150/95")
     parser.add_argument("--hr", type=int, required=True, help="Heart rate (bpm)")
     parser.add_argument("--temp", type=float, required=True, help="Temperature (°F)")
+    parser.add_argument("--top-k", type=int, default=0, help="Include a top-k differential diagnosis")
+    parser.add_argument("--explain", type=str, default="shap", choices=EXPLAIN_MODES)
     args = parser.parse_args()
 
     result = predict(
@@ -210,6 +1064,8 @@ def main():
         blood_pressure=args.bp,
         heart_rate=args.hr,
         temperature=args.temp,
+        top_k=args.top_k,
+        explain=args.explain,
     )
     print(json.dumps(result, indent=2))
 
@@ -0,0 +1,215 @@
+"""
+AI Healthcare Triage Engine — Precompiled Response Index
+==========================================================
+Everything a prediction response adds on top of the forest output depends
+only on the predicted Disease class (and, for the summary text, the
+predicted Risk_Level). ``ResponseIndex`` resolves all of it once per model
+version:
+
+  - one immutable ``ResponseEntry`` per Disease class code (label-encoder
+    order): disease, specialty, test group, recommended tests, base risk and
+    total test cost
+  - per (Disease, Risk_Level) pair, the pre-serialized JSON members that
+    ``backend.py`` splices into the response body
+
+The serving path is then two table lookups plus one ``json.dumps`` of the
+per-request fields. Both ways of getting an index go through the same
+``CachedIndex`` signature check, so edits to config.json's test
+recommendations or base risks reach responses within a second:
+
+  - each loaded ``predict.ArtifactBundle`` holds one over its own label
+    encoders and specialty map (``for_artifacts``), rebuilt when config.json
+    changes
+  - ``for_version`` builds one from disk for processes that hold no bundle
+    (a backend scoring on worker processes), rebuilt when config.json or the
+    version's label encoders / specialty map change
+"""
+
+import os
+import json
+import time
+import threading
+from types import MappingProxyType
+from typing import NamedTuple
+
+import joblib
+
+import model_registry
+from config_loader import CONFIG_PATH
+from rules import DEFAULT_BASE_RISK
+
+FALLBACK_SPECIALTY = "General Medicine"
+
+# Matches FastAPI's JSONResponse rendering
+_JSON_KW = {"ensure_ascii": False, "allow_nan": False, "separators": (",", ":")}
+
+# Files whose change invalidates a version's index
+_SOURCE_FILES = ("label_encoders.joblib", "specialty_map.joblib")
+_CHECK_INTERVAL_S = 1.0
+
+
+class ResponseEntry(NamedTuple):
+    disease: str
+    specialty: str
+    test_group: str          # key into test_recommendations (specialty or the fallback)
+    tests: tuple             # read-only test dicts
+    base_risk: str
+    total_test_cost: float
+
+
+def _summary(disease: str, risk: str, specialty: str) -> str:
+    return (
+        f"Based on your symptoms, our AI analysis suggests possible {disease} ({risk} Risk). "
+        f"We recommend consulting a {specialty} specialist. "
+        "Suggested diagnostic tests are listed below."
+    )
+
+
+class ResponseIndex:
+    """
+    Response fragments for every (Disease, Risk_Level) class pair.
+
+    Parameters
+    ----------
+    disease_classes      : sequence — Disease label-encoder classes (code order)
+    risk_classes         : sequence — Risk_Level label-encoder classes
+    specialty_map        : dict     — Disease → specialty (the trained artifact)
+    test_recommendations : dict     — specialty → list of test dicts (config)
+    disease_base_risk    : dict     — Disease → prior risk level (config)
+    """
+
+    def __init__(self, disease_classes, risk_classes, specialty_map: dict,
+                 test_recommendations: dict, disease_base_risk: dict):
+        entries = []
+        for disease in disease_classes:
+            disease = str(disease)
+            specialty = specialty_map.get(disease, FALLBACK_SPECIALTY)
+            test_group = specialty if specialty in test_recommendations else FALLBACK_SPECIALTY
+            tests = tuple(MappingProxyType(dict(t)) for t in test_recommendations.get(test_group, []))
+            entries.append(
+                ResponseEntry(
+                    disease=disease,
+                    specialty=specialty,
+                    test_group=test_group,
+                    tests=tests,
+                    base_risk=disease_base_risk.get(disease, DEFAULT_BASE_RISK),
+                    total_test_cost=sum(t.get("cost", 0) for t in tests),
+                )
+            )
+        self.entries = tuple(entries)
+        self.disease_codes = MappingProxyType({e.disease: i for i, e in enumerate(entries)})
+        self.risk_codes = MappingProxyType({str(r): i for i, r in enumerate(risk_classes)})
+
+        # JSON members (no braces) appended to each response object
+        self._members = tuple(
+            tuple(
+                json.dumps(
+                    {
+                        "recommended_tests": [dict(t) for t in entry.tests],
+                        "total_test_cost": entry.total_test_cost,
+                        "summary": _summary(entry.disease, risk, entry.test_group),
+                    },
+                    **_JSON_KW,
+                )[1:-1]
+                for risk in self.risk_codes
+            )
+            for entry in entries
+        )
+
+    @classmethod
+    def from_artifacts(cls, label_encoders: dict, specialty_map: dict, cfg: dict = None):
+        """Index for loaded artifacts; ``cfg`` defaults to config.json as on disk now."""
+        if cfg is None:
+            with open(CONFIG_PATH) as f:
+                cfg = json.load(f)
+        return cls(
+            label_encoders["Disease"].classes_,
+            label_encoders["Risk_Level"].classes_,
+            specialty_map,
+            cfg.get("test_recommendations", {}),
+            cfg.get("disease_base_risk", {}),
+        )
+
+    def entry(self, disease: str) -> ResponseEntry:
+        """Entry for a decoded Disease label (KeyError for unknown labels)."""
+        return self.entries[self.disease_codes[disease]]
+
+    def render(self, result: dict) -> str:
+        """JSON text of ``result`` extended with its tests, total cost and summary."""
+        body = json.dumps(result, **_JSON_KW)
+        members = self._members[self.disease_codes[result["disease"]]][self.risk_codes[result["risk_level"]]]
+        return f"{body[:-1]},{members}}}"
+
+
+# ── Rebuild on change ─────────────────────────────────────────────────────────
+def _signature(files) -> tuple:
+    return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, files))
+
+
+class CachedIndex:
+    """
+    A ``ResponseIndex`` rebuilt by ``build()`` whenever the size or mtime of
+    any of ``files`` changes. Files are re-checked at most once per second.
+
+    Parameters
+    ----------
+    build : callable — ``build() -> ResponseIndex``
+    files : sequence — paths the index is derived from (config.json first)
+    """
+
+    def __init__(self, build, files):
+        self._build = build
+        self._files = tuple(files)
+        self._index = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> ResponseIndex:
+        if time.monotonic() < self._next_check:
+            return self._index
+        with self._lock:
+            signature = _signature(self._files)
+            if self._index is None or signature != self._signature:
+                self._index = self._build()
+                self._signature = signature
+            self._next_check = time.monotonic() + _CHECK_INTERVAL_S
+            return self._index
+
+
+def for_artifacts(label_encoders: dict, specialty_map: dict) -> CachedIndex:
+    """Index over already-loaded artifacts, rebuilt when config.json changes."""
+    return CachedIndex(
+        lambda: ResponseIndex.from_artifacts(label_encoders, specialty_map), (CONFIG_PATH,)
+    )
+
+
+# ── Per-version cache ─────────────────────────────────────────────────────────
+_indexes = {}  # version → CachedIndex
+_lock = threading.Lock()
+
+
+def _from_disk(path: str) -> ResponseIndex:
+    return ResponseIndex.from_artifacts(
+        joblib.load(os.path.join(path, "label_encoders.joblib")),
+        joblib.load(os.path.join(path, "specialty_map.joblib")),
+    )
+
+
+def for_version(version: str) -> ResponseIndex:
+    """
+    Index for a model version (as reported in ``result["model_version"]``),
+    built from disk on first use and rebuilt when config.json or the
+    version's label encoders / specialty map change.
+    """
+    cached = _indexes.get(version)
+    if cached is None:
+        with _lock:
+            cached = _indexes.get(version)
+            if cached is None:
+                path = model_registry.version_dir(version)
+                cached = _indexes[version] = CachedIndex(
+                    lambda: _from_disk(path),
+                    [CONFIG_PATH] + [os.path.join(path, fname) for fname in _SOURCE_FILES],
+                )
+    return cached.get()
@@ -0,0 +1,237 @@
+"""
+AI Healthcare Triage Engine — Incremental Retraining
+======================================================
+Folds newly confirmed cases into the existing model without refitting it
+from scratch:
+
+  - the saved ``preprocessor.joblib`` is reused as-is (TF-IDF vocabulary,
+    scaler statistics and Gender levels stay fixed), so the serving feature
+    space never changes
+  - each target's forest grows ``trees_per_update`` new trees via
+    ``warm_start``, fitted on the new cases plus a small per-Disease replay
+    sample of the history so every known class is present
+  - optionally the same number of oldest trees is dropped, keeping the
+    forest size (and latency) constant
+  - every run draws its tree and replay seeds from ``random_state`` plus the
+    number of earlier runs in ``retrain_log.jsonl``, so successive updates
+    never grow identical trees
+  - a ``holdout_fraction`` of the new cases is kept out of the fit; the
+    before/after accuracies are measured on it
+
+Cost is proportional to the new data plus the fixed-size replay sample, not
+to the whole history. New files use the same CSV schema as Data/.
+
+Usage:
+    python retrain.py new_cases.csv
+    python retrain.py cases_day1.csv cases_day2.csv --trees 40 --replace-oldest
+"""
+
+import os
+import json
+import time
+import argparse
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.metrics import accuracy_score
+
+import model_registry
+from config_loader import config
+from train import (
+    MODEL_DIR,
+    CSV_DTYPES,
+    TEXT_FEATURE,
+    TARGET_NAMES,
+    engineer_features,
+    load_engineered,
+    export_compiled_forest,
+)
+
+warnings.filterwarnings("ignore")
+
+RETRAIN_LOG = os.path.join(MODEL_DIR, "retrain_log.jsonl")
+
+
+# ── 1. Inputs ─────────────────────────────────────────────────────────────────
+def load_new_cases(paths: list) -> pd.DataFrame:
+    """Read and feature-engineer newly labeled cases (Data/ CSV schema)."""
+    frames = [pd.read_csv(path, dtype=CSV_DTYPES) for path in paths]
+    df = pd.concat(frames, ignore_index=True)
+    return engineer_features(df)
+
+
+def replay_sample(per_class: int, exclude_ids=(), seed: int = 42) -> pd.DataFrame:
+    """Up to ``per_class`` random historical rows for every Disease class."""
+    history = load_engineered()
+    if len(exclude_ids):
+        history = history[~history["Patient_ID"].isin(exclude_ids)]
+    shuffled = history.sample(frac=1.0, random_state=seed)
+    return shuffled.groupby("Disease", sort=False).head(per_class)
+
+
+def encode_targets(df: pd.DataFrame, label_encoders: dict) -> np.ndarray:
+    """
+    Encode with the existing label encoders. Labels the model has never
+    seen cannot be added incrementally — that needs a full ``train.py`` run.
+    """
+    columns = []
+    for target in TARGET_NAMES:
+        le = label_encoders[target]
+        unseen = sorted(set(df[target].unique()) - set(le.classes_))
+        if unseen:
+            raise ValueError(
+                f"New {target} labels {unseen} are not in the model; run train.py for a full retrain"
+            )
+        columns.append(le.transform(df[target]))
+    return np.column_stack(columns)
+
+
+def out_of_vocabulary_rate(preprocessor, texts: pd.Series) -> float:
+    """Share of symptom tokens outside the frozen TF-IDF vocabulary."""
+    vectorizer = preprocessor.named_transformers_["text"]
+    analyzer = vectorizer.build_analyzer()
+    tokens = [t for text in texts for t in analyzer(text)]
+    if not tokens:
+        return 0.0
+    return sum(t not in vectorizer.vocabulary_ for t in tokens) / len(tokens)
+
+
+# ── 2. Forest update ──────────────────────────────────────────────────────────
+def grow_forest(forest, X, y, n_new: int, replace_oldest: bool = False):
+    """
+    Add ``n_new`` trees fitted on (X, y) to a fitted RandomForestClassifier,
+    optionally dropping as many of its oldest trees.
+    """
+    classes_before = forest.classes_.copy()
+    if replace_oldest:
+        forest.estimators_ = forest.estimators_[n_new:]
+
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_new)
+    forest.fit(X, y)
+    forest.set_params(warm_start=False)
+
+    # fit() re-derives classes_ from y; the old trees' outputs assume the old set
+    if not np.array_equal(forest.classes_, classes_before):
+        raise RuntimeError("Class set changed during incremental fit")
+    return forest
+
+
+def run_seed(base_seed: int) -> int:
+    """Seed for this run: ``base_seed`` offset by the number of logged retrains."""
+    if not os.path.exists(RETRAIN_LOG):
+        return base_seed
+    with open(RETRAIN_LOG) as f:
+        return base_seed + sum(1 for line in f if line.strip())
+
+
+def split_holdout(df: pd.DataFrame, fraction: float, seed: int):
+    """Split new cases into (fit, held-out) frames."""
+    n_holdout = int(round(len(df) * fraction))
+    if n_holdout == 0 or n_holdout == len(df):
+        return df, df.iloc[:0]
+    holdout = df.sample(n=n_holdout, random_state=seed)
+    return df.drop(holdout.index), holdout
+
+
+def _accuracy(model, X, y) -> dict:
+    y_pred = model.predict(X)
+    return {
+        target: round(accuracy_score(y[:, i], y_pred[:, i]), 4)
+        for i, target in enumerate(TARGET_NAMES)
+    }
+
+
+# ── 3. Main retraining routine ────────────────────────────────────────────────
+def main(paths: list, n_new: int = None, replace_oldest: bool = None, per_class: int = None) -> dict:
+    retrain_cfg = config.get("retrain", {})
+    n_new = n_new or retrain_cfg.get("trees_per_update", 20)
+    replace_oldest = retrain_cfg.get("replace_oldest", False) if replace_oldest is None else replace_oldest
+    per_class = per_class or retrain_cfg.get("replay_per_class", 20)
+    holdout_fraction = retrain_cfg.get("holdout_fraction", 0.2)
+    seed = run_seed(config["model_params"]["random_state"])
+    t_start = time.perf_counter()
+
+    model = joblib.load(os.path.join(MODEL_DIR, "triage_model.joblib"))
+    preprocessor = joblib.load(os.path.join(MODEL_DIR, "preprocessor.joblib"))
+    label_encoders = joblib.load(os.path.join(MODEL_DIR, "label_encoders.joblib"))
+
+    new_df = load_new_cases(paths)
+    encode_targets(new_df, label_encoders)  # fail fast on labels the model cannot learn
+    oov = out_of_vocabulary_rate(preprocessor, new_df[TEXT_FEATURE])
+    print(f"[INFO] {len(new_df):,} new cases  |  out-of-vocabulary symptom tokens: {oov:.1%}")
+    if oov > 0.2:
+        print("[WARN] Many symptom terms are outside the frozen vocabulary — consider a full train.py run")
+
+    train_df, holdout_df = split_holdout(new_df, holdout_fraction, seed)
+    if len(holdout_df):
+        X_holdout = preprocessor.transform(holdout_df)
+        y_holdout = encode_targets(holdout_df, label_encoders)
+        before = _accuracy(model, X_holdout, y_holdout)
+        print(f"[INFO] Current model on {len(holdout_df):,} held-out new cases: {before}")
+    else:
+        before = None
+        print("[WARN] Too few new cases to hold any out — accuracy is not reported")
+
+    # Replay keeps every class present (and the old distribution in view)
+    replay = replay_sample(per_class, exclude_ids=new_df["Patient_ID"].dropna().unique(), seed=seed)
+    fit_df = pd.concat([train_df, replay], ignore_index=True)
+    X_fit = preprocessor.transform(fit_df)
+    y_fit = encode_targets(fit_df, label_encoders)
+    print(f"[INFO] Fitting {n_new} new trees per target on {len(fit_df):,} rows "
+          f"({len(replay):,} replayed, seed {seed}){' — replacing the oldest' if replace_oldest else ''} ...")
+
+    for i, forest in enumerate(model.estimators_):
+        if len(np.unique(y_fit[:, i])) != len(forest.classes_):
+            raise ValueError(f"Replay sample does not cover every {TARGET_NAMES[i]} class")
+        forest.set_params(random_state=seed)
+        grow_forest(forest, X_fit, y_fit[:, i], n_new, replace_oldest)
+
+    after = _accuracy(model, X_holdout, y_holdout) if len(holdout_df) else None
+    if after is not None:
+        print(f"[INFO] Updated model on held-out new cases: {after}")
+
+    joblib.dump(model, os.path.join(MODEL_DIR, "triage_model.joblib"))
+    export_compiled_forest(model)
+
+    entry = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": [os.path.basename(p) for p in paths],
+        "new_cases": len(new_df),
+        "held_out": len(holdout_df),
+        "seed": seed,
+        "replayed": len(replay),
+        "trees_added": n_new,
+        "replace_oldest": replace_oldest,
+        "n_trees": [len(forest.estimators_) for forest in model.estimators_],
+        "oov_rate": round(oov, 4),
+        "accuracy_before": before,
+        "accuracy_after": after,
+        "wall_s": round(time.perf_counter() - t_start, 3),
+    }
+    with open(RETRAIN_LOG, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    print(f"[INFO] Forest sizes: {dict(zip(TARGET_NAMES, entry['n_trees']))}")
+    print(f"[INFO] Retrained in {entry['wall_s']:.2f}s — saved triage_model.joblib, compiled_forest/")
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Incremental retraining")
+    parser.add_argument("files", nargs="+", help="CSV files of newly labeled cases (Data/ schema)")
+    parser.add_argument("--trees", type=int, default=None,
+                        help="Trees added per target (default: retrain.trees_per_update)")
+    parser.add_argument("--replace-oldest", action="store_true", default=None,
+                        help="Drop as many of the oldest trees as are added")
+    parser.add_argument("--replay-per-class", type=int, default=None,
+                        help="Historical rows replayed per Disease class")
+    parser.add_argument("--publish", action="store_true",
+                        help="Snapshot the updated artifacts as a model version and make it CURRENT")
+    args = parser.parse_args()
+
+    main(args.files, n_new=args.trees, replace_oldest=args.replace_oldest, per_class=args.replay_per_class)
+    if args.publish:
+        model_registry.publish(MODEL_DIR, note=f"retrain.py {' '.join(os.path.basename(p) for p in args.files)}")
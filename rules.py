@@ -0,0 +1,92 @@
+"""
+AI Healthcare Triage Engine — Vital-Sign Rule Engine
+======================================================
+Normal_Abnormal and Risk_Level are not observed labels: they are derived
+from vital-sign thresholds (``config["thresholds"]``) and each disease's base
+risk (``config["disease_base_risk"]``). This module is the single,
+NumPy-vectorized definition of those rules. ``train.py`` uses it to build the
+targets, and ``predict.py`` can use it (``inference.rule_targets``) to decide
+both targets exactly instead of approximating them with two forests.
+
+All functions take equal-length array-likes and return NumPy arrays; NaN
+vitals compare as "within range".
+"""
+
+import numpy as np
+
+from config_loader import config
+
+NORMAL_ABNORMAL_LABELS = np.array(["Normal", "Abnormal"], dtype=object)
+RISK_LABELS = np.array(["Low", "Medium", "High"], dtype=object)
+RISK_CODES = {label: code for code, label in enumerate(RISK_LABELS)}
+DEFAULT_BASE_RISK = "Medium"
+
+# Input order of the vitals arrays ↔ keys in config["thresholds"]
+VITALS = ("BP_Systolic", "BP_Diastolic", "Heart Rate", "Temperature")
+_THRESHOLD_KEYS = ("bp_systolic", "bp_diastolic", "heart_rate", "temperature")
+# Blood pressure normal bounds are inclusive, heart rate / temperature strict
+_INCLUSIVE_NORMAL = (True, True, False, False)
+
+
+def vitals_matrix(rows: list) -> np.ndarray:
+    """``(n_rows, 4)`` float array of ``VITALS`` from training-schema row dicts."""
+    return np.array([[row[name] for name in VITALS] for row in rows], dtype=np.float64).reshape(-1, 4)
+
+
+def is_abnormal(vitals, thresholds: dict = None) -> np.ndarray:
+    """
+    True where any vital sign is outside its normal range.
+
+    Parameters
+    ----------
+    vitals : array-like — ``(n_rows, 4)`` in ``VITALS`` order
+    thresholds : dict   — defaults to ``config["thresholds"]``
+    """
+    thresholds = thresholds or config["thresholds"]
+    vitals = np.asarray(vitals, dtype=np.float64)
+    abnormal = np.zeros(vitals.shape[0], dtype=bool)
+    for j, (key, inclusive) in enumerate(zip(_THRESHOLD_KEYS, _INCLUSIVE_NORMAL)):
+        th = thresholds[key]
+        column = vitals[:, j]
+        if inclusive:
+            abnormal |= (column >= th["normal_max"]) | (column <= th["normal_min"])
+        else:
+            abnormal |= (column > th["normal_max"]) | (column < th["normal_min"])
+    return abnormal
+
+
+def is_critical(vitals, thresholds: dict = None) -> np.ndarray:
+    """True where any vital sign is beyond its critical bounds (strict)."""
+    thresholds = thresholds or config["thresholds"]
+    vitals = np.asarray(vitals, dtype=np.float64)
+    critical = np.zeros(vitals.shape[0], dtype=bool)
+    for j, key in enumerate(_THRESHOLD_KEYS):
+        th = thresholds[key]
+        column = vitals[:, j]
+        critical |= (column > th["critical_max"]) | (column < th["critical_min"])
+    return critical
+
+
+def base_risk_codes(diseases, disease_base_risk: dict = None) -> np.ndarray:
+    """Base risk code (Low=0, Medium=1, High=2) per disease name."""
+    disease_base_risk = disease_base_risk or config["disease_base_risk"]
+    default = RISK_CODES[DEFAULT_BASE_RISK]
+    return np.array(
+        [RISK_CODES.get(disease_base_risk.get(d), default) for d in diseases], dtype=np.int8
+    ).reshape(-1)
+
+
+def escalate(base_codes, critical) -> np.ndarray:
+    """Bump the base risk one level where vitals are critical (capped at High)."""
+    return np.minimum(np.asarray(base_codes) + np.asarray(critical), len(RISK_LABELS) - 1)
+
+
+def normal_abnormal(vitals, thresholds: dict = None) -> np.ndarray:
+    """Normal_Abnormal labels for ``vitals``."""
+    return NORMAL_ABNORMAL_LABELS[is_abnormal(vitals, thresholds).astype(np.intp)]
+
+
+def risk_level(diseases, vitals, thresholds: dict = None, disease_base_risk: dict = None) -> np.ndarray:
+    """Risk_Level labels: the disease's base risk, escalated on critical vitals."""
+    codes = escalate(base_risk_codes(diseases, disease_base_risk), is_critical(vitals, thresholds))
+    return RISK_LABELS[codes]
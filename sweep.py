@@ -0,0 +1,284 @@
+"""
+AI Healthcare Triage Engine — Hyperparameter Sweep
+====================================================
+Evaluates a grid (or a random sample of it) of forest parameters without
+re-running ``train.py`` per candidate:
+
+  1. the dataset is preprocessed and split once (same split as train.py)
+     and dumped to .cache/sweep/ as float32 sparse matrices: the training
+     split as CSC with sorted indices (the layout the forest fits on, so
+     ``fit`` uses the mapped arrays without converting them), the test
+     split as CSR (the layout ``predict`` reads)
+  2. candidates are fitted in parallel worker processes, each memory-mapping
+     the shared feature store instead of receiving its own copy; each
+     reports how much anonymous memory its fit added, which stays flat as
+     the matrix grows
+  3. each fitted candidate is then timed on its own, one at a time, for
+     single-row and batch latency, so workers don't skew each other's numbers
+
+The report records accuracy, F1, model size and latency per candidate and
+marks the ones on the accuracy / single-row-latency frontier.
+
+Usage:
+    python sweep.py
+    python sweep.py --random 6 --workers 4
+    python sweep.py --grid '{"n_estimators": [25, 50], "max_depth": [8, 16]}'
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import itertools
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from sklearn.metrics import accuracy_score, f1_score
+
+from config_loader import config
+from telemetry import process_memory
+from train import (
+    MODEL_DIR,
+    CACHE_DIR,
+    TARGET_NAMES,
+    load_engineered,
+    build_preprocessor,
+    build_model,
+)
+
+warnings.filterwarnings("ignore")
+
+SWEEP_DIR = os.path.join(CACHE_DIR, "sweep")
+FEATURE_STORE = os.path.join(SWEEP_DIR, "features.joblib")
+REPORT_PATH = os.path.join(MODEL_DIR, "sweep_report.json")
+
+
+# ── 1. Shared feature store ───────────────────────────────────────────────────
+def prepare_features(path: str = FEATURE_STORE) -> dict:
+    """
+    Preprocess and split once, exactly as ``train.main`` does, and dump the
+    float32 matrices the forest trains on; joblib memory-maps their
+    data / indices / indptr arrays in every worker.  ``RandomForestClassifier``
+    fits on CSC with sorted indices, so storing ``X_train`` that way means no
+    worker builds a private converted copy.
+    """
+    df = load_engineered()
+    y = np.column_stack([LabelEncoder().fit_transform(df[target]) for target in TARGET_NAMES])
+    X = build_preprocessor().fit_transform(df).astype(np.float32)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y[:, 0]
+    )
+    X_train = X_train.tocsc()
+    X_train.sort_indices()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(
+        {
+            "X_train": X_train,
+            "X_test": X_test,
+            "y_train": y_train,
+            "y_test": y_test,
+        },
+        path,
+    )
+    train_mb = sum(a.nbytes for a in (X_train.data, X_train.indices, X_train.indptr)) / (1024 * 1024)
+    print(f"[INFO] Feature store: {X_train.shape[0]:,} train ({train_mb:.1f} MiB CSC) / "
+          f"{X_test.shape[0]:,} test × {X.shape[1]} features → {os.path.relpath(path)}")
+    return joblib.load(path, mmap_mode="r")
+
+
+# ── 2. Candidates ─────────────────────────────────────────────────────────────
+def expand_grid(grid: dict, random_iter: int = None, seed: int = 42) -> list:
+    """
+    Every combination of ``grid`` values, or ``random_iter`` of them drawn
+    without replacement.
+    """
+    keys = list(grid)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+    if random_iter is not None and random_iter < len(candidates):
+        rng = np.random.default_rng(seed)
+        picked = sorted(rng.choice(len(candidates), size=random_iter, replace=False))
+        candidates = [candidates[i] for i in picked]
+    return candidates
+
+
+def _fit_candidate(index: int, params: dict, store_path: str, models_dir: str) -> dict:
+    """Fit and score one candidate in a worker process; the model goes to disk."""
+    data = joblib.load(store_path, mmap_mode="r")
+    model = build_model(**params, n_jobs=1)  # parallelism is across candidates
+
+    anonymous_before = process_memory().get("anonymous")
+    t0 = time.perf_counter()
+    model.fit(data["X_train"], data["y_train"])
+    fit_s = time.perf_counter() - t0
+    anonymous_after = process_memory().get("anonymous")
+
+    y_test = data["y_test"]
+    y_pred = model.predict(data["X_test"])
+    scores = {}
+    for i, target in enumerate(TARGET_NAMES):
+        scores[target] = {
+            "accuracy": round(accuracy_score(y_test[:, i], y_pred[:, i]), 4),
+            "f1_weighted": round(f1_score(y_test[:, i], y_pred[:, i], average="weighted"), 4),
+        }
+
+    path = os.path.join(models_dir, f"candidate_{index:03d}.joblib")
+    joblib.dump(model, path)
+    return {
+        "index": index,
+        "params": params,
+        "metrics": scores,
+        "mean_f1_weighted": round(float(np.mean([s["f1_weighted"] for s in scores.values()])), 4),
+        "fit_s": round(fit_s, 3),
+        # Private memory the fit added (trees included); a converted copy of
+        # X_train would show up here
+        "fit_anonymous_mb": (
+            round(anonymous_after - anonymous_before, 1) if anonymous_before is not None else None
+        ),
+        "n_nodes": int(sum(
+            tree.tree_.node_count for est in model.estimators_ for tree in est.estimators_
+        )),
+        "model_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+        "model_path": path,
+    }
+
+
+# ── 3. Latency ────────────────────────────────────────────────────────────────
+def _time_ms(fn, repeats: int) -> np.ndarray:
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return np.asarray(samples)
+
+
+def measure_latency(model, X_test, batch_size: int = 256, repeats: int = 50) -> dict:
+    """
+    Forest scoring latency as served (one ``predict_proba`` per target, see
+    ``predict._forest_predict``), with the serving ``n_jobs`` where the
+    estimator takes one.
+    """
+    for est in model.estimators_:
+        if "n_jobs" in est.get_params():
+            est.set_params(n_jobs=config["model_params"]["n_jobs"])
+
+    def score(X):
+        for est in model.estimators_:
+            est.predict_proba(X)
+
+    single = _time_ms(lambda: score(X_test[:1]), repeats)
+    batch = _time_ms(lambda: score(X_test[:batch_size]), max(repeats // 5, 3))
+    return {
+        "single_ms_p50": round(float(np.percentile(single, 50)), 3),
+        "single_ms_p95": round(float(np.percentile(single, 95)), 3),
+        "batch_size": batch_size,
+        "batch_ms_p50": round(float(np.percentile(batch, 50)), 3),
+        "batch_rows_per_s": round(batch_size / (np.percentile(batch, 50) / 1000.0), 1),
+    }
+
+
+def mark_frontier(results: list, quality: str = "mean_f1_weighted", cost: str = "single_ms_p50"):
+    """Flag candidates no other candidate beats on both quality and latency."""
+    for r in results:
+        r["on_frontier"] = not any(
+            o is not r
+            and o[quality] >= r[quality]
+            and o["latency"][cost] <= r["latency"][cost]
+            and (o[quality] > r[quality] or o["latency"][cost] < r["latency"][cost])
+            for o in results
+        )
+
+
+# ── 4. Main sweep routine ─────────────────────────────────────────────────────
+def main(grid: dict = None, random_iter: int = None, workers: int = None,
+         output: str = REPORT_PATH, keep_models: bool = False) -> dict:
+    sweep_cfg = config.get("sweep", {})
+    grid = grid or sweep_cfg["grid"]
+    random_iter = random_iter if random_iter is not None else sweep_cfg.get("random_iter")
+    workers = workers or sweep_cfg.get("workers") or os.cpu_count() or 1
+    batch_size = sweep_cfg.get("latency_batch_size", 256)
+    repeats = sweep_cfg.get("latency_repeats", 50)
+
+    t_start = time.perf_counter()
+    data = prepare_features()
+    candidates = expand_grid(grid, random_iter, config["model_params"]["random_state"])
+    print(f"[INFO] Sweeping {len(candidates)} candidates on {workers} worker(s) ...")
+
+    models_dir = os.path.join(SWEEP_DIR, "models")
+    os.makedirs(models_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_fit_candidate, i, params, FEATURE_STORE, models_dir)
+            for i, params in enumerate(candidates)
+        ]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f"[INFO] #{result['index']:03d} {result['params']}  "
+                  f"F1 {result['mean_f1_weighted']:.4f}  |  {result['model_mb']:.1f} MiB  |  "
+                  f"fit {result['fit_s']:.1f}s"
+                  + (f" (+{result['fit_anonymous_mb']:.1f} MiB private)"
+                     if result["fit_anonymous_mb"] is not None else ""))
+
+    # Latency runs sequentially so candidates don't compete for cores
+    for result in results:
+        model = joblib.load(result["model_path"] if keep_models else result.pop("model_path"))
+        result["latency"] = measure_latency(model, data["X_test"], batch_size, repeats)
+        del model
+    mark_frontier(results)
+
+    report = {
+        "grid": grid,
+        "random_iter": random_iter,
+        "workers": workers,
+        "n_train": int(data["X_train"].shape[0]),
+        "n_test": int(data["X_test"].shape[0]),
+        "wall_s": round(time.perf_counter() - t_start, 3),
+        "candidates": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'params':<60} {'F1':>7} {'MiB':>7} {'1-row ms':>9} {'batch ms':>9}")
+    for r in sorted(results, key=lambda r: r["latency"]["single_ms_p50"]):
+        print(f"{json.dumps(r['params']):<60} {r['mean_f1_weighted']:>7.4f} {r['model_mb']:>7.1f} "
+              f"{r['latency']['single_ms_p50']:>9.2f} {r['latency']['batch_ms_p50']:>9.2f}"
+              f"{'  *' if r['on_frontier'] else ''}")
+    print("\n[INFO] * = on the F1 / single-row latency frontier")
+    print(f"[INFO] Report saved to {output}")
+
+    del data
+    if not keep_models:
+        shutil.rmtree(models_dir, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Hyperparameter sweep")
+    parser.add_argument("--grid", type=json.loads, default=None,
+                        help="JSON grid overriding sweep.grid, e.g. '{\"max_depth\": [10, 20]}'")
+    parser.add_argument("--random", type=int, default=None, dest="random_iter",
+                        help="Evaluate N random candidates from the grid instead of all")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel fitting processes (default: all cores)")
+    parser.add_argument("--output", default=REPORT_PATH,
+                        help="Where to write the JSON report")
+    parser.add_argument("--keep-models", action="store_true",
+                        help="Keep the fitted candidates in .cache/sweep/models/")
+    args = parser.parse_args()
+
+    main(
+        grid=args.grid,
+        random_iter=args.random_iter,
+        workers=args.workers,
+        output=args.output,
+        keep_models=args.keep_models,
+    )
@@ -0,0 +1,244 @@
+"""
+AI Healthcare Triage Engine — Runtime Telemetry
+=================================================
+Dependency-free counters and histograms rendered in the Prometheus text
+exposition format (served by ``backend.py`` on ``/metrics``).
+
+Recording is a bisect plus a locked increment (about a microsecond), cheap
+enough to stay on in production. Point-in-time values (cache, pool and
+artifact-load stats) are pulled from collectors when ``/metrics`` is scraped.
+
+With ``serving.executor = "process"`` the predict-side stage histograms are
+recorded inside the worker processes and are not visible here; request,
+inference-wait and augmentation metrics are recorded by the backend itself.
+
+``process_memory()`` reports this process's resident memory split into
+shared and private pages, which is what tells several server workers
+attached to one memory-mapped model apart from workers holding copies.
+"""
+
+import bisect
+import math
+import resource
+import sys
+import threading
+import time
+
+# Seconds; spans sub-millisecond preprocessing up to multi-second SHAP batches
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "t0")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, **self.labels)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values → [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def time(self, **labels) -> _Timer:
+        """Context manager observing the wall time of its block."""
+        return _Timer(self, labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        out = []
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else repr(float(bound))
+                out.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, cumulative))
+        return out
+
+
+class Registry:
+    """Metrics plus scrape-time collectors, rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """
+        ``collector()`` returns ``[(name, kind, help, [(labels, value), ...]), ...]``
+        and is called on every render.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception:
+                continue  # a broken collector must not take /metrics down
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# smaps_rollup field → process_memory() key
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+    "Anonymous": "anonymous",  # heap / copies; excludes memory-mapped files
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def process_memory() -> dict:
+    """
+    Memory of this process in MiB: ``rss``, ``pss`` (shared pages divided
+    among the processes mapping them), ``shared``, ``private``, ``anonymous``
+    (not file-backed) and ``peak`` RSS. Only ``peak`` is available where /proc/self/smaps_rollup is not.
+    """
+    memory = {"peak": peak_rss_mb()}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                key = _SMAPS_FIELDS.get(parts[0].rstrip(":"))
+                if key is not None:
+                    memory[key] = memory.get(key, 0.0) + int(parts[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return {k: round(v, 1) for k, v in memory.items()}
+
+
+REGISTRY = Registry()
+
+# ── Metrics shared by predict.py and backend.py ───────────────────────────────
+STAGE_SECONDS = REGISTRY.histogram(
+    "triage_stage_seconds",
+    "Time spent per prediction stage (one observation per scored batch)",
+    labelnames=("stage",),
+)
+BATCH_ROWS = REGISTRY.histogram(
+    "triage_scored_rows",
+    "Rows per forest scoring call (cache misses only)",
+    buckets=SIZE_BUCKETS,
+)
+PREDICTIONS = REGISTRY.counter(
+    "triage_predictions_total",
+    "Predictions returned, by specialty and risk level",
+    labelnames=("specialty", "risk_level"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "triage_http_requests_total",
+    "HTTP requests handled, by route and status code",
+    labelnames=("method", "path", "status"),
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "triage_http_request_seconds",
+    "HTTP request latency by route",
+    labelnames=("method", "path"),
+)
@@ -12,7 +12,11 @@ Saves model, preprocessor, label encoders, and evaluation metrics to model/.
 
 import os
 import json
+import time
+import hashlib
+import argparse
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib
@@ -34,6 +38,8 @@ from sklearn.metrics import (
     confusion_matrix,
 )
 import joblib
+import model_registry
+import rules
 from config_loader import config
 
 warnings.filterwarnings("ignore")
@@ -47,16 +53,43 @@ os.makedirs(MODEL_DIR, exist_ok=True)
 
 
 # ── 1. Load & merge ───────────────────────────────────────────────────────────
-def load_and_merge() -> pd.DataFrame:
-    """Read every CSV in Data/, tag with specialty, and concatenate."""
-    frames = []
-    for fname in sorted(os.listdir(DATA_DIR)):
-        if not fname.endswith(".csv"):
-            continue
-        specialty = fname.replace("_dataset_5000.csv", "").replace("_", " ").title()
-        df = pd.read_csv(os.path.join(DATA_DIR, fname))
-        df["Specialty"] = specialty
-        frames.append(df)
+# Explicit dtypes skip pandas' per-column type inference; the integer columns
+# use the nullable "Int64" so a blank cell reads as <NA> instead of raising
+CSV_DTYPES = {
+    "Patient_ID": str,
+    "Age": "Int64",
+    "Gender": str,
+    "Detailed_Symptoms": str,
+    "Blood Pressure": str,
+    "Heart Rate": "Int64",
+    "Temperature": "float64",
+    "Disease": str,
+    "Required_Test": str,
+    "Normal_Value": str,
+    "Abnormal_Value": str,
+    "Risk_Level": str,
+}
+
+
+def list_data_files() -> list:
+    """Sorted dataset CSV file names in Data/."""
+    return sorted(f for f in os.listdir(DATA_DIR) if f.endswith(".csv"))
+
+
+def _read_specialty_csv(fname: str) -> pd.DataFrame:
+    specialty = fname.replace("_dataset_5000.csv", "").replace("_", " ").title()
+    df = pd.read_csv(os.path.join(DATA_DIR, fname), dtype=CSV_DTYPES)
+    df["Specialty"] = specialty
+    return df
+
+
+def load_and_merge(workers: int = None) -> pd.DataFrame:
+    """Read every CSV in Data/ in parallel, tag with specialty, and concatenate."""
+    fnames = list_data_files()
+    workers = workers or config.get("ingest", {}).get("workers") or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(workers, max(len(fnames), 1))) as pool:
+        # map() keeps file order, so the merged frame is deterministic
+        frames = list(pool.map(_read_specialty_csv, fnames))
     merged = pd.concat(frames, ignore_index=True)
     print(f"[INFO] Loaded {len(merged):,} rows from {len(frames)} files")
     return merged
@@ -73,39 +106,21 @@ def parse_blood_pressure(bp_series: pd.Series) -> pd.DataFrame:
 
 def derive_normal_abnormal(df: pd.DataFrame) -> pd.Series:
     """
-    Derive Normal/Abnormal from vital-sign thresholds.
-    Abnormal if ANY of:
-      - Systolic BP ≥ 140  or ≤ 90
-      - Diastolic BP ≥ 90  or ≤ 60
-      - Heart Rate > 100   or < 60
-      - Temperature > 100.4 or < 96.0
-    """
-    """
-    Derive Normal/Abnormal from vital-sign thresholds.
+    Derive Normal/Abnormal from vital-sign thresholds (``rules.is_abnormal``).
     Abnormal if ANY of:
       - Systolic BP outside normal range
       - Diastolic BP outside normal range
       - Heart Rate outside normal range
       - Temperature outside normal range
     """
-    th = config["thresholds"]
-    abnormal = (
-        (df["BP_Systolic"] >= th["bp_systolic"]["normal_max"])
-        | (df["BP_Systolic"] <= th["bp_systolic"]["normal_min"])
-        | (df["BP_Diastolic"] >= th["bp_diastolic"]["normal_max"])
-        | (df["BP_Diastolic"] <= th["bp_diastolic"]["normal_min"])
-        | (df["Heart Rate"] > th["heart_rate"]["normal_max"])
-        | (df["Heart Rate"] < th["heart_rate"]["normal_min"])
-        | (df["Temperature"] > th["temperature"]["normal_max"])
-        | (df["Temperature"] < th["temperature"]["normal_min"])
-    )
-    return abnormal.map({True: "Abnormal", False: "Normal"})
+    vitals = df[list(rules.VITALS)].to_numpy(dtype=np.float64)
+    return pd.Series(rules.normal_abnormal(vitals), index=df.index)
 
 
 def derive_risk_level(df: pd.DataFrame) -> pd.Series:
     """
-    Derive Risk Level based on Disease Severity + Vitals.
-    
+    Derive Risk Level based on Disease Severity + Vitals (``rules.risk_level``).
+
     Logic:
     1. Start with base risk from DISEASE_BASE_RISK.
     2. Escalate risk if Vitals are CRITICAL:
@@ -115,31 +130,8 @@ def derive_risk_level(df: pd.DataFrame) -> pd.Series:
        - Temp > 103 or < 95
        → Bump Low to Medium, Medium to High.
     """
-    # 1. Base risk
-    base_risk = df["Disease"].map(config["disease_base_risk"]).fillna("Medium")
-    
-    # 2. Identify critical vitals
-    th = config["thresholds"]
-    critical_vitals = (
-        (df["BP_Systolic"] > th["bp_systolic"]["critical_max"]) | (df["BP_Systolic"] < th["bp_systolic"]["critical_min"]) |
-        (df["BP_Diastolic"] > th["bp_diastolic"]["critical_max"]) | (df["BP_Diastolic"] < th["bp_diastolic"]["critical_min"]) |
-        (df["Heart Rate"] > th["heart_rate"]["critical_max"]) | (df["Heart Rate"] < th["heart_rate"]["critical_min"]) |
-        (df["Temperature"] > th["temperature"]["critical_max"]) | (df["Temperature"] < th["temperature"]["critical_min"])
-    )
-    
-    # 3. Apply escalation
-    # Map textual risk to numeric for easy escalation: Low=0, Medium=1, High=2
-    risk_map = {"Low": 0, "Medium": 1, "High": 2}
-    inv_map = {0: "Low", 1: "Medium", 2: "High"}
-    
-    numeric_risk = base_risk.map(risk_map)
-    
-    # Add 1 to risk level if critical (max 2)
-    escalated_risk = numeric_risk.copy()
-    escalated_risk[critical_vitals] += 1
-    escalated_risk = escalated_risk.clip(upper=2)
-    
-    return escalated_risk.map(inv_map)
+    vitals = df[list(rules.VITALS)].to_numpy(dtype=np.float64)
+    return pd.Series(rules.risk_level(df["Disease"].to_numpy(), vitals), index=df.index)
 
 
 def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -159,86 +151,272 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+# Bump when load_and_merge / engineer_features change what they produce
+INGEST_CACHE_VERSION = 1
+CACHE_DIR = os.path.join(BASE_DIR, config["paths"].get("cache_dir", ".cache"))
+
+
+def _dataset_fingerprint(fnames: list, mode: str = "mtime") -> str:
+    """
+    Hash of the dataset files (name + size + mtime, or full contents when
+    mode="hash") and of the config sections feature engineering depends on.
+    """
+    h = hashlib.sha256()
+    h.update(f"v{INGEST_CACHE_VERSION}".encode())
+    h.update(json.dumps(
+        {"thresholds": config["thresholds"], "disease_base_risk": config["disease_base_risk"]},
+        sort_keys=True,
+    ).encode())
+    for fname in fnames:
+        path = os.path.join(DATA_DIR, fname)
+        st = os.stat(path)
+        h.update(f"{fname}:{st.st_size}".encode())
+        if mode == "hash":
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            h.update(str(st.st_mtime_ns).encode())
+    return h.hexdigest()[:16]
+
+
+def _read_frame_cache(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+
+
+def _write_frame_cache(df: pd.DataFrame, path_stem: str) -> str:
+    """Write a columnar Parquet cache (pickle if pyarrow is missing) atomically."""
+    try:
+        import pyarrow  # noqa: F401
+
+        path = path_stem + ".parquet"
+        df.to_parquet(path + ".tmp", index=False)
+    except ImportError:
+        path = path_stem + ".pkl"
+        df.to_pickle(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_engineered(use_cache: bool = None, workers: int = None) -> pd.DataFrame:
+    """
+    ``engineer_features(load_and_merge())``, served from a columnar cache in
+    .cache/ when the dataset files and thresholds are unchanged.
+    """
+    ingest_cfg = config.get("ingest", {})
+    if use_cache is None:
+        use_cache = ingest_cfg.get("cache", True)
+    if not use_cache:
+        return engineer_features(load_and_merge(workers))
+
+    fingerprint = _dataset_fingerprint(list_data_files(), ingest_cfg.get("cache_key", "mtime"))
+    path_stem = os.path.join(CACHE_DIR, f"engineered_{fingerprint}")
+    for ext in (".parquet", ".pkl"):
+        if os.path.exists(path_stem + ext):
+            df = _read_frame_cache(path_stem + ext)
+            print(f"[INFO] Loaded {len(df):,} engineered rows from cache {os.path.basename(path_stem + ext)}")
+            return df
+
+    df = engineer_features(load_and_merge(workers))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for stale in os.listdir(CACHE_DIR):
+        if stale.startswith("engineered_"):
+            os.remove(os.path.join(CACHE_DIR, stale))
+    path = _write_frame_cache(df, path_stem)
+    print(f"[INFO] Cached engineered dataset → {os.path.relpath(path, BASE_DIR)}")
+    return df
+
+
 # ── 3. Build preprocessing + model pipeline ───────────────────────────────────
 NUMERIC_FEATURES = ["Age", "BP_Systolic", "BP_Diastolic", "Heart Rate", "Temperature"]
 CATEGORICAL_FEATURES = ["Gender"]
 TEXT_FEATURE = "Detailed_Symptoms"
+TFIDF_MAX_FEATURES = 500
+TFIDF_STOP_WORDS = "english"
 
 
-def build_preprocessor() -> ColumnTransformer:
+def build_preprocessor(vocabulary: dict = None, categories="auto") -> ColumnTransformer:
+    """
+    ``vocabulary`` / ``categories`` pin the TF-IDF terms and Gender levels
+    (see train_streaming.py); by default both are learned in ``fit``.
+
+    The output is always CSR (``sparse_threshold=1.0``): a symptom string
+    activates only a handful of TF-IDF terms, so about 90% of the matrix is
+    zeros. The forests fit and predict on CSR directly; only the compiled
+    forest and SHAP densify, a bounded block of rows at a time.
+    """
     return ColumnTransformer(
         transformers=[
             ("num", StandardScaler(), NUMERIC_FEATURES),
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CATEGORICAL_FEATURES),
-            ("text", TfidfVectorizer(max_features=500, stop_words="english"), TEXT_FEATURE),
+            ("cat", OneHotEncoder(categories=categories, handle_unknown="ignore", sparse_output=True), CATEGORICAL_FEATURES),
+            ("text", TfidfVectorizer(max_features=TFIDF_MAX_FEATURES, stop_words=TFIDF_STOP_WORDS, vocabulary=vocabulary), TEXT_FEATURE),
         ],
         remainder="drop",
+        sparse_threshold=1.0,
     )
 
 
-def build_model():
-    params = config["model_params"]
-    return MultiOutputClassifier(
-        RandomForestClassifier(
-            n_estimators=params["n_estimators"],
-            max_depth=params["max_depth"],
-            min_samples_split=params["min_samples_split"],
-            n_jobs=params["n_jobs"],
-            random_state=params["random_state"],
-            class_weight=params["class_weight"],
-        )
-    )
+def build_model(**overrides):
+    """
+    Forest from ``model_params``; keyword arguments override or extend them
+    with any ``RandomForestClassifier`` parameter (used by sweep.py).
+    """
+    params = {**config["model_params"], **overrides}
+    return MultiOutputClassifier(RandomForestClassifier(**params))
 
 
 # ── 4. Evaluation helpers ─────────────────────────────────────────────────────
 TARGET_NAMES = ["Disease", "Normal_Abnormal", "Risk_Level"]
 
 
-def evaluate(model, X_test, y_test, label_encoders: dict):
-    """Print metrics and return summary dict."""
-    y_pred = model.predict(X_test)
-    metrics = {}
+def render_confusion_matrix(target: str, cm: np.ndarray, classes: list, out_dir: str = MODEL_DIR) -> str:
+    """Save one annotated confusion-matrix heatmap; runs in a worker process."""
+    fig, ax = plt.subplots(figsize=(max(8, len(classes) * 0.6), max(6, len(classes) * 0.5)))
+    sns.heatmap(
+        cm, annot=True, fmt="d", cmap="Blues",
+        xticklabels=classes, yticklabels=classes, ax=ax,
+    )
+    ax.set_title(f"Confusion Matrix — {target}")
+    ax.set_xlabel("Predicted")
+    ax.set_ylabel("Actual")
+    plt.tight_layout()
+    path = os.path.join(out_dir, f"confusion_matrix_{target}.png")
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return path
 
-    for i, target in enumerate(TARGET_NAMES):
-        le = label_encoders[target]
-        y_true_labels = le.inverse_transform(y_test[:, i])
-        y_pred_labels = le.inverse_transform(y_pred[:, i])
 
-        acc = accuracy_score(y_test[:, i], y_pred[:, i])
-        f1 = f1_score(y_test[:, i], y_pred[:, i], average="weighted")
+def score_predictions(y_test, y_pred, label_encoders: dict):
+    """
+    Metrics for every target from one prediction pass.
 
+    Returns
+    -------
+    metrics : dict     — target → {"accuracy", "f1_weighted"}
+    matrices : dict    — target → confusion matrix over ``le.classes_``
+    """
+    metrics, matrices = {}, {}
+    for i, target in enumerate(TARGET_NAMES):
+        classes = label_encoders[target].classes_
+        y_true_i, y_pred_i = y_test[:, i], y_pred[:, i]
+
+        acc = accuracy_score(y_true_i, y_pred_i)
+        f1 = f1_score(y_true_i, y_pred_i, average="weighted")
         metrics[target] = {"accuracy": round(acc, 4), "f1_weighted": round(f1, 4)}
 
         print(f"\n{'='*60}")
         print(f"  Target: {target}  |  Accuracy: {acc:.4f}  |  F1: {f1:.4f}")
         print(f"{'='*60}")
-        print(classification_report(y_true_labels, y_pred_labels))
-
-        # Confusion matrix plot
-        cm = confusion_matrix(y_true_labels, y_pred_labels, labels=le.classes_)
-        fig, ax = plt.subplots(figsize=(max(8, len(le.classes_) * 0.6), max(6, len(le.classes_) * 0.5)))
-        sns.heatmap(
-            cm, annot=True, fmt="d", cmap="Blues",
-            xticklabels=le.classes_, yticklabels=le.classes_, ax=ax,
-        )
-        ax.set_title(f"Confusion Matrix — {target}")
-        ax.set_xlabel("Predicted")
-        ax.set_ylabel("Actual")
-        plt.tight_layout()
-        fig.savefig(os.path.join(MODEL_DIR, f"confusion_matrix_{target}.png"), dpi=120)
-        plt.close(fig)
-        print(f"  → Saved confusion_matrix_{target}.png")
+        # Encoded labels + target_names: same report as on the decoded strings
+        labels = np.union1d(y_true_i, y_pred_i)
+        print(classification_report(y_true_i, y_pred_i, labels=labels, target_names=classes[labels]))
+
+        matrices[target] = confusion_matrix(y_true_i, y_pred_i, labels=np.arange(len(classes)))
+
+    return metrics, matrices
 
-    return metrics
 
+def submit_confusion_matrices(pool, matrices: dict, label_encoders: dict, out_dir: str = MODEL_DIR) -> list:
+    """Queue one heatmap per target on ``pool``; returns the futures."""
+    return [
+        pool.submit(render_confusion_matrix, target, cm, label_encoders[target].classes_.tolist(), out_dir)
+        for target, cm in matrices.items()
+    ]
 
-# ── 5. Main training routine ──────────────────────────────────────────────────
-def main():
-    # Load
-    df = load_and_merge()
 
-    # Feature engineering
-    df = engineer_features(df)
+def plot_pool(workers: int = None) -> ProcessPoolExecutor:
+    """Process pool for heatmap rendering (one worker per target by default)."""
+    return ProcessPoolExecutor(max_workers=workers or min(len(TARGET_NAMES), os.cpu_count() or 1))
+
+
+# ── 5. Compiled forest export ─────────────────────────────────────────────────
+COMPILED_FOREST_DIR = os.path.join(MODEL_DIR, "compiled_forest")
+
+
+def export_compiled_forest(model, out_dir: str = COMPILED_FOREST_DIR) -> dict:
+    """
+    Flatten each fitted RandomForest of the MultiOutputClassifier into
+    contiguous NumPy arrays that ``predict.CompiledForest`` scores directly.
+
+    Per target (file prefix = target name):
+      feature    int32   (n_nodes,)   split feature (0 at leaves)
+      threshold  float64 (n_nodes,)   split threshold
+      left/right int32   (n_nodes,)   global child index (leaves point to
+                                      themselves, so traversal can run a
+                                      fixed number of steps)
+      value      float64 (n_nodes, n_classes) class distribution,
+                                      normalized exactly as
+                                      DecisionTreeClassifier.predict_proba
+      weight     float64 (n_nodes,)   weighted_n_node_samples (for SHAP)
+      roots      int32   (n_trees,)   index of each tree's root node
+
+    Arrays are written as plain .npy files so they can be memory-mapped.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {"format_version": 1, "targets": {}}
+
+    for target, estimator in zip(TARGET_NAMES, model.estimators_):
+        trees = [tree_est.tree_ for tree_est in estimator.estimators_]
+        counts = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        features, thresholds, lefts, rights, values, weights = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            local = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, local, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, local, tree.children_right) + offset)
+
+            value = tree.value[:, 0, : estimator.n_classes_].copy()
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+            values.append(value)
+            weights.append(tree.weighted_n_node_samples)
+
+        arrays = {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": np.concatenate(thresholds).astype(np.float64),
+            "left": np.concatenate(lefts).astype(np.int32),
+            "right": np.concatenate(rights).astype(np.int32),
+            "value": np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            "weight": np.concatenate(weights).astype(np.float64),
+            "roots": offsets.astype(np.int32),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(out_dir, f"{target}_{name}.npy"), array)
+
+        meta["targets"][target] = {
+            "n_trees": len(trees),
+            "n_nodes": int(counts.sum()),
+            "max_depth": int(max(tree.max_depth for tree in trees)),
+            "n_features": int(estimator.n_features_in_),
+            "classes": estimator.classes_.tolist(),
+            "feature_importances": estimator.feature_importances_.tolist(),
+        }
+
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+# ── 6. Main training routine ──────────────────────────────────────────────────
+def main(use_cache: bool = None, plots: bool = True):
+    timings = {}
+    t0 = time.perf_counter()
+
+    def _stage(name):
+        nonlocal t0
+        now = time.perf_counter()
+        timings[name] = round(now - t0, 3)
+        t0 = now
+
+    # Load + feature engineering (cached across runs)
+    df = load_engineered(use_cache)
+    _stage("load")
 
     na_dist = df["Normal_Abnormal"].value_counts()
     print(f"\n[INFO] Normal/Abnormal distribution:\n{na_dist}\n")
@@ -264,31 +442,80 @@ def main():
         X, y, test_size=0.2, random_state=42, stratify=y[:, 0]
     )
     print(f"[INFO] Train: {X_train.shape[0]:,}  |  Test: {X_test.shape[0]:,}")
+    _stage("preprocess")
 
     # Train
     print("\n[INFO] Training multi-output RandomForest (200 trees) ...")
     model = build_model()
     model.fit(X_train, y_train)
     print("[INFO] Training complete.")
+    _stage("fit")
 
-    # Evaluate
-    metrics = evaluate(model, X_test, y_test, label_encoders)
+    # Evaluate — one prediction pass for every metric
+    y_pred = model.predict(X_test)
+    _stage("predict")
+    metrics, matrices = score_predictions(y_test, y_pred, label_encoders)
+    _stage("metrics")
+
+    # Heatmaps render in worker processes while the artifacts are written
+    pool = plot_pool() if plots else None
+    plot_jobs = submit_confusion_matrices(pool, matrices, label_encoders) if plots else []
 
-    # Save everything
     joblib.dump(model, os.path.join(MODEL_DIR, "triage_model.joblib"))
     joblib.dump(preprocessor, os.path.join(MODEL_DIR, "preprocessor.joblib"))
     joblib.dump(label_encoders, os.path.join(MODEL_DIR, "label_encoders.joblib"))
     joblib.dump(config["specialty_map"], os.path.join(MODEL_DIR, "specialty_map.joblib"))
+    export_compiled_forest(model)
+    _stage("save")
+
+    if pool is not None:
+        with pool:
+            for future in plot_jobs:
+                print(f"  → Saved {os.path.basename(future.result())}")
+        _stage("plots")  # time spent waiting on rendering after the save
 
+    metrics["timings"] = timings
     with open(os.path.join(MODEL_DIR, "metrics.json"), "w") as f:
         json.dump(metrics, f, indent=2)
 
-    print(f"\n[INFO] All artifacts saved to {MODEL_DIR}/")
+    print("\n[INFO] Stage timings: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    print(f"[INFO] All artifacts saved to {MODEL_DIR}/")
     print("[INFO] Files: triage_model.joblib, preprocessor.joblib, "
-          "label_encoders.joblib, specialty_map.joblib, metrics.json")
+          "label_encoders.joblib, specialty_map.joblib, metrics.json, compiled_forest/")
 
     return metrics
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Training pipeline")
+    parser.add_argument(
+        "--export-compiled",
+        action="store_true",
+        help="Only re-export compiled_forest/ from the existing triage_model.joblib",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-read the CSVs instead of using the engineered-dataset cache",
+    )
+    parser.add_argument(
+        "--no-plots",
+        action="store_true",
+        help="Skip rendering the confusion-matrix PNGs",
+    )
+    parser.add_argument(
+        "--publish",
+        action="store_true",
+        help="Snapshot the new artifacts as a model version and make it CURRENT",
+    )
+    args = parser.parse_args()
+
+    if args.export_compiled:
+        meta = export_compiled_forest(joblib.load(os.path.join(MODEL_DIR, "triage_model.joblib")))
+        for target, info in meta["targets"].items():
+            print(f"[INFO] {target}: {info['n_trees']} trees, {info['n_nodes']:,} nodes")
+        print(f"[INFO] Compiled forest saved to {COMPILED_FOREST_DIR}/")
+    else:
+        main(use_cache=False if args.no_cache else None, plots=not args.no_plots)
+        if args.publish:
+            model_registry.publish(MODEL_DIR, note="train.py")
@@ -0,0 +1,467 @@
+"""
+AI Healthcare Triage Engine — Streaming (Out-of-core) Training
+================================================================
+Trains the same model as ``train.py`` without holding the merged dataset or
+the full feature matrix in memory:
+
+  Pass 1  read Data/ chunk by chunk, accumulating the scaler moments, Gender
+          levels, TF-IDF term / document frequencies and target classes
+  Pass 2  transform each chunk with the resulting preprocessor and append
+          its non-zeros to sparse float32 memory-mapped train / test stores
+          in .cache/streaming/ (the train store is then rewritten as CSC)
+  Fit     fit the forest on the memory-mapped store (sklearn reads float32
+          CSC input with sorted indices in place, without a copy)
+
+About nine in ten feature values are zeros from TF-IDF and one-hot columns
+(~10 non-zeros of 104 features per row), so the store keeps only the
+non-zeros at 8 bytes each. Measured at ``--scale 2`` (90,000 rows), it
+takes 8 MiB on disk where a dense float32 store took 37 MiB. Dense grows by
+about 18 MiB per 1× of the current dataset, reaching 1.8 GiB at
+``--scale 100``. The fitted trees are identical.
+The costs are a slower fit (~2× at ``--scale 2``: sklearn's sparse splitter
+does more work per split) and, while the train store is rewritten as CSC, a
+second copy of it on disk.
+
+Peak RSS and wall time are reported per stage; ``--scale N`` replays the
+dataset N times to measure datasets 10–100× the current size.
+
+Usage:
+    python train_streaming.py
+    python train_streaming.py --scale 10 --out-dir /tmp/triage_x10
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import warnings
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import joblib
+import scipy.sparse as sp
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score, f1_score
+
+from config_loader import config
+from telemetry import peak_rss_mb
+from train import (
+    DATA_DIR,
+    MODEL_DIR,
+    CACHE_DIR,
+    CSV_DTYPES,
+    NUMERIC_FEATURES,
+    CATEGORICAL_FEATURES,
+    TEXT_FEATURE,
+    TFIDF_MAX_FEATURES,
+    TFIDF_STOP_WORDS,
+    TARGET_NAMES,
+    list_data_files,
+    engineer_features,
+    build_preprocessor,
+    build_model,
+    export_compiled_forest,
+)
+
+warnings.filterwarnings("ignore")
+
+STREAM_DIR = os.path.join(CACHE_DIR, "streaming")
+DEFAULT_CHUNKSIZE = 20_000
+TEST_SIZE = 0.2
+
+
+class _StageTimer:
+    """Collects wall time and peak RSS after each named stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self._t0 = time.perf_counter()
+
+    def done(self, name: str):
+        now = time.perf_counter()
+        self.stages[name] = {
+            "wall_s": round(now - self._t0, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        print(f"[INFO] {name}: {now - self._t0:.2f}s  |  peak RSS {peak_rss_mb():.0f} MiB")
+        self._t0 = now
+
+
+# ── 1. Chunked reader ─────────────────────────────────────────────────────────
+def iter_chunks(chunksize: int = DEFAULT_CHUNKSIZE, scale: int = 1):
+    """
+    Engineered DataFrame chunks over every CSV in Data/, in file order.
+    ``scale`` > 1 replays the whole dataset that many times.
+    """
+    fnames = list_data_files()
+    for _ in range(scale):
+        for fname in fnames:
+            reader = pd.read_csv(
+                os.path.join(DATA_DIR, fname), dtype=CSV_DTYPES, chunksize=chunksize
+            )
+            for chunk in reader:
+                yield engineer_features(chunk.reset_index(drop=True))
+
+
+# ── 2. Pass 1: streaming statistics ───────────────────────────────────────────
+def scan_statistics(chunksize: int = DEFAULT_CHUNKSIZE, scale: int = 1) -> dict:
+    """
+    One pass over the data accumulating everything the preprocessor and the
+    label encoders learn in ``fit``. Memory is bounded by the chunk size plus
+    the (small) vocabulary.
+    """
+    scaler = StandardScaler()
+    analyzer = TfidfVectorizer(stop_words=TFIDF_STOP_WORDS).build_analyzer()
+    term_counts, doc_freq = Counter(), Counter()
+    categories = set()
+    classes = {target: set() for target in TARGET_NAMES}
+    n_rows = 0
+
+    for chunk in iter_chunks(chunksize, scale):
+        n_rows += len(chunk)
+        scaler.partial_fit(chunk[NUMERIC_FEATURES])
+        categories.update(chunk[CATEGORICAL_FEATURES[0]].dropna().unique())
+        for target in TARGET_NAMES:
+            classes[target].update(chunk[target].unique())
+
+        # Symptom texts repeat heavily — analyze each distinct text once
+        for text, n in chunk[TEXT_FEATURE].value_counts().items():
+            tokens = Counter(analyzer(text))
+            for term, count in tokens.items():
+                term_counts[term] += count * n
+                doc_freq[term] += n
+
+    return {
+        "n_rows": n_rows,
+        "scaler": scaler,
+        "categories": sorted(categories),
+        "term_counts": term_counts,
+        "doc_freq": doc_freq,
+        "classes": {target: sorted(values) for target, values in classes.items()},
+    }
+
+
+def select_vocabulary(term_counts: Counter, max_features: int = TFIDF_MAX_FEATURES) -> dict:
+    """
+    TfidfVectorizer's vocabulary from corpus-wide term counts: the
+    ``max_features`` most frequent terms, indexed in alphabetical order.
+    """
+    terms = np.array(sorted(term_counts), dtype=object)
+    if max_features is not None and len(terms) > max_features:
+        tfs = np.array([term_counts[t] for t in terms], dtype=np.int64)
+        # Same argsort as CountVectorizer._limit_features, so ties break identically
+        terms = terms[np.sort((-tfs).argsort()[:max_features])]
+    return {term: i for i, term in enumerate(terms)}
+
+
+def smooth_idf(doc_freq: Counter, vocabulary: dict, n_docs: int) -> np.ndarray:
+    """``TfidfTransformer`` idf_: ln((1 + n) / (1 + df)) + 1."""
+    df = np.zeros(len(vocabulary), dtype=np.float64)
+    for term, j in vocabulary.items():
+        df[j] = doc_freq[term]
+    df += 1.0
+    idf = np.full_like(df, fill_value=n_docs + 1)
+    idf /= df
+    np.log(idf, out=idf)
+    idf += 1.0
+    return idf
+
+
+def build_fitted_preprocessor(stats: dict, sample: pd.DataFrame):
+    """
+    ColumnTransformer with the corpus-wide statistics from ``scan_statistics``.
+    ``fit`` on one sample chunk sets up the fitted structure; the scaler
+    moments and idf weights are then replaced with the full-data ones.
+    """
+    vocabulary = select_vocabulary(stats["term_counts"])
+    preprocessor = build_preprocessor(
+        vocabulary=vocabulary,
+        categories=[np.array(stats["categories"], dtype=object)],
+    )
+    preprocessor.fit(sample)
+
+    scaler = preprocessor.named_transformers_["num"]
+    for attr in ("mean_", "var_", "scale_", "n_samples_seen_"):
+        setattr(scaler, attr, getattr(stats["scaler"], attr))
+    preprocessor.named_transformers_["text"].idf_ = smooth_idf(
+        stats["doc_freq"], vocabulary, stats["n_rows"]
+    )
+    return preprocessor
+
+
+# ── 3. Pass 2: memory-mapped feature store ────────────────────────────────────
+# Nine in ten feature values are zero TF-IDF / one-hot columns, so the store
+# keeps only the non-zeros: float32 data plus int32 indices / indptr (the
+# index dtype sklearn's tree splitters read).
+_INDEX_MAX = np.iinfo(np.int32).max
+
+
+def _open_store(name: str, shape: tuple, dtype) -> np.memmap:
+    return np.lib.format.open_memmap(
+        os.path.join(STREAM_DIR, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+    )
+
+
+def _map_appended(path: str, dtype, count: int) -> np.ndarray:
+    if count == 0:  # np.memmap cannot map an empty file
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def store_nbytes(arr) -> int:
+    """Bytes of a dense or sparse store on disk."""
+    if sp.issparse(arr):
+        return arr.data.nbytes + arr.indices.nbytes + arr.indptr.nbytes
+    return arr.nbytes
+
+
+class _CSRWriter:
+    """
+    Appends CSR row blocks to ``{name}_data.bin`` / ``{name}_indices.bin``
+    (their total size is unknown up front) and an ``indptr`` memmap, and
+    maps them back as one read-only ``csr_matrix``.
+    """
+
+    def __init__(self, name: str, n_rows: int, n_features: int):
+        self.shape = (n_rows, n_features)
+        self._paths = [os.path.join(STREAM_DIR, f"{name}_{part}.bin") for part in ("data", "indices")]
+        self._files = [open(path, "wb") for path in self._paths]
+        self.indptr = _open_store(f"{name}_indptr", (n_rows + 1,), np.int32)
+        self.indptr[0] = 0
+        self.col_nnz = np.zeros(n_features, dtype=np.int64)
+        self._row = self._nnz = 0
+
+    def append(self, X):
+        X = X.tocsr()
+        if self._nnz + X.nnz > _INDEX_MAX:
+            raise ValueError("Feature store exceeds 2**31 non-zeros; lower --scale")
+        self._files[0].write(X.data.astype(np.float32, copy=False).tobytes())
+        self._files[1].write(X.indices.astype(np.int32, copy=False).tobytes())
+        self.indptr[self._row + 1:self._row + X.shape[0] + 1] = X.indptr[1:] + self._nnz
+        self.col_nnz += np.bincount(X.indices, minlength=self.shape[1])
+        self._row += X.shape[0]
+        self._nnz += X.nnz
+
+    def finish(self) -> sp.csr_matrix:
+        for f in self._files:
+            f.close()
+        self.indptr.flush()
+        return sp.csr_matrix(
+            (
+                _map_appended(self._paths[0], np.float32, self._nnz),
+                _map_appended(self._paths[1], np.int32, self._nnz),
+                self.indptr,
+            ),
+            shape=self.shape,
+            copy=False,
+        )
+
+
+def _csr_to_csc(X: sp.csr_matrix, col_nnz: np.ndarray, name: str,
+                block_rows: int = DEFAULT_CHUNKSIZE) -> sp.csc_matrix:
+    """
+    Memory-mapped CSC copy of ``X`` (the layout ``RandomForestClassifier``
+    fits on), filled ``block_rows`` rows at a time. Rows arrive in order, so
+    every column's row indices come out sorted.
+    """
+    indptr = _open_store(f"{name}_indptr", (X.shape[1] + 1,), np.int32)
+    indptr[0] = 0
+    np.cumsum(col_nnz, out=indptr[1:])
+    data = _open_store(f"{name}_data", (X.nnz,), np.float32)
+    indices = _open_store(f"{name}_indices", (X.nnz,), np.int32)
+
+    next_pos = np.asarray(indptr[:-1], dtype=np.int64)
+    for start in range(0, X.shape[0], block_rows):
+        block = X[start:start + block_rows].tocsc()
+        counts = np.diff(block.indptr)
+        dest = np.repeat(next_pos - block.indptr[:-1], counts) + np.arange(block.nnz)
+        data[dest] = block.data
+        indices[dest] = block.indices + start
+        next_pos += counts
+
+    for arr in (indptr, data, indices):
+        arr.flush()
+    X_csc = sp.csc_matrix((data, indices, indptr), shape=X.shape, copy=False)
+    X_csc.has_sorted_indices = True
+    return X_csc
+
+
+def write_feature_store(
+    preprocessor,
+    label_encoders: dict,
+    is_test: np.ndarray,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    scale: int = 1,
+) -> dict:
+    """
+    Transform chunk by chunk into sparse float32 X_train (CSC) / X_test (CSR)
+    and dense y_train / y_test (int32) memmaps. Rows go to the test store
+    where ``is_test`` is True. X_train is appended as CSR, then rewritten
+    column-major so the forest fits on the mapped arrays without a copy.
+    """
+    os.makedirs(STREAM_DIR, exist_ok=True)
+    n_features = len(preprocessor.get_feature_names_out())
+    n_test = int(is_test.sum())
+    n_train = len(is_test) - n_test
+    writers = {
+        "X_train": _CSRWriter("X_train_rows", n_train, n_features),
+        "X_test": _CSRWriter("X_test", n_test, n_features),
+    }
+    store = {
+        "y_train": _open_store("y_train", (n_train, len(TARGET_NAMES)), np.int32),
+        "y_test": _open_store("y_test", (n_test, len(TARGET_NAMES)), np.int32),
+    }
+
+    start = train_pos = test_pos = 0
+    for chunk in iter_chunks(chunksize, scale):
+        X = sp.csr_matrix(preprocessor.transform(chunk))
+        y = np.column_stack([
+            label_encoders[target].transform(chunk[target]) for target in TARGET_NAMES
+        ])
+        test_mask = is_test[start:start + len(chunk)]
+        start += len(chunk)
+
+        n = int(test_mask.sum())
+        writers["X_test"].append(X[test_mask])
+        store["y_test"][test_pos:test_pos + n] = y[test_mask]
+        test_pos += n
+
+        n = len(chunk) - n
+        writers["X_train"].append(X[~test_mask])
+        store["y_train"][train_pos:train_pos + n] = y[~test_mask]
+        train_pos += n
+
+    for arr in store.values():
+        arr.flush()
+    store["X_test"] = writers["X_test"].finish()
+    train_rows = writers["X_train"].finish()
+    store["X_train"] = _csr_to_csc(train_rows, writers["X_train"].col_nnz, "X_train", chunksize)
+    del train_rows
+    for part in ("data", "indices"):
+        os.remove(os.path.join(STREAM_DIR, f"X_train_rows_{part}.bin"))
+    os.remove(os.path.join(STREAM_DIR, "X_train_rows_indptr.npy"))
+    return store
+
+
+# ── 4. Evaluation ─────────────────────────────────────────────────────────────
+def evaluate_chunked(model, X_test, y_test, chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """Accuracy / weighted F1 per target, predicting the test store in chunks."""
+    y_pred = np.vstack([
+        model.predict(X_test[i:i + chunksize]) for i in range(0, X_test.shape[0], chunksize)
+    ])
+    metrics = {}
+    for i, target in enumerate(TARGET_NAMES):
+        acc = accuracy_score(y_test[:, i], y_pred[:, i])
+        f1 = f1_score(y_test[:, i], y_pred[:, i], average="weighted")
+        metrics[target] = {"accuracy": round(acc, 4), "f1_weighted": round(f1, 4)}
+        print(f"[INFO] {target}: accuracy {acc:.4f}  |  F1 {f1:.4f}")
+    return metrics
+
+
+# ── 5. Main streaming routine ─────────────────────────────────────────────────
+def main(
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    scale: int = 1,
+    out_dir: str = MODEL_DIR,
+    keep_store: bool = False,
+    n_estimators: int = None,
+) -> dict:
+    timer = _StageTimer()
+    random_state = config["model_params"]["random_state"]
+
+    # Pass 1 — statistics
+    stats = scan_statistics(chunksize, scale)
+    print(f"[INFO] Scanned {stats['n_rows']:,} rows ({scale}× dataset), "
+          f"{len(stats['term_counts'])} distinct terms")
+    timer.done("scan")
+
+    label_encoders = {}
+    for target in TARGET_NAMES:
+        le = LabelEncoder()
+        le.fit(stats["classes"][target])
+        label_encoders[target] = le
+        print(f"[INFO] {target}: {len(le.classes_)} classes")
+
+    preprocessor = build_fitted_preprocessor(stats, next(iter_chunks(chunksize)))
+    n_features = len(preprocessor.get_feature_names_out())
+
+    # Random (unstratified) split — stratifying needs the labels in memory
+    rng = np.random.default_rng(random_state)
+    is_test = rng.random(stats["n_rows"]) < TEST_SIZE
+
+    # Pass 2 — feature store
+    store = write_feature_store(preprocessor, label_encoders, is_test, chunksize, scale)
+    store_mb = sum(store_nbytes(arr) for arr in store.values()) / (1024 * 1024)
+    print(f"[INFO] Feature store: {store['X_train'].shape[0]:,} train / {store['X_test'].shape[0]:,} test "
+          f"× {n_features} features, {store['X_train'].nnz + store['X_test'].nnz:,} non-zeros "
+          f"({store_mb:.0f} MiB on disk)")
+    timer.done("transform")
+
+    # Fit on the memory-mapped training store
+    model = build_model()
+    if n_estimators is not None:
+        model.estimator.set_params(n_estimators=n_estimators)
+    print(f"[INFO] Training multi-output RandomForest "
+          f"({model.estimator.n_estimators} trees) on the memory-mapped store ...")
+    model.fit(store["X_train"], store["y_train"])
+    timer.done("fit")
+
+    metrics = evaluate_chunked(model, store["X_test"], store["y_test"], chunksize)
+    timer.done("evaluate")
+
+    os.makedirs(out_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(out_dir, "triage_model.joblib"))
+    joblib.dump(preprocessor, os.path.join(out_dir, "preprocessor.joblib"))
+    joblib.dump(label_encoders, os.path.join(out_dir, "label_encoders.joblib"))
+    joblib.dump(config["specialty_map"], os.path.join(out_dir, "specialty_map.joblib"))
+    export_compiled_forest(model, os.path.join(out_dir, "compiled_forest"))
+    timer.done("save")
+
+    metrics["streaming"] = {
+        "rows": stats["n_rows"],
+        "scale": scale,
+        "chunksize": chunksize,
+        "n_features": n_features,
+        "store_mb": round(store_mb, 1),
+        "stages": timer.stages,
+        "wall_s": round(sum(s["wall_s"] for s in timer.stages.values()), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    with open(os.path.join(out_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+
+    del store
+    if not keep_store:
+        shutil.rmtree(STREAM_DIR, ignore_errors=True)
+
+    print(f"\n[INFO] Total wall time: {metrics['streaming']['wall_s']:.2f}s  |  "
+          f"peak RSS {metrics['streaming']['peak_rss_mb']:.0f} MiB")
+    print(f"[INFO] All artifacts saved to {out_dir}/")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Healthcare Triage — Streaming training")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows read and transformed per chunk")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Replay the dataset N times (benchmark 10–100× sizes); the sparse "
+                             "feature store takes ~1 MiB per 10,000 rows on disk")
+    parser.add_argument("--out-dir", default=MODEL_DIR,
+                        help="Where to write the artifacts (default: model/)")
+    parser.add_argument("--n-estimators", type=int, default=None,
+                        help="Override model_params.n_estimators")
+    parser.add_argument("--keep-store", action="store_true",
+                        help="Keep the memory-mapped feature store in .cache/streaming/")
+    args = parser.parse_args()
+
+    main(
+        chunksize=args.chunksize,
+        scale=args.scale,
+        out_dir=args.out_dir,
+        keep_store=args.keep_store,
+        n_estimators=args.n_estimators,
+    )
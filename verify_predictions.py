@@ -34,3 +34,292 @@ run_predict(50, "Male", "Headache, dizziness", "150/95", 80, 98.6, "Hypertension
 # 4. Acne but CRITICAL vitals (Escalation test: Low -> Medium)
 # BP > 180 systolic is critical
 run_predict(19, "Male", "Pimples on face", "190/100", 75, 98.6, "Acne with Critical BP (Escalated Risk)")
+
+
+# ── Regression: single-pass forest labels vs. MultiOutputClassifier.predict ──
+def _sample_records(n_rows):
+    """Sample ``n_rows`` training-CSV rows as predict_batch() records."""
+    import os
+    import pandas as pd
+    import predict
+
+    data_dir = os.path.join(predict.BASE_DIR, "Data")
+    frames = [
+        pd.read_csv(os.path.join(data_dir, f))
+        for f in sorted(os.listdir(data_dir))
+        if f.endswith(".csv")
+    ]
+    sample = pd.concat(frames, ignore_index=True).sample(n=n_rows, random_state=0)
+    return [
+        {
+            "age": r["Age"],
+            "gender": r["Gender"],
+            "symptoms": r["Detailed_Symptoms"],
+            "blood_pressure": r["Blood Pressure"],
+            "heart_rate": r["Heart Rate"],
+            "temperature": r["Temperature"],
+        }
+        for _, r in sample.iterrows()
+    ]
+
+
+def check_single_pass_labels(n_rows=500):
+    """
+    Score a sample of the training CSVs in-process and assert that the labels
+    from predict_batch() (argmax of one predict_proba pass per target) are
+    identical to the legacy ``_model.predict(X)`` + ``inverse_transform`` path.
+    """
+    import pandas as pd
+    import predict
+
+    print(f"\n--- Regression: single-pass labels on {n_rows} rows ---")
+    predict.load_artifacts(engine="sklearn")
+    bundle = predict._bundle
+
+    records = _sample_records(n_rows)
+    results = predict.predict_batch(records, explain="none")
+
+    X = bundle.preprocessor.transform(
+        pd.DataFrame([predict._record_to_row(r) for r in records])
+    )
+    y_legacy = bundle.model.predict(X)
+    mismatches = 0
+    for i, target in enumerate(predict.TARGET_NAMES):
+        legacy = bundle.label_encoders[target].inverse_transform(y_legacy[:, i])
+        new = [res[target.lower()] for res in results]
+        mismatches += sum(a != b for a, b in zip(legacy, new))
+
+    assert mismatches == 0, f"{mismatches} label mismatches vs. legacy predict()"
+    print("OK: labels identical to legacy predict()")
+
+
+# ── Regression: compiled forest vs. sklearn forest ────────────────────────────
+def check_compiled_forest(n_rows=2000):
+    """
+    Assert that ``predict.CompiledForest`` (exported by
+    ``train.py --export-compiled``) yields the same labels as the sklearn
+    forest and probabilities equal up to float summation order.
+    """
+    import os
+    import numpy as np
+    import pandas as pd
+    import predict
+
+    print(f"\n--- Regression: compiled forest on {n_rows} rows ---")
+    predict.load_artifacts(engine="sklearn")
+    bundle = predict._bundle
+    compiled_dir = os.path.join(bundle.path, "compiled_forest")
+    if not os.path.exists(os.path.join(compiled_dir, "meta.json")):
+        print("SKIP: no compiled_forest/ (run `python train.py --export-compiled`)")
+        return
+
+    compiled = predict.CompiledForest(compiled_dir)
+    X = bundle.preprocessor.transform(
+        pd.DataFrame([predict._record_to_row(r) for r in _sample_records(n_rows)])
+    )
+    for target, reference, candidate in zip(
+        predict.TARGET_NAMES, bundle.model.estimators_, compiled.estimators_
+    ):
+        p_ref = reference.predict_proba(X)
+        p_new = candidate.predict_proba(X)
+        assert np.array_equal(p_ref.argmax(axis=1), p_new.argmax(axis=1)), target
+        assert np.allclose(p_ref, p_new, rtol=0, atol=1e-12), target
+    print("OK: compiled forest matches the sklearn forest")
+
+
+# ── Regression: pandas-free preprocessing vs. the ColumnTransformer ─────────
+def check_fast_preprocessor(n_rows=5000):
+    """
+    Assert that ``FastPreprocessor.transform`` is bit-for-bit identical to
+    the ColumnTransformer's ``transform`` on training rows plus edge cases (unknown
+    gender, empty / stop-word-only / out-of-vocabulary symptoms), with the
+    symptom caches off, cold, warm, and with the phrase order shuffled.
+    """
+    import numpy as np
+    import pandas as pd
+    import scipy.sparse as sp
+    import predict
+    from fast_preprocessor import FastPreprocessor
+
+    print(f"\n--- Regression: fast preprocessing on {n_rows} rows ---")
+    predict.load_artifacts()
+    preprocessor = predict._bundle.preprocessor
+    records = _sample_records(n_rows) + [
+        {"age": 30, "gender": "Unknown", "symptoms": "Cough", "blood_pressure": "120/80",
+         "heart_rate": 72, "temperature": 98.6},
+        {"age": 30, "gender": "Other", "symptoms": "the and of, it", "blood_pressure": "90/60",
+         "heart_rate": 60, "temperature": 96.0},
+        {"age": 0, "gender": "Male", "symptoms": "Zzyzx!! Ünïcødé; chest—pain/fever", "blood_pressure": "200/40",
+         "heart_rate": 190, "temperature": 106.2},
+        {"age": 40, "gender": "Male", "symptoms": " ,Chest  Pain,, chest pain ,fever", "blood_pressure": "120/80",
+         "heart_rate": 72, "temperature": 98.6},
+    ]
+    rows = [predict._record_to_row(r) for r in records]
+    # Empty text: rejected by _record_to_row, but the transform must still handle it
+    rows.append(dict(rows[-1], Gender="Female", Detailed_Symptoms=""))
+    shuffled = [
+        dict(row, Detailed_Symptoms=", ".join(reversed(row["Detailed_Symptoms"].split(","))))
+        for row in rows
+    ]
+
+    expected = preprocessor.transform(pd.DataFrame(rows))
+    cached = FastPreprocessor.from_column_transformer(preprocessor, text_cache_size=n_rows)
+    outputs = {
+        "uncached": FastPreprocessor.from_column_transformer(preprocessor).transform(rows),
+        "cold cache": cached.transform(rows),
+        "warm cache": cached.transform(rows),
+        "shuffled phrases": cached.transform(shuffled),
+    }
+
+    for name, actual in outputs.items():
+        if sp.issparse(expected):
+            assert sp.issparse(actual) and expected.shape == actual.shape, name
+            for attr in ("indptr", "indices", "data"):
+                assert np.array_equal(getattr(expected, attr), getattr(actual, attr)), f"{name}: {attr}"
+        else:
+            assert np.array_equal(expected, actual), name
+    stats = cached.cache_stats()["symptom_sets"]
+    print(f"  symptom cache: {stats['entries']:,} sets, hit rate {stats['hit_rate']:.1%}")
+    print("OK: fast preprocessing is bit-for-bit identical")
+
+
+# ── Regression: hot reload keeps in-flight bundles usable ─────────────────────
+def check_hot_reload(n_rows=200):
+    """
+    Reload the serving version and assert that results (including
+    ``model_version``) are unchanged, that the swap installs a new bundle, and
+    that a request still holding the old bundle can finish on it.
+    """
+    import predict
+
+    print(f"\n--- Regression: hot reload on {n_rows} rows ---")
+    predict.load_artifacts()
+    records = _sample_records(n_rows)
+    before = predict.predict_batch(records, explain="none")
+    old_bundle = predict._bundle
+
+    stats = predict.reload_artifacts(warmup=False)
+    assert predict._bundle is not old_bundle
+    assert stats["model_version"] == stats["previous_version"] == predict.model_version()
+
+    after = predict.predict_batch(records, explain="none")
+    in_flight = predict._score_rows(
+        old_bundle, [predict._record_to_row(r) for r in records], explain="none"
+    )
+    assert before == after == in_flight
+    assert all(r["model_version"] == predict.model_version() for r in after)
+    print(f"OK: reload of version {predict.model_version()!r} is seamless")
+
+
+# ── Regression: rule-derived targets vs. train.py's derivation ────────────────
+def check_rule_targets(n_rows=2000):
+    """
+    With ``rule_targets`` on, assert that Disease is unchanged and that
+    Normal_Abnormal / Risk_Level equal train.py's ``derive_*`` applied to the
+    vitals and the predicted Disease; report agreement with the forests.
+    """
+    import pandas as pd
+    import predict
+    import train
+
+    print(f"\n--- Regression: rule-derived targets on {n_rows} rows ---")
+    predict.load_artifacts()
+    bundle = predict._bundle
+    records = _sample_records(n_rows)
+    forest = predict._score_rows(bundle, [predict._record_to_row(r) for r in records], explain="none")
+    bundle.rule_targets = True
+    try:
+        ruled = predict._score_rows(bundle, [predict._record_to_row(r) for r in records], explain="none")
+    finally:
+        bundle.rule_targets = predict._inference_cfg.get("rule_targets", False)
+
+    df = pd.DataFrame([predict._record_to_row(r) for r in records])
+    df["Disease"] = [res["disease"] for res in ruled]
+    expected = {
+        "normal_abnormal": list(train.derive_normal_abnormal(df)),
+        "risk_level": list(train.derive_risk_level(df)),
+    }
+    assert [res["disease"] for res in forest] == list(df["Disease"])
+    for key, labels in expected.items():
+        assert [res[key] for res in ruled] == labels, f"{key} differs from train.py's rules"
+        agreement = sum(res[key] == label for res, label in zip(forest, labels)) / n_rows
+        print(f"  forest agreement with rules on {key}: {agreement:.2%}")
+    print("OK: rule-derived targets match train.py's derivation")
+
+
+# ── Regression: malformed records fail alone ──────────────────────────────────
+def check_malformed_records():
+    """
+    Non-finite vitals and missing / empty / non-string text fields must come
+    back as per-record errors, leaving the valid records in the batch scored.
+    """
+    import predict
+
+    print("\n--- Regression: malformed records in a batch ---")
+    valid = dict(predict.WARMUP_RECORD)
+    malformed = [
+        dict(valid, temperature=float("nan")),
+        dict(valid, temperature=float("inf")),
+        dict(valid, heart_rate=float("-inf")),
+        dict(valid, blood_pressure="nan/80"),
+        dict(valid, symptoms=None),
+        dict(valid, symptoms="   "),
+        dict(valid, gender=None),
+        dict(valid, gender=float("nan")),
+        {k: v for k, v in valid.items() if k != "age"},
+    ]
+    results = predict.predict_batch([valid] + malformed + [valid], explain="none")
+    assert "error" not in results[0] and results[0] == results[-1]
+    for record, result in zip(malformed, results[1:-1]):
+        assert set(result) == {"error"}, f"{record} was scored: {result}"
+    try:
+        predict.predict(**malformed[0], explain="none")
+        raise AssertionError("predict() scored a NaN temperature")
+    except predict.InvalidRecordError:
+        pass
+    print(f"OK: {len(malformed)} malformed records rejected individually")
+
+
+# ── Regression: bulk scoring writes malformed rows as errors ──────────────────
+def check_bulk_malformed_rows():
+    """
+    A CSV with empty cells must be scored to the end, the malformed rows
+    written with an ``error`` field and the valid ones scored normally.
+    """
+    import os
+    import tempfile
+    import bulk_predict
+
+    print("\n--- Regression: bulk scoring with malformed rows ---")
+    header = "Patient_ID,Age,Gender,Detailed_Symptoms,Blood Pressure,Heart Rate,Temperature"
+    valid = "45,Male,Chest pain,150/95,96,99.1"
+    lines = [
+        f"p0,{valid}",
+        "p1,,Male,Chest pain,150/95,96,99.1",     # empty Age
+        "p2,45,Male,,150/95,96,99.1",             # empty Detailed_Symptoms
+        "p3,45,,Chest pain,150/95,96,99.1",       # empty Gender
+        "p4,45,Male,Chest pain,150/95,96,inf",    # non-finite Temperature
+        f"p5,{valid}",
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "records.csv")
+        output_path = os.path.join(tmp, "results.jsonl")
+        with open(input_path, "w") as f:
+            f.write("\n".join([header] + lines) + "\n")
+        state = bulk_predict.main(input_path, output_path, chunksize=2, workers=1)
+        with open(output_path) as f:
+            rows = [json.loads(line) for line in f]
+
+    assert state["complete"] and [r["id"] for r in rows] == [f"p{i}" for i in range(len(lines))]
+    assert all("error" not in rows[i] and "disease" in rows[i] for i in (0, 5))
+    assert all("error" in rows[i] and "disease" not in rows[i] for i in range(1, 5))
+    print("OK: malformed bulk rows are written as errors")
+
+
+check_single_pass_labels()
+check_compiled_forest()
+check_fast_preprocessor()
+check_hot_reload()
+check_rule_targets()
+check_malformed_records()
+check_bulk_malformed_rows()